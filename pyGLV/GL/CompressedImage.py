@@ -0,0 +1,246 @@
+"""
+CompressedImage class
+
+Block compressed texture images with precomputed mip chains, read from and written to DDS and KTX2
+containers. Texture uploads them as they are with glCompressedTexImage2D: GL keeps them compressed
+in video memory and samples them directly, and no mipmaps are generated at load time.
+
+    ====== ================================ ============== ===================
+    format GL internal format               bytes / pixel  vs. RGBA8
+    ====== ================================ ============== ===================
+    BC1    GL_COMPRESSED_RGB_S3TC_DXT1_EXT  0.5            8x smaller, opaque
+    BC3    GL_COMPRESSED_RGBA_S3TC_DXT5_EXT 1              4x smaller, alpha
+    BC7    GL_COMPRESSED_RGBA_BPTC_UNORM    1              4x smaller, alpha
+    ====== ================================ ============== ===================
+
+BC1 and BC3 are encoded with the Pillow BCn encoder, BC7 files made by other tools are loaded but
+not encoded. The offline converter pyGLV.utils.compress_textures turns PNG/JPG files into containers
+
+    python -m pyGLV.utils.compress_textures pyGLV/examples/textures
+    python -m pyGLV.utils.compress_textures --faces pyGLV/examples/Skyboxes/Sea
+
+and Texture("dark_wood_texture.ktx2") or get_texture_faces() of .ktx2/.dds faces load them. Rows are
+stored in the order GL receives them, so images are compressed in the orientation TextureLoader.decode
+gives them (transposed for Texture, as they are for cube map faces); container files made by other
+tools upload like TextureLoader.decode(orient=False).
+
+"""
+
+from __future__         import annotations
+import os
+import struct
+
+import OpenGL.GL as gl
+from OpenGL.GL.EXT.texture_compression_s3tc import GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT
+import numpy as np
+import PIL
+from PIL import Image
+
+
+class CompressedImage:
+    """
+    Mip chain of a BC1, BC3 or BC7 image, level 0 first
+    """
+    # format -> (GL internal format, bytes per 4x4 block, DXGI formats, VkFormat, KTX2 DFD color model, Pillow bcn encoder)
+    FORMATS = {
+        'BC1': (GL_COMPRESSED_RGB_S3TC_DXT1_EXT, 8, (70, 71, 72), 131, 128, 1),
+        'BC3': (GL_COMPRESSED_RGBA_S3TC_DXT5_EXT, 16, (76, 77, 78), 137, 130, 3),
+        'BC7': (gl.GL_COMPRESSED_RGBA_BPTC_UNORM, 16, (97, 98, 99), 145, 134, None),
+    }
+    EXTENSIONS = ('.dds', '.ktx2')
+
+    DDS_MAGIC = b'DDS '
+    DDS_FOURCC = {b'DXT1': 'BC1', b'DXT5': 'BC3'}
+    KTX2_IDENTIFIER = b'\xabKTX 20\xbb\r\n\x1a\n'
+
+    def __init__(self, format, width, height, levels):
+        """
+        :param format: 'BC1', 'BC3' or 'BC7'
+        :param levels: compressed bytes of each mip level, level 0 first
+        """
+        if format not in CompressedImage.FORMATS:
+            raise ValueError(f'CompressedImage: unknown format {format}')
+        self._format = format
+        self._width = width
+        self._height = height
+        self._levels = [bytes(level) for level in levels]
+        for level, data in enumerate(self._levels):
+            expected = self.levelBytes(level)
+            if len(data) != expected:
+                raise ValueError(f'CompressedImage: level {level} has {len(data)} bytes instead of {expected}')
+
+    @property
+    def format(self):
+        return self._format
+
+    @property
+    def glFormat(self):
+        return CompressedImage.FORMATS[self._format][0]
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def levels(self):
+        """
+        (width, height, compressed bytes) of each mip level, level 0 first
+        """
+        return [(*self.levelSize(level), data) for level, data in enumerate(self._levels)]
+
+    @property
+    def nbytes(self):
+        return sum(len(data) for data in self._levels)
+
+    def levelSize(self, level):
+        return max(1, self._width >> level), max(1, self._height >> level)
+
+    def levelBytes(self, level):
+        width, height = self.levelSize(level)
+        return ((width + 3) // 4) * ((height + 3) // 4) * CompressedImage.FORMATS[self._format][1]
+
+    def __repr__(self):
+        return f'CompressedImage({self._format}, {self._width}x{self._height}, {len(self._levels)} levels)'
+
+    @staticmethod
+    def isContainer(filepath):
+        return os.path.splitext(str(filepath))[1].lower() in CompressedImage.EXTENSIONS
+
+    @staticmethod
+    def canEncode():
+        """
+        True if Pillow has its BCn encoder (Pillow 11.2 and later, which need Python 3.9), fromImage() needs it
+        """
+        return hasattr(Image.core, 'bcn_encoder')
+
+    @staticmethod
+    def fromImage(pixels, format='auto', mipmaps=True):
+        """
+        Compress an RGBA8 image and its mip chain, halving down to 1x1 with a box filter as glGenerateMipmap does
+
+        :param pixels: (height, width, 4) uint8 array, as TextureLoader.decode returns
+        :param format: 'BC1', 'BC3', or 'auto' for BC1 when all pixels are opaque
+        """
+        pixels = np.asarray(pixels, np.uint8)
+        if format == 'auto':
+            format = 'BC1' if pixels.shape[2] < 4 or pixels[..., 3].min() == 255 else 'BC3'
+        encoder = CompressedImage.FORMATS[format][5] if format in CompressedImage.FORMATS else None
+        if encoder is None:
+            raise ValueError(f'CompressedImage: cannot encode {format}, only BC1 and BC3')
+        if not CompressedImage.canEncode():
+            raise RuntimeError(f'CompressedImage: encoding needs the BCn encoder of Pillow 11.2 or later (Python 3.9+), '
+                               f'found Pillow {PIL.__version__}, install pyGLV[compress]')
+        img = Image.fromarray(np.ascontiguousarray(pixels[..., :4]), 'RGBA' if pixels.shape[2] == 4 else 'RGB')
+        img = img.convert('RGB' if format == 'BC1' else 'RGBA')
+        levels = [img.tobytes('bcn', encoder)]
+        while mipmaps and (img.width > 1 or img.height > 1):
+            img = img.resize((max(1, img.width // 2), max(1, img.height // 2)), Image.BOX)
+            levels.append(img.tobytes('bcn', encoder))
+        return CompressedImage(format, pixels.shape[1], pixels.shape[0], levels)
+
+    @staticmethod
+    def load(filepath):
+        """
+        Read a DDS or KTX2 file, by its extension
+        """
+        with open(filepath, 'rb') as file:
+            data = file.read()
+        if data.startswith(CompressedImage.KTX2_IDENTIFIER):
+            return CompressedImage.fromKTX2(data)
+        if data.startswith(CompressedImage.DDS_MAGIC):
+            return CompressedImage.fromDDS(data)
+        raise ValueError(f'CompressedImage: {filepath} is neither a DDS nor a KTX2 file')
+
+    def save(self, filepath):
+        """
+        Write a DDS or KTX2 file, by the extension of `filepath`
+        """
+        extension = os.path.splitext(str(filepath))[1].lower()
+        if extension not in CompressedImage.EXTENSIONS:
+            raise ValueError(f'CompressedImage: cannot write {extension} files, only {CompressedImage.EXTENSIONS}')
+        with open(filepath, 'wb') as file:
+            file.write(self.toDDS() if extension == '.dds' else self.toKTX2())
+
+    @staticmethod
+    def fromDDS(data):
+        size, flags, height, width, linearSize, depth, mipmaps = struct.unpack_from('<7I', data, 4)
+        pixelFlags, fourCC = struct.unpack_from('<I4s', data, 80)
+        caps2 = struct.unpack_from('<I', data, 112)[0]
+        offset = 4 + size
+        if caps2 & 0x200: # DDSCAPS2_CUBEMAP
+            raise ValueError('CompressedImage: DDS cube maps are not supported, convert the faces separately')
+        if fourCC == b'DX10':
+            dxgiFormat, dimension, misc, arraySize = struct.unpack_from('<4I', data, offset)
+            offset += 20
+            format = next((name for name, info in CompressedImage.FORMATS.items() if dxgiFormat in info[2]), None)
+            if arraySize > 1:
+                raise ValueError('CompressedImage: DDS texture arrays are not supported')
+        else:
+            format = CompressedImage.DDS_FOURCC.get(fourCC)
+        if not pixelFlags & 0x4 or format is None: # DDPF_FOURCC
+            raise ValueError(f'CompressedImage: unsupported DDS pixel format {fourCC}')
+        image = CompressedImage(format, width, height, [])
+        levels = []
+        for level in range(max(1, mipmaps) if flags & 0x20000 else 1): # DDSD_MIPMAPCOUNT
+            length = image.levelBytes(level)
+            levels.append(data[offset:offset + length])
+            offset += length
+        return CompressedImage(format, width, height, levels)
+
+    def toDDS(self):
+        # BC1 and BC3 with the legacy FourCC every reader knows, BC7 needs the DX10 extension header
+        fourCC = next((code for code, format in CompressedImage.DDS_FOURCC.items() if format == self._format), b'DX10')
+        flags = 0x1 | 0x2 | 0x4 | 0x1000 | 0x20000 | 0x80000 # CAPS, HEIGHT, WIDTH, PIXELFORMAT, MIPMAPCOUNT, LINEARSIZE
+        caps = 0x1000 | (0x8 | 0x400000 if len(self._levels) > 1 else 0) # TEXTURE, COMPLEX | MIPMAP
+        header = struct.pack('<7I', 124, flags, self._height, self._width, len(self._levels[0]), 0, len(self._levels))
+        header += bytes(44) + struct.pack('<2I4s5I', 32, 0x4, fourCC, 0, 0, 0, 0, 0)
+        header += struct.pack('<5I', caps, 0, 0, 0, 0)
+        if fourCC == b'DX10':
+            header += struct.pack('<5I', CompressedImage.FORMATS[self._format][2][1], 3, 0, 1, 0) # TEXTURE2D
+        return CompressedImage.DDS_MAGIC + header + b''.join(self._levels)
+
+    @staticmethod
+    def fromKTX2(data):
+        vkFormat, typeSize, width, height, depth, layers, faces, levelCount, supercompression = struct.unpack_from('<9I', data, 12)
+        format = next((name for name, info in CompressedImage.FORMATS.items() if info[3] in (vkFormat, vkFormat - 1)), None)
+        if format is None:
+            raise ValueError(f'CompressedImage: unsupported KTX2 VkFormat {vkFormat}')
+        if depth or layers or faces != 1 or supercompression:
+            raise ValueError('CompressedImage: only 2D KTX2 images without supercompression are supported')
+        levels = []
+        for level in range(max(1, levelCount)):
+            offset, length, uncompressed = struct.unpack_from('<3Q', data, 80 + 24 * level)
+            levels.append(data[offset:offset + length])
+        return CompressedImage(format, width, height, levels)
+
+    def toKTX2(self):
+        glFormat, blockBytes, dxgiFormats, vkFormat, colorModel, encoder = CompressedImage.FORMATS[self._format]
+        # data format descriptor: one basic block, BC3 has separate alpha and color samples
+        samples = [(0, 64, 15), (64, 64, 0)] if self._format == 'BC3' else [(0, blockBytes * 8, 0)]
+        block = struct.pack('<IHH4B4B8B', 0, 2, 24 + 16 * len(samples), colorModel, 1, 1, 0, 3, 3, 0, 0, blockBytes, 0, 0, 0, 0, 0, 0, 0)
+        for bitOffset, bitLength, channel in samples:
+            block += struct.pack('<HBB4BII', bitOffset, bitLength - 1, channel, 0, 0, 0, 0, 0, 0xFFFFFFFF)
+        dfd = struct.pack('<I', 4 + len(block)) + block
+
+        dfdOffset = 12 + 36 + 32 + 24 * len(self._levels)
+        offset = dfdOffset + len(dfd)
+        # levels are stored smallest first, each aligned to the block size
+        offsets = [0] * len(self._levels)
+        for level in reversed(range(len(self._levels))):
+            offset += -offset % blockBytes
+            offsets[level] = offset
+            offset += len(self._levels[level])
+        header = CompressedImage.KTX2_IDENTIFIER
+        header += struct.pack('<9I', vkFormat, 1, self._width, self._height, 0, 0, 1, len(self._levels), 0)
+        header += struct.pack('<4I2Q', dfdOffset, len(dfd), 0, 0, 0, 0)
+        for level, data in enumerate(self._levels):
+            header += struct.pack('<3Q', offsets[level], len(data), len(data))
+        output = bytearray(header + dfd)
+        for level in reversed(range(len(self._levels))):
+            output += bytes(offsets[level] - len(output))
+            output += self._levels[level]
+        return bytes(output)
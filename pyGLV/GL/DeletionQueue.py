@@ -0,0 +1,119 @@
+"""
+DeletionQueue class
+
+Deferred deletion of GL objects released by Python finalizers.
+
+Finalizers (__del__) run whenever the garbage collector decides: in the middle of a frame, on a
+thread without a current GL context, or after the context was destroyed. Instead of calling
+glDelete* themselves, they hand the GL names to DeletionQueue.release(). The render window owns
+the queue (see SDL2Window) and drains it once per frame in display_post(), where its context is
+current, with one batched glDeleteBuffers/glDeleteVertexArrays/glDeleteTextures call per kind of
+object. After the window shut down the context is gone and released names are dropped; without
+any render window (e.g. offscreen tools and tests) names are deleted right away.
+
+"""
+
+from __future__         import annotations
+from collections        import deque
+
+import OpenGL.GL as gl
+
+
+class DeletionQueue:
+    """
+    GL names waiting for deletion at the next safe point of the render loop
+    """
+    BUFFER = 'buffer'
+    VERTEX_ARRAY = 'vertexArray'
+    TEXTURE = 'texture'
+    PROGRAM = 'program'
+    SYNC = 'sync'
+
+    _current = None # queue of the render window whose context is current
+    _discard = False # True once that context was destroyed
+
+    def __init__(self):
+        self._pending = deque() # (kind, name), appended from any thread
+        self.stats = {'deleted': 0, 'calls': 0}
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    @classmethod
+    def current(cls):
+        return cls._current
+
+    def activate(self):
+        """
+        Collect released names in this queue, to be called once the GL context is created
+        """
+        DeletionQueue._current = self
+        DeletionQueue._discard = False
+
+    def deactivate(self):
+        """
+        Delete what is pending and drop names released later, to be called before the GL context is destroyed
+        """
+        self.drain()
+        if DeletionQueue._current is self:
+            DeletionQueue._current = None
+            DeletionQueue._discard = True
+
+    @classmethod
+    def release(cls, kind, *names):
+        """
+        Delete GL objects of `kind` at the next drain() of the current queue, safe to call from finalizers.
+        None and 0 names are ignored.
+        """
+        names = [name for name in names if name]
+        if not names:
+            return
+        queue = cls._current
+        if queue is not None:
+            queue._pending.extend((kind, name) for name in names)
+        elif not cls._discard:
+            DeletionQueue._delete(kind, names)
+
+    def drain(self):
+        """
+        Delete all pending names with one call per kind (glDeleteProgram and glDeleteSync take a single name),
+        needs the GL context of the queue to be current
+
+        :return: number of deleted objects
+        """
+        if not self._pending:
+            return 0
+        grouped = {}
+        while self._pending:
+            kind, name = self._pending.popleft()
+            grouped.setdefault(kind, []).append(name)
+        count = 0
+        for kind, names in grouped.items():
+            self.stats['calls'] += DeletionQueue._delete(kind, names)
+            count += len(names)
+        self.stats['deleted'] += count
+        return count
+
+    @staticmethod
+    def _delete(kind, names):
+        """
+        :return: number of GL calls
+        """
+        if kind == DeletionQueue.BUFFER:
+            gl.glDeleteBuffers(len(names), names)
+        elif kind == DeletionQueue.VERTEX_ARRAY:
+            gl.glDeleteVertexArrays(len(names), names)
+        elif kind == DeletionQueue.TEXTURE:
+            gl.glDeleteTextures(len(names), names)
+        elif kind == DeletionQueue.PROGRAM:
+            for name in names:
+                gl.glDeleteProgram(name)
+            return len(names)
+        elif kind == DeletionQueue.SYNC:
+            for name in names:
+                gl.glDeleteSync(name)
+            return len(names)
+        else:
+            raise ValueError(f'DeletionQueue: unknown kind of GL object {kind}')
+        return 1
@@ -0,0 +1,99 @@
+"""
+DrawBlock class
+
+A Shader Storage Buffer Object (SSBO, GL 4.3 or GL_ARB_shader_storage_buffer_object) holding one
+model matrix per draw of the multi-draw indirect path (see IndirectRenderer): a vertex shader reads
+the matrix of the current draw as models[gl_DrawIDARB] instead of a per-entity model uniform.
+
+The std430 layout matches pyGLV/GL/shaders/draw_block.glsl, the block is declared row_major
+so NumPy matrices are stored as they are:
+
+    =============== ======= ==========================================
+    member          offset  content
+    =============== ======= ==========================================
+    models[]        0       mat4 per draw, 64 bytes each
+    =============== ======= ==========================================
+
+"""
+
+from __future__         import annotations
+import math
+
+import OpenGL.GL as gl
+import numpy as np
+
+
+class DrawBlock:
+    """
+    CPU-side image of the DrawBlock storage block and its GL shader storage buffer
+    """
+    NAME = "DrawBlock"
+    BINDING = 0 # fixed shader storage buffer binding point of the DrawBlock
+    MATRIX_SIZE = 64 # bytes per model matrix
+
+    def __init__(self):
+        self._glid = None
+        self._models = np.zeros((0, 4, 4), np.float32)
+        self._capacity = 0 # matrices allocated on the GPU
+        self._alignment = 1 # GL_SHADER_STORAGE_BUFFER_OFFSET_ALIGNMENT in matrices
+
+    @property
+    def glid(self):
+        return self._glid
+
+    @property
+    def models(self):
+        return self._models
+
+    def init(self):
+        """
+        Create the buffer and read the offset alignment of bound ranges, needs an active GL context
+        """
+        self._glid = gl.glGenBuffers(1)
+        alignment = int(gl.glGetIntegerv(gl.GL_SHADER_STORAGE_BUFFER_OFFSET_ALIGNMENT) or 1)
+        # smallest number of matrices whose size is a multiple of the alignment
+        self._alignment = alignment // math.gcd(alignment, DrawBlock.MATRIX_SIZE)
+
+    def align(self, first):
+        """
+        First matrix index at or after `first` where a range can be bound
+        """
+        return -(-first // self._alignment) * self._alignment
+
+    def reserve(self, count):
+        """
+        Make room for `count` matrices, the values already in models are kept
+        """
+        if count <= len(self._models):
+            return
+        models = np.zeros((count, 4, 4), np.float32)
+        models[:len(self._models)] = self._models
+        self._models = models
+
+    def upload(self):
+        """
+        Upload all matrices in one call, orphaning the storage of the previous frame
+        """
+        if self._glid is None:
+            self.init()
+        gl.glBindBuffer(gl.GL_SHADER_STORAGE_BUFFER, self._glid)
+        if len(self._models) > self._capacity:
+            gl.glBufferData(gl.GL_SHADER_STORAGE_BUFFER, self._models, gl.GL_DYNAMIC_DRAW)
+            self._capacity = len(self._models)
+        else:
+            gl.glBufferData(gl.GL_SHADER_STORAGE_BUFFER, self._capacity * DrawBlock.MATRIX_SIZE, None, gl.GL_DYNAMIC_DRAW)
+            gl.glBufferSubData(gl.GL_SHADER_STORAGE_BUFFER, 0, self._models.nbytes, self._models)
+        gl.glBindBuffer(gl.GL_SHADER_STORAGE_BUFFER, 0)
+
+    def bind(self, first, count):
+        """
+        Bind the matrices [first, first + count) to the binding point, models[0] of the shader is `first`
+        """
+        gl.glBindBufferRange(gl.GL_SHADER_STORAGE_BUFFER, DrawBlock.BINDING, self._glid,
+                             first * DrawBlock.MATRIX_SIZE, count * DrawBlock.MATRIX_SIZE)
+
+    def delete(self):
+        if self._glid is not None:
+            gl.glDeleteBuffers(1, [self._glid])
+            self._glid = None
+        self._capacity = 0
@@ -0,0 +1,131 @@
+"""
+FrameBlock class
+
+A Uniform Buffer Object (UBO) holding the per-frame camera and light data that is shared by all shaders:
+it is written once per frame and bound to a fixed binding point, instead of every entity uploading
+its own copy of view/projection/camera/light uniforms.
+
+The std140 layout matches Shader.FRAME_BLOCK:
+
+    =============== ======= ==========================================
+    member          offset  content
+    =============== ======= ==========================================
+    view            0       mat4
+    projection      64      mat4
+    viewProj        128     mat4, projection @ view
+    viewPos         192     vec4, camera position in xyz
+    lightPos        208     vec4, light position in xyz
+    lightColor      224     vec4, light color in rgb, intensity in w
+    ambientColor    240     vec4, ambient color in rgb, strength in w
+    =============== ======= ==========================================
+
+"""
+
+from __future__         import annotations
+
+import OpenGL.GL as gl
+import numpy as np
+
+
+class FrameBlock:
+    """
+    CPU-side std140 image of the FrameBlock uniform block and its GL uniform buffer
+    """
+    NAME = "FrameBlock"
+    BINDING = 0 # fixed uniform buffer binding point of the FrameBlock
+    SIZE = 256 # bytes
+
+    def __init__(self):
+        self._glid = None
+        self._data = np.zeros(FrameBlock.SIZE // 4, np.float32)
+        # in-place views on the std140 image, matrices are kept row-major (block is declared row_major)
+        self._view = self._data[0:16].reshape(4,4)
+        self._projection = self._data[16:32].reshape(4,4)
+        self._viewProj = self._data[32:48].reshape(4,4)
+        self._viewPos = self._data[48:52]
+        self._lightPos = self._data[52:56]
+        self._lightColor = self._data[56:60]
+        self._ambientColor = self._data[60:64]
+        self._view[...] = np.identity(4)
+        self._projection[...] = np.identity(4)
+        self._viewProj[...] = np.identity(4)
+        self._lightColor[...] = (1.0, 1.0, 1.0, 1.0)
+        self._ambientColor[...] = (1.0, 1.0, 1.0, 0.3)
+        self._dirty = True
+
+    @property
+    def glid(self):
+        return self._glid
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def view(self):
+        return self._view
+
+    @property
+    def projection(self):
+        return self._projection
+
+    @property
+    def viewProj(self):
+        return self._viewProj
+
+    @property
+    def viewPos(self):
+        return self._viewPos[:3]
+
+    def setCamera(self, view, projection=None, eye=None):
+        """
+        Set the camera of this frame; viewProj is computed here once for all shaders.
+
+        :param eye: camera position, taken from the inverse view matrix if omitted
+        """
+        self._view[...] = view
+        if projection is not None:
+            self._projection[...] = projection
+        np.matmul(self._projection, self._view, out=self._viewProj)
+        if eye is None:
+            eye = np.linalg.inv(self._view)[:3, 3]
+        self._viewPos[:3] = np.asarray(eye).reshape(-1)[:3]
+        self._dirty = True
+
+    def setLight(self, position=None, color=None, intensity=None, ambientColor=None, ambientStr=None):
+        """
+        Set the light parameters of this frame, omitted parameters keep their value
+        """
+        if position is not None:
+            self._lightPos[:3] = np.asarray(position).reshape(-1)[:3]
+        if color is not None:
+            self._lightColor[:3] = np.asarray(color).reshape(-1)[:3]
+        if intensity is not None:
+            self._lightColor[3] = intensity
+        if ambientColor is not None:
+            self._ambientColor[:3] = np.asarray(ambientColor).reshape(-1)[:3]
+        if ambientStr is not None:
+            self._ambientColor[3] = ambientStr
+        self._dirty = True
+
+    def init(self):
+        """
+        Create the uniform buffer and attach it to the FrameBlock binding point, needs an active GL context
+        """
+        self._glid = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self._glid)
+        gl.glBufferData(gl.GL_UNIFORM_BUFFER, self._data.nbytes, None, gl.GL_DYNAMIC_DRAW)
+        gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, FrameBlock.BINDING, self._glid)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+        self._dirty = True
+
+    def update(self):
+        """
+        Upload the block if anything changed since the last upload, called once per frame
+        """
+        if not self._dirty or self._glid is None:
+            return
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self._glid)
+        gl.glBufferSubData(gl.GL_UNIFORM_BUFFER, 0, self._data.nbytes, self._data)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+        self._dirty = False
@@ -0,0 +1,201 @@
+"""
+GPUMemory class
+
+A process-wide account of the GPU memory allocated by pyGLV objects: VertexArray buffers,
+GeometryArena pools, Texture and Texture3D images. GL offers no portable way to query how much
+video memory an application uses, so every object registers the byte size of the storage it
+allocates (data.nbytes of its buffers, width x height x 4 bytes per RGBA8 texture level including
+mip chains) and updates or removes it when the storage is reallocated or deleted.
+
+The tracker keeps per-category totals and peaks and lists the largest resources, e.g.
+
+    print(GPUMemory.report(10))
+
+ImGUIDecorator shows the same figures in its "GPU memory" window. An optional soft budget calls
+eviction callbacks whenever a registration exceeds it; the callbacks free what they can (e.g.
+textures not drawn lately) by deleting it, which unregisters its memory. The budget is never
+enforced by refusing allocations.
+
+"""
+
+from __future__         import annotations
+
+
+class GPUMemory:
+    """
+    Process-wide registry of the GPU memory of buffers and textures, by owner and category
+    """
+    VERTEX = 'vertex'
+    INDEX = 'index'
+    INSTANCE = 'instance'
+    ARENA = 'arena'
+    TEXTURE = 'texture'
+    CUBE_MAP = 'cubeMap'
+
+    _resources = {} # (id of owner, category) -> [category, bytes, label]
+    _totals = {} # category -> bytes
+    _peaks = {} # category -> bytes, '' for the overall peak
+    _budget = None # soft limit in bytes
+    _callbacks = [] # called with the bytes over budget
+    _evicting = False
+    _warned = False # over budget was printed, until the total is within the budget again
+
+    @staticmethod
+    def textureBytes(width, height, mipmaps=False, layers=1, bytesPerPixel=4):
+        """
+        Bytes of a texture image, by default RGBA8
+
+        :param mipmaps: add the levels of a full mip chain down to 1x1, as glGenerateMipmap creates
+        :param layers: images of the texture, e.g. 6 for a cube map
+        """
+        size = width * height
+        while mipmaps and (width > 1 or height > 1):
+            width, height = max(1, width >> 1), max(1, height >> 1)
+            size += width * height
+        return size * bytesPerPixel * layers
+
+    @classmethod
+    def register(cls, owner, category, nbytes, label=None):
+        """
+        Set the bytes `owner` allocated for `category`, replacing what it registered before,
+        e.g. after a buffer was reallocated with a new size
+        """
+        key = (id(owner), category)
+        entry = cls._resources.get(key)
+        if entry is not None:
+            cls._totals[category] -= entry[1]
+        if label is None:
+            label = entry[2] if entry is not None else GPUMemory._label(owner)
+        cls._resources[key] = [category, int(nbytes), label]
+        cls._totals[category] = cls._totals.get(category, 0) + int(nbytes)
+        cls._peaks[category] = max(cls._peaks.get(category, 0), cls._totals[category])
+        cls._peaks[''] = max(cls._peaks.get('', 0), cls.total())
+        cls._checkBudget()
+
+    @classmethod
+    def unregister(cls, owner, category=None):
+        """
+        Remove the memory of `owner`, of one category or of all
+        """
+        for key in [key for key in cls._resources if key[0] == id(owner) and category in (None, key[1])]:
+            entry = cls._resources.pop(key)
+            cls._totals[entry[0]] -= entry[1]
+
+    @classmethod
+    def total(cls, category=None):
+        """
+        Bytes currently registered, in `category` or overall
+        """
+        if category is not None:
+            return cls._totals.get(category, 0)
+        return sum(cls._totals.values())
+
+    @classmethod
+    def totals(cls):
+        """
+        Bytes per category, categories without resources are left out
+        """
+        return {category: total for category, total in cls._totals.items() if total}
+
+    @classmethod
+    def peak(cls, category=None):
+        """
+        Largest total seen since the last reset(), in `category` or overall
+        """
+        return cls._peaks.get('' if category is None else category, 0)
+
+    @classmethod
+    def count(cls, category=None):
+        return sum(1 for entry in cls._resources.values() if category in (None, entry[0]))
+
+    @classmethod
+    def top(cls, n=10):
+        """
+        The `n` largest resources as (label, category, bytes), largest first
+        """
+        entries = sorted(cls._resources.values(), key=lambda entry: entry[1], reverse=True)
+        return [(label, category, nbytes) for category, nbytes, label in entries[:n]]
+
+    @classmethod
+    def report(cls, n=10):
+        lines = [f'GPUMemory: {GPUMemory.format(cls.total())} in {cls.count()} resources, '
+                 f'peak {GPUMemory.format(cls.peak())}'
+                 + (f', budget {GPUMemory.format(cls._budget)}' if cls._budget is not None else '')]
+        for category, total in sorted(cls.totals().items()):
+            lines.append(f'  {category:<10} {GPUMemory.format(total):>12}   peak {GPUMemory.format(cls.peak(category))}')
+        if cls._resources:
+            lines.append(f'  largest {min(n, len(cls._resources))}:')
+            for label, category, nbytes in cls.top(n):
+                lines.append(f'  {GPUMemory.format(nbytes):>12}  {category:<10} {label}')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def format(nbytes):
+        for unit in ('B', 'KiB', 'MiB'):
+            if abs(nbytes) < 1024:
+                return f'{nbytes:.1f} {unit}' if unit != 'B' else f'{nbytes} B'
+            nbytes /= 1024.0
+        return f'{nbytes:.1f} GiB'
+
+    @classmethod
+    def budget(cls):
+        return cls._budget
+
+    @classmethod
+    def setBudget(cls, nbytes):
+        """
+        Set the soft budget in bytes, None for no budget
+        """
+        cls._budget = None if nbytes is None else int(nbytes)
+        cls._checkBudget()
+
+    @classmethod
+    def addEvictionCallback(cls, callback):
+        """
+        Call `callback(bytesOverBudget)` whenever the budget is exceeded, callbacks are called in the
+        order they were added until the total is within the budget again
+        """
+        if callback not in cls._callbacks:
+            cls._callbacks.append(callback)
+
+    @classmethod
+    def removeEvictionCallback(cls, callback):
+        if callback in cls._callbacks:
+            cls._callbacks.remove(callback)
+
+    @classmethod
+    def reset(cls):
+        """
+        Forget all resources, peaks, the budget and callbacks, e.g. for a new GL context
+        """
+        cls._resources = {}
+        cls._totals = {}
+        cls._peaks = {}
+        cls._budget = None
+        cls._callbacks = []
+        cls._warned = False
+
+    @classmethod
+    def _checkBudget(cls):
+        if cls._budget is None or cls.total() <= cls._budget:
+            cls._warned = False
+            return
+        if cls._evicting:
+            return
+        # callbacks unregister the memory they free, which must not start another round of eviction
+        cls._evicting = True
+        try:
+            for callback in list(cls._callbacks):
+                callback(cls.total() - cls._budget)
+                if cls.total() <= cls._budget:
+                    return
+        finally:
+            cls._evicting = False
+        if not cls._warned:
+            cls._warned = True
+            print(f'GPUMemory: {GPUMemory.format(cls.total())} in use, over the budget of {GPUMemory.format(cls._budget)}')
+
+    @staticmethod
+    def _label(owner):
+        name = getattr(owner, 'name', None)
+        return f'{type(owner).__name__} {name}' if name else f'{type(owner).__name__} {id(owner):#x}'
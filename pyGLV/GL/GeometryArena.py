@@ -0,0 +1,504 @@
+"""
+GeometryArena classes
+
+Suballocation of many meshes from a few large GPU buffers.
+
+Meshes with the same vertex format (the shader locations and components of their attributes)
+and index type share one GeometryPool: a single interleaved vertex buffer, a single index buffer
+and a single vertex array object. Every mesh owns a range of vertices and a range of indices,
+handed out by a first-fit FreeList that merges neighbouring free ranges when a mesh is freed.
+Indices are stored relative to the first vertex of their mesh and drawn with
+glDrawElementsBaseVertex, so consecutive draws of a pool need no VAO rebind and uint16 indices
+serve every mesh of up to 65,536 vertices, wherever it lies in the buffer.
+
+A pool that runs out of space compacts its ranges when enough space is free in total
+(see GeometryPool.defragment()) and doubles its buffers otherwise. Buffers are resized and
+compacted on the GPU with glCopyBufferSubData, no CPU copy of the geometry is kept.
+
+"""
+
+from __future__         import annotations
+import ctypes
+
+import OpenGL.GL as gl
+import numpy as np
+
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.VertexFormat import VertexFormat
+
+
+class FreeList:
+    """
+    First-fit allocator of ranges in [0, capacity), free ranges are kept sorted and merged
+    """
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._free = [[0, capacity]] if capacity else [] # [offset, size] sorted by offset
+        self._used = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def used(self):
+        return self._used
+
+    @property
+    def freeRanges(self):
+        return [tuple(r) for r in self._free]
+
+    def largestFree(self):
+        return max((size for offset, size in self._free), default=0)
+
+    def fragmentation(self):
+        """
+        Share of the free space that is not in the largest free range: 0.0 when all free space is
+        contiguous, close to 1.0 when it is scattered in many small ranges
+        """
+        free = self._capacity - self._used
+        if not free:
+            return 0.0
+        return 1.0 - self.largestFree() / free
+
+    def allocate(self, size):
+        """
+        :return: offset of a range of `size` units, or None if no free range is large enough
+        """
+        if size <= 0:
+            raise ValueError(f'FreeList: cannot allocate {size} units')
+        for entry in self._free:
+            if entry[1] >= size:
+                offset = entry[0]
+                entry[0] += size
+                entry[1] -= size
+                if not entry[1]:
+                    self._free.remove(entry)
+                self._used += size
+                return offset
+        return None
+
+    def free(self, offset, size):
+        """
+        Return the range at `offset` and merge it with its free neighbours
+        """
+        i = 0
+        while i < len(self._free) and self._free[i][0] < offset:
+            i += 1
+        self._free.insert(i, [offset, size])
+        self._used -= size
+        if i + 1 < len(self._free) and offset + size == self._free[i + 1][0]:
+            self._free[i][1] += self._free.pop(i + 1)[1]
+        if i > 0 and self._free[i - 1][0] + self._free[i - 1][1] == offset:
+            self._free[i - 1][1] += self._free.pop(i)[1]
+
+    def grow(self, capacity):
+        """
+        Extend the range to `capacity`, the new space is added after the last range
+        """
+        if self._free and self._free[-1][0] + self._free[-1][1] == self._capacity:
+            self._free[-1][1] += capacity - self._capacity
+        else:
+            self._free.append([self._capacity, capacity - self._capacity])
+        self._capacity = capacity
+
+    def compact(self, used):
+        """
+        Reset to `used` units allocated from offset 0 on, after the ranges were moved together
+        """
+        self._used = used
+        self._free = [[used, self._capacity - used]] if used < self._capacity else []
+
+
+class GeometryAllocation:
+    """
+    The vertex and index ranges of one mesh in a GeometryPool, the offsets change when the pool is defragmented
+    """
+    __slots__ = ('pool', 'vertexOffset', 'vertexCount', 'indexOffset', 'indexCount')
+
+    def __init__(self, pool, vertexOffset, vertexCount, indexOffset, indexCount):
+        self.pool = pool
+        self.vertexOffset = vertexOffset
+        self.vertexCount = vertexCount
+        self.indexOffset = indexOffset
+        self.indexCount = indexCount
+
+    def draw(self, primitive):
+        self.pool.bind()
+        if self.indexCount:
+            gl.glDrawElementsBaseVertex(primitive, self.indexCount, self.pool.indexType,
+                                        ctypes.c_void_p(self.indexOffset * self.pool.indexSize), self.vertexOffset)
+        else:
+            gl.glDrawArrays(primitive, self.vertexOffset, self.vertexCount)
+
+
+class GeometryPool:
+    """
+    One vertex buffer, index buffer and VAO shared by all meshes of a vertex format and index type
+    """
+    INDEX_SIZES = {gl.GL_UNSIGNED_BYTE: 1, gl.GL_UNSIGNED_SHORT: 2, gl.GL_UNSIGNED_INT: 4}
+
+    def __init__(self, layout, stride, indexType, vertexCapacity, indexCapacity, formats=None):
+        self._layout = layout # (shader location, components, byte offset) per attribute
+        self._formats = formats or {} # shader location -> VertexFormat of attributes that are not FLOAT
+        self._stride = stride
+        self._indexType = indexType
+        self._indexSize = GeometryPool.INDEX_SIZES[indexType]
+        self._vertices = FreeList(vertexCapacity)
+        self._indices = FreeList(indexCapacity)
+        self._allocations = []
+        self._glid = None
+        self._vertexBuffer = None
+        self._indexBuffer = None
+        self._version = 0 # incremented whenever meshes move, see defragment()
+
+    @property
+    def glid(self):
+        return self._glid
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def indexType(self):
+        return self._indexType
+
+    @property
+    def indexSize(self):
+        return self._indexSize
+
+    @property
+    def vertices(self):
+        return self._vertices
+
+    @property
+    def indices(self):
+        return self._indices
+
+    @property
+    def allocations(self):
+        return self._allocations
+
+    def init(self):
+        """
+        Create the buffers and the VAO, needs an active GL context
+        """
+        self._glid = gl.glGenVertexArrays(1)
+        self._vertexBuffer = self._createBuffer(self._vertices.capacity * self._stride)
+        self._indexBuffer = self._createBuffer(self._indices.capacity * self._indexSize)
+        self._pointAttributes()
+        self._track()
+
+    def bind(self):
+        """
+        Bind the shared VAO unless it is still bound from the previous draw
+        """
+        if GeometryArena._bound is not self:
+            gl.glBindVertexArray(self._glid)
+            GeometryArena._bound = self
+
+    def allocate(self, data, index=None):
+        """
+        Copy a mesh into free ranges of the buffers
+
+        :param data: interleaved vertices in the layout of the pool, one row per vertex
+        :param index: indices relative to the first vertex of the mesh, of the pool's index type
+        :return: GeometryAllocation
+        """
+        if not len(data):
+            raise ValueError('GeometryArena: cannot allocate a mesh without vertices')
+        if self._vertexBuffer is None:
+            self.init()
+        indexCount = 0 if index is None else len(index)
+        vertexOffset, indexOffset = self._reserve(len(data), indexCount)
+        self._upload(self._vertexBuffer, vertexOffset * self._stride, data)
+        if indexCount:
+            self._upload(self._indexBuffer, indexOffset * self._indexSize, index)
+        allocation = GeometryAllocation(self, vertexOffset, len(data), indexOffset, indexCount)
+        self._allocations.append(allocation)
+        return allocation
+
+    def allocateMany(self, meshes):
+        """
+        Copy several meshes into one vertex range and one index range, with a single upload each
+
+        :param meshes: list of (data, index) as for allocate()
+        :return: list of GeometryAllocation, in the order of meshes
+        """
+        if not meshes or not all(len(data) for data, index in meshes):
+            raise ValueError('GeometryArena: cannot allocate meshes without vertices')
+        vertexCount = sum(len(data) for data, index in meshes)
+        indexCount = sum(len(index) for data, index in meshes if index is not None)
+        if self._vertexBuffer is None:
+            # create the buffers large enough for all meshes instead of growing them afterwards
+            if vertexCount > self._vertices.capacity:
+                self._vertices.grow(vertexCount)
+            if indexCount > self._indices.capacity:
+                self._indices.grow(indexCount)
+            self.init()
+        vertexOffset, indexOffset = self._reserve(vertexCount, indexCount)
+        self._upload(self._vertexBuffer, vertexOffset * self._stride, np.concatenate([data for data, index in meshes]))
+        if indexCount:
+            self._upload(self._indexBuffer, indexOffset * self._indexSize,
+                         np.concatenate([index for data, index in meshes if index is not None]))
+        allocations = []
+        for data, index in meshes:
+            count = 0 if index is None else len(index)
+            allocations.append(GeometryAllocation(self, vertexOffset, len(data), indexOffset if count else 0, count))
+            vertexOffset += len(data)
+            indexOffset += count
+        self._allocations += allocations
+        return allocations
+
+    def free(self, allocation:GeometryAllocation):
+        """
+        Give the ranges of a mesh back to the pool, the GPU memory is reused by later allocations
+        """
+        self._allocations.remove(allocation)
+        self._vertices.free(allocation.vertexOffset, allocation.vertexCount)
+        if allocation.indexCount:
+            self._indices.free(allocation.indexOffset, allocation.indexCount)
+        allocation.pool = None
+
+    def defragment(self):
+        """
+        Move all meshes to the start of the buffers, in their current order, so that the free
+        space is one range at the end. Ranges are copied on the GPU into new buffers.
+        """
+        if self._vertexBuffer is None:
+            return
+        self._vertexBuffer = self._compact(self._vertexBuffer, self._vertices, self._stride, 'vertexOffset', 'vertexCount')
+        self._indexBuffer = self._compact(self._indexBuffer, self._indices, self._indexSize, 'indexOffset', 'indexCount')
+        self._pointAttributes()
+        self._version += 1
+
+    def delete(self):
+        if self._vertexBuffer is None:
+            return
+        gl.glDeleteVertexArrays(1, [self._glid])
+        gl.glDeleteBuffers(2, [self._vertexBuffer, self._indexBuffer])
+        if GeometryArena._bound is self:
+            GeometryArena._bound = None
+        GPUMemory.unregister(self)
+        self._glid = self._vertexBuffer = self._indexBuffer = None
+
+    def stats(self):
+        vertexBytes = self._vertices.capacity * self._stride
+        indexBytes = self._indices.capacity * self._indexSize
+        usedBytes = self._vertices.used * self._stride + self._indices.used * self._indexSize
+        return {
+            'meshes': len(self._allocations),
+            'capacityBytes': vertexBytes + indexBytes,
+            'usedBytes': usedBytes,
+            'utilization': usedBytes / (vertexBytes + indexBytes) if vertexBytes + indexBytes else 0.0,
+            'vertexFragmentation': self._vertices.fragmentation(),
+            'indexFragmentation': self._indices.fragmentation(),
+            'freeRanges': len(self._vertices.freeRanges) + len(self._indices.freeRanges),
+        }
+
+    def _track(self):
+        """
+        Register the capacity of both buffers with GPUMemory, meshes in the pool are not counted separately
+        """
+        GPUMemory.register(self, GPUMemory.ARENA, self._vertices.capacity * self._stride + self._indices.capacity * self._indexSize,
+                           f'GeometryPool {self._stride} bytes/vertex')
+
+    def _reserve(self, vertexCount, indexCount):
+        """
+        Allocate the vertex and index ranges of a mesh, growing the buffers or compacting the pool when
+        no free range fits. Both are made to fit before either is allocated: defragment() only moves
+        the meshes in _allocations and would drop a range reserved for the mesh being added.
+
+        :return: (vertex offset, index offset), index offset 0 without indices
+        """
+        sizes = [(self._vertices, vertexCount), (self._indices, indexCount)]
+        if any(size and freeList.largestFree() < size for freeList, size in sizes):
+            for freeList, size in sizes:
+                if freeList.capacity - freeList.used < size:
+                    self._grow(freeList, max(2 * freeList.capacity, freeList.used + size))
+            if any(size and freeList.largestFree() < size for freeList, size in sizes):
+                self.defragment()
+        return tuple(freeList.allocate(size) if size else 0 for freeList, size in sizes)
+
+    def _grow(self, freeList, capacity):
+        unit = self._stride if freeList is self._vertices else self._indexSize
+        old = self._vertexBuffer if freeList is self._vertices else self._indexBuffer
+        buffer = self._createBuffer(capacity * unit)
+        self._copy(old, buffer, 0, 0, freeList.capacity * unit)
+        gl.glDeleteBuffers(1, [old])
+        freeList.grow(capacity)
+        if freeList is self._vertices:
+            self._vertexBuffer = buffer
+        else:
+            self._indexBuffer = buffer
+        self._pointAttributes()
+        self._track()
+        print(f'GeometryPool: grown to {capacity} {"vertices" if freeList is self._vertices else "indices"}')
+
+    def _compact(self, old, freeList, unit, offsetName, countName):
+        buffer = self._createBuffer(freeList.capacity * unit)
+        offset = 0
+        for allocation in sorted(self._allocations, key=lambda a: getattr(a, offsetName)):
+            count = getattr(allocation, countName)
+            if not count:
+                continue
+            self._copy(old, buffer, getattr(allocation, offsetName) * unit, offset * unit, count * unit)
+            setattr(allocation, offsetName, offset)
+            offset += count
+        gl.glDeleteBuffers(1, [old])
+        freeList.compact(offset)
+        return buffer
+
+    def _createBuffer(self, size):
+        buffer = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, buffer)
+        gl.glBufferData(gl.GL_COPY_WRITE_BUFFER, size, None, gl.GL_STATIC_DRAW)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+        return buffer
+
+    @staticmethod
+    def _upload(buffer, byteOffset, data):
+        # GL_COPY_WRITE_BUFFER leaves the GL_ARRAY_BUFFER and the VAO's element buffer bindings alone
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, buffer)
+        gl.glBufferSubData(gl.GL_COPY_WRITE_BUFFER, byteOffset, data.nbytes, data)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+
+    @staticmethod
+    def _copy(source, destination, sourceOffset, destinationOffset, size):
+        gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, source)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, destination)
+        gl.glCopyBufferSubData(gl.GL_COPY_READ_BUFFER, gl.GL_COPY_WRITE_BUFFER, sourceOffset, destinationOffset, size)
+        gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+
+    def _pointAttributes(self):
+        """
+        (Re)attach the current buffers to the VAO, after init, growth or defragmentation
+        """
+        gl.glBindVertexArray(self._glid)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._vertexBuffer)
+        for loc, size, offset in self._layout:
+            format = self._formats.get(loc, VertexFormat.FLOAT)
+            gl.glEnableVertexAttribArray(loc)
+            gl.glVertexAttribPointer(loc, format.components(size), format.type, format.normalized, self._stride, ctypes.c_void_p(offset))
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._indexBuffer)
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        GeometryArena._bound = None
+
+
+class GeometryArena:
+    """
+    Registry of GeometryPools, one per vertex format and index type
+    """
+    VERTEX_CAPACITY = 65536 # initial vertices per pool
+    INDEX_CAPACITY = 3 * 65536 # initial indices per pool
+
+    _default = None
+    _bound = None # GeometryPool whose VAO is currently bound
+
+    def __init__(self, vertexCapacity=VERTEX_CAPACITY, indexCapacity=INDEX_CAPACITY):
+        self._vertexCapacity = vertexCapacity
+        self._indexCapacity = indexCapacity
+        self._pools = {} # (layout, stride, index type, formats) -> GeometryPool
+
+    @classmethod
+    def default(cls):
+        """
+        The arena shared by all VertexArrays created with arena=True
+        """
+        if cls._default is None:
+            cls._default = GeometryArena()
+        return cls._default
+
+    @classmethod
+    def unbound(cls):
+        """
+        To be called whenever a VAO is bound outside of the arena, so that the next draw of a pool binds its VAO again
+        """
+        cls._bound = None
+
+    @property
+    def pools(self):
+        return self._pools
+
+    def allocate(self, data, layout, stride, index=None, indexType=gl.GL_UNSIGNED_SHORT, formats=None):
+        """
+        Copy an interleaved mesh (see VertexArray.interleave and VertexArray.narrow_index) into
+        the pool of its vertex format, needs an active GL context
+
+        :param formats: dict shader location -> VertexFormat of the attributes, FLOAT if not listed
+        :return: GeometryAllocation, to be drawn with its draw() and given back with free()
+        """
+        return self._pool(layout, stride, indexType, formats).allocate(data, index)
+
+    def allocateMany(self, meshes):
+        """
+        Copy many meshes at once, e.g. all static meshes of a scene: the meshes of each pool are
+        uploaded with one call for their vertices and one for their indices
+
+        :param meshes: list of (data, layout, stride, index, indexType, formats) as for allocate()
+        :return: list of GeometryAllocation, in the order of meshes
+        """
+        groups = {} # pool -> [(position in meshes, (data, index))]
+        for i, (data, layout, stride, index, indexType, formats) in enumerate(meshes):
+            if not len(data):
+                # before any pool allocates, so that no mesh is left allocated
+                raise ValueError(f'GeometryArena: mesh {i} has no vertices')
+            pool = self._pool(layout, stride, indexType, formats)
+            groups.setdefault(pool, []).append((i, (data, index)))
+        allocations = [None] * len(meshes)
+        for pool, entries in groups.items():
+            for (i, mesh), allocation in zip(entries, pool.allocateMany([mesh for i, mesh in entries])):
+                allocations[i] = allocation
+        return allocations
+
+    def _pool(self, layout, stride, indexType, formats):
+        formats = {loc: VertexFormat.get(format) for loc, format in (formats or {}).items()
+                   if VertexFormat.get(format) is not VertexFormat.FLOAT}
+        key = (tuple(layout), stride, indexType, tuple(sorted((loc, format.name) for loc, format in formats.items())))
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = GeometryPool(list(layout), stride, indexType, self._vertexCapacity, self._indexCapacity, formats)
+            self._pools[key] = pool
+        return pool
+
+    def free(self, allocation:GeometryAllocation):
+        if allocation.pool is not None:
+            allocation.pool.free(allocation)
+
+    def defragment(self):
+        for pool in self._pools.values():
+            pool.defragment()
+
+    def delete(self):
+        """
+        Delete all pools, e.g. before the GL context is destroyed
+        """
+        for pool in self._pools.values():
+            pool.delete()
+        self._pools = {}
+
+    def stats(self):
+        """
+        Totals over all pools: meshes, bytes allocated on the GPU and in use, utilization,
+        and the largest vertex/index fragmentation of a pool
+        """
+        stats = [pool.stats() for pool in self._pools.values()]
+        capacity = sum(s['capacityBytes'] for s in stats)
+        used = sum(s['usedBytes'] for s in stats)
+        return {
+            'pools': len(stats),
+            'meshes': sum(s['meshes'] for s in stats),
+            'capacityBytes': capacity,
+            'usedBytes': used,
+            'utilization': used / capacity if capacity else 0.0,
+            'fragmentation': max((max(s['vertexFragmentation'], s['indexFragmentation']) for s in stats), default=0.0),
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"GeometryArena: {stats['meshes']} meshes in {stats['pools']} pools, "
+                f"{stats['usedBytes'] / 1024.0:.1f} of {stats['capacityBytes'] / 1024.0:.1f} KiB used "
+                f"({stats['utilization'] * 100.0:.1f}%), fragmentation {stats['fragmentation'] * 100.0:.1f}%")
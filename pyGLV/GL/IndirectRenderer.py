@@ -0,0 +1,194 @@
+"""
+IndirectRenderer classes
+
+A batching variant of RenderGLShaderSystem for large, mostly static scenes.
+
+Entities opt in through the INDIRECT variant of a library shader, e.g.
+Shader(vertex_source=Shader.VERT_PHONG_UBER, defines={'FRAME_BLOCK': True, 'INDIRECT': True}),
+whose model matrix is read from the DrawBlock storage buffer by gl_DrawIDARB (see draw_block.glsl).
+During the traversal their VertexArrays are only collected; flush() then groups them by program,
+uniform values, textures, GeometryArena pool (i.e. vertex format and buffers) and primitive,
+writes one DrawElementsIndirectCommand per entity into a GL_DRAW_INDIRECT_BUFFER and submits every
+group with a single glMultiDrawElementsIndirect, so that a group costs one glUseProgram and one
+VAO bind. Per frame only the model matrices (BasicTransform.l2world) are uploaded, in one call.
+
+Groups are rebuilt when the visited entities change or a pool was defragmented; after changing
+uniform values or textures of batched entities call invalidate(). Without GL 4.3 and
+GL_ARB_shader_draw_parameters (e.g. on 4.1 contexts) the INDIRECT shaders declare the usual model
+uniform, which is set from BasicTransform.l2world, and entities are drawn one by one as by
+RenderGLShaderSystem.
+
+"""
+
+from __future__         import annotations
+import ctypes
+
+import OpenGL.GL as gl
+from OpenGL.GL.ARB.shader_draw_parameters import glInitShaderDrawParametersARB
+from OpenGL.GL.ARB.shader_storage_buffer_object import glInitShaderStorageBufferObjectARB
+import numpy as np
+
+from pyECSS.Component import BasicTransform, RenderMesh
+from pyGLV.GL.Shader import Shader, ShaderGLDecorator, RenderGLShaderSystem
+from pyGLV.GL.VertexArray import VertexArray
+from pyGLV.GL.DrawBlock import DrawBlock
+
+
+class IndirectRenderGLShaderSystem(RenderGLShaderSystem):
+    """A RenderGLShaderSystem that submits the entities of INDIRECT shaders in multi-draw indirect batches,
+    flush() draws them after each traverse_visit()
+    """
+    # DrawElementsIndirectCommand of glMultiDrawElementsIndirect
+    COMMAND = np.dtype([('count', np.uint32), ('instanceCount', np.uint32), ('firstIndex', np.uint32),
+                        ('baseVertex', np.int32), ('baseInstance', np.uint32)])
+    _available = None # None: not detected yet
+
+    def __init__(self, name=None, type=None, id=None):
+        super().__init__(name, type, id)
+        self._queue = [] # (VertexArray, Shader or ShaderGLDecorator, BasicTransform) visited since the last flush()
+        self._built = [] # the queue the batches were built for
+        self._versions = [] # pool versions the batches were built for
+        self._batches = [] # (shader, pool or VertexArray, primitive, first DrawBlock matrix, draw count, command byte offset)
+        self._slots = [] # (BasicTransform, DrawBlock matrix index)
+        self._commands = np.zeros(0, IndirectRenderGLShaderSystem.COMMAND)
+        self._commandBuffer = None
+        self._drawBlock = DrawBlock()
+        self.stats = {'batches': 0, 'draws': 0, 'builds': 0}
+
+    @classmethod
+    def available(cls):
+        """
+        Detect once whether the context can draw multi-draw indirect batches, needs an active GL context
+        """
+        if cls._available is None:
+            cls._available = bool(gl.glMultiDrawElementsIndirect) and bool(glInitShaderDrawParametersARB()) \
+                and bool(glInitShaderStorageBufferObjectARB())
+            print(f'IndirectRenderGLShaderSystem: multi-draw indirect {"enabled" if cls._available else "not supported, drawing entities one by one"}')
+        return cls._available
+
+    @property
+    def drawBlock(self):
+        return self._drawBlock
+
+    @property
+    def commands(self):
+        return self._commands
+
+    def invalidate(self):
+        """
+        Regroup the entities on the next flush(), e.g. after uniform values or textures changed
+        """
+        self._built = []
+
+    def apply2VertexArray(self, vertexArray:VertexArray):
+        parentEntity = vertexArray.parent
+        compRenderMesh = parentEntity.getChildByType(RenderMesh.getClassName())
+        compShader = parentEntity.getChildByType(Shader.getClassName())
+        if not compShader:
+            compShader = parentEntity.getChildByType(ShaderGLDecorator.getClassName())
+        if not (vertexArray and compRenderMesh and compShader):
+            return
+        shader = IndirectRenderGLShaderSystem._shader(compShader)
+        compTransform = parentEntity.getChildByType(BasicTransform.getClassName())
+        if not (shader.defines or {}).get('INDIRECT') or compTransform is None:
+            self.render(vertexArray, compRenderMesh, compShader)
+        elif not self.available():
+            shader.mat4fDict['model'] = compTransform.l2world
+            self.render(vertexArray, compRenderMesh, compShader)
+        else:
+            self._queue.append((vertexArray, compShader, compTransform))
+
+    def flush(self):
+        """
+        Draw the VertexArrays collected by the last traverse_visit(), one glMultiDrawElementsIndirect per batch
+        """
+        queue, self._queue = self._queue, []
+        if not queue:
+            return
+        versions = [vertexArray.allocation.pool.version for vertexArray, shader, transform in queue if vertexArray.allocation is not None]
+        if (len(queue) != len(self._built) or versions != self._versions
+                or any(a[0] is not b[0] or a[1] is not b[1] for a, b in zip(queue, self._built))):
+            self._build(queue)
+            self._built, self._versions = queue, versions
+
+        models = self._drawBlock.models
+        for transform, slot in self._slots:
+            models[slot] = transform.l2world
+        self._drawBlock.upload()
+
+        gl.glBindBuffer(gl.GL_DRAW_INDIRECT_BUFFER, self._commandBuffer)
+        for compShader, source, primitive, first, count, offset in self._batches:
+            compShader.enableShader()
+            self._drawBlock.bind(first, count)
+            if offset is None:
+                source.draw() # a VertexArray of its own, drawn as draw 0 of the bound range
+            else:
+                source.bind()
+                gl.glMultiDrawElementsIndirect(primitive, source.indexType, ctypes.c_void_p(offset), count, 0)
+        compShader.disableShader()
+        gl.glBindBuffer(gl.GL_DRAW_INDIRECT_BUFFER, 0)
+
+    def _build(self, queue):
+        """
+        Group the queue into batches and upload their draw commands
+        """
+        groups = {}
+        for vertexArray, compShader, transform in queue:
+            allocation = vertexArray.allocation
+            if allocation is None or not allocation.indexCount:
+                # outside of a GeometryArena: a batch of its own
+                groups[id(vertexArray)] = (compShader, vertexArray, vertexArray.primitive, [(vertexArray, transform)])
+                continue
+            key = (IndirectRenderGLShaderSystem._fingerprint(compShader), id(allocation.pool), vertexArray.primitive)
+            group = groups.setdefault(key, (compShader, allocation.pool, vertexArray.primitive, []))
+            group[3].append((vertexArray, transform))
+
+        commands, self._slots, self._batches = [], [], []
+        first = 0
+        for compShader, source, primitive, entries in groups.values():
+            first = self._drawBlock.align(first)
+            self._slots += [(transform, first + i) for i, (vertexArray, transform) in enumerate(entries)]
+            if isinstance(source, VertexArray):
+                self._batches.append((compShader, source, primitive, first, 1, None))
+            else:
+                offset = len(commands) * IndirectRenderGLShaderSystem.COMMAND.itemsize
+                commands += [(a.indexCount, 1, a.indexOffset, a.vertexOffset, 0)
+                             for a in (vertexArray.allocation for vertexArray, transform in entries)]
+                self._batches.append((compShader, source, primitive, first, len(entries), offset))
+            first += len(entries)
+        self._drawBlock.reserve(first)
+
+        self._commands = np.array(commands, IndirectRenderGLShaderSystem.COMMAND)
+        if self._commandBuffer is None:
+            self._commandBuffer = gl.glGenBuffers(1)
+        if len(self._commands):
+            gl.glBindBuffer(gl.GL_DRAW_INDIRECT_BUFFER, self._commandBuffer)
+            gl.glBufferData(gl.GL_DRAW_INDIRECT_BUFFER, self._commands, gl.GL_STATIC_DRAW)
+            gl.glBindBuffer(gl.GL_DRAW_INDIRECT_BUFFER, 0)
+        self.stats['batches'] = len(self._batches)
+        self.stats['draws'] = len(queue)
+        self.stats['builds'] += 1
+
+    @staticmethod
+    def _shader(compShader):
+        return compShader.component if isinstance(compShader, ShaderGLDecorator) else compShader
+
+    @staticmethod
+    def _fingerprint(compShader):
+        """
+        Entities can share a batch if they use the same program with the same uniform values and textures
+        """
+        shader = IndirectRenderGLShaderSystem._shader(compShader)
+        store = shader.uniforms
+        textures = tuple((key, id(value)) for key, value in (shader.textureDict or {}).items())
+        textures += tuple((key, id(value)) for key, value in (shader.texture3DDict or {}).items())
+        return (shader.glid, store.floatData.tobytes(), store.intData.tobytes(), textures)
+
+    def delete(self):
+        """
+        Delete the indirect and storage buffers, e.g. before the GL context is destroyed
+        """
+        if self._commandBuffer is not None:
+            gl.glDeleteBuffers(1, [self._commandBuffer])
+            self._commandBuffer = None
+        self._drawBlock.delete()
@@ -0,0 +1,291 @@
+"""
+ProgramCache classes
+
+A process-wide registry of linked GLSL programs keyed by a hash of their (preprocessed)
+vertex and fragment sources, so that Shader components with identical sources share
+a single GL program instead of compiling and linking the same GLSL once per entity.
+
+Programs are reference counted: the GL program is deleted when the last Shader releases it.
+
+Each Shader keeps its own uniform values. The UniformStores of a program's Shaders share the values
+last uploaded into it (ShaderProgram.uploaded), so switching the program to another Shader's values
+only uploads the uniforms that differ, the others keep the values already in the program.
+
+Optionally, linked programs are also persisted on disk (ProgramBinaryCache) through
+glGetProgramBinary, so that later runs skip compiling and linking altogether.
+
+Programs that are still being compiled and linked by the driver (see Shader.beginInit()) are
+registered right away with their compile state in ShaderProgram.pending, so Shaders with the
+same sources share the in-flight program as well. ParallelShaderCompile enables and polls
+GL_KHR/ARB_parallel_shader_compile when the driver offers it.
+
+"""
+
+from __future__         import annotations
+import hashlib
+import os
+import time
+
+import OpenGL.GL as gl
+from OpenGL.GL.KHR.parallel_shader_compile import glInitParallelShaderCompileKHR, glMaxShaderCompilerThreadsKHR
+from OpenGL.GL.ARB.parallel_shader_compile import glInitParallelShaderCompileARB, glMaxShaderCompilerThreadsARB
+import numpy as np
+
+from pyGLV.GL.DeletionQueue import DeletionQueue
+
+
+class ShaderProgram:
+    """
+    A linked GL program shared by all Shader components with the same sources
+    """
+    def __init__(self, key, glid):
+        self._key = key
+        self._glid = glid
+        self._refCount = 0
+        self.activeUniforms = None # introspected once, see UniformStore.introspect()
+        self.samplerUnits = {} # sampler uniform name -> texture unit, assigned once after linking
+        self.owner = None # UniformStore whose values are currently uploaded in the program
+        self.uploaded = None # (float32, int32) uniform values last uploaded, shared by the UniformStores of its Shaders
+        self.pending = None # (vertex, fragment shader ids, sources, start time) while compiling and linking
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def glid(self):
+        return self._glid
+
+    @property
+    def refCount(self):
+        return self._refCount
+
+
+class ProgramCache:
+    """
+    Process-wide, reference counted registry of ShaderPrograms keyed by source hash
+    """
+    _programs = {} # key -> ShaderProgram
+
+    @staticmethod
+    def key(vertex_source, fragment_source):
+        """
+        Hash of a (preprocessed) vertex and fragment source pair
+        """
+        digest = hashlib.sha256()
+        digest.update(vertex_source.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(fragment_source.encode('utf-8'))
+        return digest.hexdigest()
+
+    @classmethod
+    def programs(cls):
+        return cls._programs
+
+    @classmethod
+    def acquire(cls, key):
+        """
+        Return the already linked program for `key` with its reference count increased, or None
+        """
+        program = cls._programs.get(key)
+        if program is not None:
+            program._refCount += 1
+        return program
+
+    @classmethod
+    def register(cls, key, glid):
+        """
+        Register a freshly linked program, the caller holds the first reference
+        """
+        program = ShaderProgram(key, glid)
+        program._refCount = 1
+        cls._programs[key] = program
+        return program
+
+    @classmethod
+    def release(cls, program:ShaderProgram):
+        """
+        Drop one reference to `program`, the GL program is deleted with the last one,
+        by the render window between frames (see DeletionQueue)
+        """
+        program._refCount -= 1
+        if program._refCount > 0:
+            return
+        if cls._programs.get(program.key) is program:
+            del cls._programs[program.key]
+        DeletionQueue.release(DeletionQueue.PROGRAM, program.glid)
+
+    @classmethod
+    def discard(cls, program:ShaderProgram):
+        """
+        Forget a program that failed to link, so that the next Shader with its sources tries again.
+        The GL program must already be deleted; remaining references keep a program without glid.
+        """
+        if cls._programs.get(program.key) is program:
+            del cls._programs[program.key]
+        program._glid = None
+
+    @classmethod
+    def clear(cls):
+        """
+        Forget all programs, e.g. after the GL context they lived in was destroyed
+        """
+        cls._programs = {}
+
+
+class ParallelShaderCompile:
+    """
+    GL_KHR_parallel_shader_compile / GL_ARB_parallel_shader_compile support: with either extension
+    the driver compiles and links on its own threads and completion is polled through
+    GL_COMPLETION_STATUS instead of blocking on GL_COMPILE_STATUS/GL_LINK_STATUS
+    """
+    COMPLETION_STATUS = 0x91B1 # GL_COMPLETION_STATUS_KHR == GL_COMPLETION_STATUS_ARB
+    _available = None # None: not detected yet
+
+    @classmethod
+    def available(cls):
+        """
+        Detect the extension once and let the driver use as many compiler threads as it likes,
+        needs an active GL context
+        """
+        if cls._available is None:
+            cls._available = False
+            if glInitParallelShaderCompileKHR():
+                glMaxShaderCompilerThreadsKHR(0xFFFFFFFF)
+                cls._available = True
+            elif glInitParallelShaderCompileARB():
+                glMaxShaderCompilerThreadsARB(0xFFFFFFFF)
+                cls._available = True
+            print(f'ParallelShaderCompile: parallel shader compilation {"enabled" if cls._available else "not supported"}')
+        return cls._available
+
+    @classmethod
+    def isComplete(cls, glid):
+        """
+        True if the driver finished linking program `glid`, i.e. querying its status will not block.
+        Without the extension there is no way to tell, so this is always True.
+        """
+        if not cls.available():
+            return True
+        return bool(gl.glGetProgramiv(glid, cls.COMPLETION_STATUS))
+
+
+class ProgramBinaryCache:
+    """
+    Optional on-disk cache of linked program binaries (glGetProgramBinary/glProgramBinary).
+
+    A cache file is named after the source hash and the GL vendor/renderer/version label of the 
+    context, and stores the driver's binary format and the binary length next to the binary, so
+    binaries are never handed to a different driver. Binaries the driver rejects, and truncated
+    files, are removed and the program is compiled from source again.
+    """
+    _directory = None # None: cache disabled
+    _contextLabel = ""
+    _formats = [] # binary formats supported by the driver
+    stats = {'hits': 0, 'misses': 0, 'rejected': 0, 'loadTime': 0.0, 'linkTime': 0.0}
+
+    @classmethod
+    def enable(cls, directory, contextLabel=""):
+        """
+        Enable the cache under `directory`, needs an active GL context
+
+        :param contextLabel: GL version/renderer label of the context, e.g. SDL2Window._gVersionLabel
+        """
+        count = gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS)
+        if not count:
+            print("ProgramBinaryCache: the GL driver supports no program binary formats, cache disabled")
+            cls._directory = None
+            return False
+        cls._formats = [int(f) for f in np.atleast_1d(gl.glGetIntegerv(gl.GL_PROGRAM_BINARY_FORMATS))]
+        vendor = gl.glGetString(gl.GL_VENDOR)
+        vendor = vendor.decode() if isinstance(vendor, bytes) else str(vendor)
+        cls._contextLabel = f'{vendor} {contextLabel}'
+        os.makedirs(directory, exist_ok=True)
+        cls._directory = directory
+        return True
+
+    @classmethod
+    def disable(cls):
+        cls._directory = None
+
+    @classmethod
+    def enabled(cls):
+        return cls._directory is not None
+
+    @classmethod
+    def path(cls, key):
+        """
+        Cache file of the program with source hash `key` for the current GL context
+        """
+        name = hashlib.sha256(f'{key}|{cls._contextLabel}'.encode('utf-8')).hexdigest()
+        return os.path.join(cls._directory, name + '.bin')
+
+    @classmethod
+    def load(cls, key):
+        """
+        Create a program from the cached binary of `key`, returns its id or None on a miss
+        or when the driver rejects the binary
+        """
+        if cls._directory is None:
+            return None
+        path = cls.path(key)
+        if not os.path.exists(path):
+            cls.stats['misses'] += 1
+            return None
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            data = f.read()
+        glid = None
+        binaryFormat, length = np.frombuffer(data[:8], np.uint32) if len(data) >= 8 else (None, 0)
+        binary = np.frombuffer(data[8:], np.uint8)
+        # a truncated or empty file is rejected as a binary of an unknown format is
+        if length and binary.size == length and int(binaryFormat) in cls._formats:
+            glid = gl.glCreateProgram()
+            gl.glProgramBinary(glid, int(binaryFormat), binary, binary.size)
+            if not gl.glGetProgramiv(glid, gl.GL_LINK_STATUS):
+                gl.glDeleteProgram(glid)
+                glid = None
+        if glid is None:
+            # e.g. after a driver update: drop the stale binary and compile from source
+            print(f'ProgramBinaryCache: binary rejected for {key[:12]}, compiling from source')
+            cls.stats['rejected'] += 1
+            cls.stats['misses'] += 1
+            os.remove(path)
+            return None
+        elapsed = time.perf_counter() - start
+        cls.stats['hits'] += 1
+        cls.stats['loadTime'] += elapsed
+        print(f'ProgramBinaryCache: loaded {key[:12]} in {elapsed * 1000.0:.2f} ms')
+        return glid
+
+    @classmethod
+    def store(cls, key, glid, linkTime=0.0):
+        """
+        Persist the binary of the freshly linked program `glid` under `key`
+
+        :param linkTime: seconds spent compiling and linking the program from source
+        """
+        if cls._directory is None:
+            return
+        cls.stats['linkTime'] += linkTime
+        length = gl.glGetProgramiv(glid, gl.GL_PROGRAM_BINARY_LENGTH)
+        if not length:
+            return
+        binary = np.zeros(length, np.uint8)
+        binaryLength = np.zeros(1, np.int32)
+        binaryFormat = np.zeros(1, np.uint32)
+        gl.glGetProgramBinary(glid, length, binaryLength, binaryFormat, binary)
+        path = cls.path(key)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(np.array([binaryFormat[0], binaryLength[0]], np.uint32).tobytes())
+            f.write(binary[:binaryLength[0]].tobytes())
+        os.replace(path + '.tmp', path) # never leave a half written binary behind
+
+    @classmethod
+    def report(cls):
+        """
+        Summary of cache hits, misses and time spent loading binaries and linking from source
+        """
+        return (f"ProgramBinaryCache: {cls.stats['hits']} hits, {cls.stats['misses']} misses "
+                f"({cls.stats['rejected']} rejected), load {cls.stats['loadTime'] * 1000.0:.1f} ms, "
+                f"compile+link {cls.stats['linkTime'] * 1000.0:.1f} ms")
@@ -11,6 +11,9 @@ from typing import List, Dict
 
 from pyECSS.ECSSManager import ECSSManager
 from pyGLV.GUI.Viewer import SDL2Window, ImGUIDecorator
+from pyGLV.GL.FrameBlock import FrameBlock
+from pyGLV.GL.ProgramCache import ProgramBinaryCache
+from pyGLV.GL.ShaderWatcher import ShaderWatcher
 
 class Scene():
     """
@@ -26,6 +29,8 @@ class Scene():
             cls._instance = super(Scene, cls).__new__(cls)
             cls._renderWindow = None
             cls._gContext = None
+            cls._frameBlock = None
+            cls._shaderWatcher = None
             cls._world = ECSSManager() #which also instantiates an EventManager
             # add further init here
         return cls._instance
@@ -46,10 +51,32 @@ class Scene():
     def world(self):
         return self._world
     
+    @property
+    def frameBlock(self):
+        """per-frame camera and light uniform buffer shared by all FRAMEBLOCK shaders"""
+        return self._frameBlock
+    
+    @property
+    def shaderWatcher(self):
+        """hot-reloads file based shaders, see watchShaders()"""
+        return self._shaderWatcher
+    
+    def watchShaders(self, interval = ShaderWatcher.INTERVAL):
+        """reload the file based shaders of the scenegraph whenever their files change, 
+        to be called after the shaders were initialised
+        
+        :param interval: number of frames between two checks of the shader files
+        """
+        self._shaderWatcher = ShaderWatcher(interval = interval)
+        self._world.traverse_visit(self._shaderWatcher, self._world.root)
+        return self._shaderWatcher
+    
     
     def init(self, sdl2 = True, imgui = False, windowWidth = None, windowHeight = None, windowTitle = None, 
-            customImGUIdecorator = None, openGLversion = 4):
+            customImGUIdecorator = None, openGLversion = 4, programCacheDir = None):
         """call the init() of all systems attached to this Scene based on the Visitor pattern
+        
+        :param programCacheDir: optional directory where linked shader program binaries are cached between runs
         """
         #init Viewer GUI subsystem with just SDL2 window or also an ImGUI decorators
         if sdl2 == True:
@@ -68,6 +95,13 @@ class Scene():
         self._gContext.init()
         print("mark 2");
         self._gContext.init_post()
+        
+        #shared per-frame camera and light uniform buffer, needs the GL context created above
+        self._frameBlock = FrameBlock()
+        self._frameBlock.init()
+        
+        if programCacheDir is not None and self._renderWindow is not None:
+            ProgramBinaryCache.enable(programCacheDir, self._renderWindow._gVersionLabel)
     
     
     def update(self):
@@ -85,6 +119,12 @@ class Scene():
     def render(self, running:bool = True) ->bool :
         """call the render() of all systems attached to this Scene based on the Visitor pattern
         """
+        #upload the per-frame camera and light data once for all shaders
+        if self._frameBlock is not None:
+            self._frameBlock.update()
+        #between frames: swap in reloaded shader programs, check the shader files every few frames
+        if self._shaderWatcher is not None:
+            self._shaderWatcher.update()
         self._gContext.display()
         still_runnning = self._gContext.event_input_process(running)
         
@@ -102,6 +142,8 @@ class Scene():
     def shutdown(self):
         """main shutdown Scene method based on the "gameloop" game programming pattern
         """
+        if ProgramBinaryCache.enabled():
+            print(ProgramBinaryCache.report())
         self._gContext.shutdown()
 
 
@@ -17,14 +17,23 @@ from __future__         import annotations
 from abc                import ABC, abstractmethod
 from typing             import List
 import os  
+import time
 
 import OpenGL.GL as gl
+import numpy as np
 
 
 from pyECSS.System import System
 from pyECSS.Component import Component, ComponentDecorator, RenderMesh, CompNullIterator
 from pyGLV.GL.VertexArray import VertexArray
+from pyGLV.GL.GeometryArena import GeometryArena
 from pyGLV.GL.Textures import Texture, Texture3D
+from pyGLV.GL.TextureCache import TextureCache
+from pyGLV.GL.UniformStore import UniformStore, UniformDictView
+from pyGLV.GL.FrameBlock import FrameBlock
+from pyGLV.GL.DrawBlock import DrawBlock
+from pyGLV.GL.ProgramCache import ProgramCache, ProgramBinaryCache, ParallelShaderCompile
+from pyGLV.GL.ShaderPreprocessor import ShaderPreprocessor
 
 class Shader(Component):
     """
@@ -268,6 +277,38 @@ class Shader(Component):
             color = texture(ImageTexture,fragmentTexCoord);
         }
     """
+    SIMPLE_TEXTURE_ARRAY_VERT = """
+        #version 410
+
+        layout (location=0) in vec4 vPos;
+        layout (location=1) in vec3 vTexCoord; // u, v and the layer of the TextureArray
+
+        out vec3 fragmentTexCoord;
+
+        uniform mat4 model;
+        uniform mat4 View;
+        uniform mat4 Proj;
+
+        void main()
+        {
+            gl_Position =  Proj * View * model * vPos;
+            fragmentTexCoord = vTexCoord;
+        }
+    """
+    SIMPLE_TEXTURE_ARRAY_FRAG = """
+        #version 410
+
+        in vec3 fragmentTexCoord;
+
+        out vec4 color;
+
+        uniform sampler2DArray ImageTextures;
+
+        void main()
+        {
+            color = texture(ImageTextures,fragmentTexCoord);
+        }
+    """
     SIMPLE_TEXTURE_PHONG_VERT = """
         #version 410
 
@@ -415,25 +456,208 @@ class Shader(Component):
             FragColor = texture(cubemap, TexCoords);
         }
     """
+    # ---------------------------------------------------------------------
+    #  std140 FrameBlock variants: per-frame camera and light data is read 
+    #  from the FrameBlock uniform buffer (see pyGLV.GL.FrameBlock), 
+    #  per-entity uniforms shrink to the model matrix (and material)
+    # ---------------------------------------------------------------------
+    FRAME_BLOCK = """
+        layout (std140, row_major) uniform FrameBlock
+        {
+            mat4 view;
+            mat4 projection;
+            mat4 viewProj;
+            vec4 viewPos;
+            vec4 lightPos;
+            vec4 lightColor;    // rgb: color, w: intensity
+            vec4 ambientColor;  // rgb: color, w: strength
+        };
+    """
+    COLOR_VERT_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        layout (location=0) in vec4 vPosition;
+        layout (location=1) in vec4 vColor;
+
+        out     vec4 color;
+        uniform mat4 model;
+
+        void main()
+        {
+            gl_Position = viewProj * model * vPosition;
+            color = vColor;
+        }
+    """
+    COLOR_VERT_INSTANCED_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        layout (location=0) in vec4 vPosition;
+        layout (location=1) in vec4 vColor;
+        layout (location=2) in mat4 instanceModel;  // per instance, locations 2-5, see InstancedVertexArray
+        layout (location=6) in vec4 instanceColor;  // per instance
+
+        out     vec4 color;
+        uniform mat4 model;
+
+        void main()
+        {
+            gl_Position = viewProj * model * instanceModel * vPosition;
+            color = vColor * instanceColor;
+        }
+    """
+    VERT_PHONG_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        layout (location=0) in vec4 vPosition;
+        layout (location=1) in vec4 vColor;
+        layout (location=2) in vec4 vNormal;
+
+        out     vec4 pos;
+        out     vec4 color;
+        out     vec3 normal;
+        
+        uniform mat4 model;
 
+        void main()
+        {
+            pos = model * vPosition;
+            gl_Position = viewProj * pos;
+            color = vColor;
+            normal = mat3(transpose(inverse(model))) * vNormal.xyz;
+        }
+    """
+    FRAG_PHONG_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        in vec4 pos;
+        in vec4 color;
+        in vec3 normal;
+
+        out vec4 outputColor;
+
+        // Material
+        uniform float shininess;
+
+        void main()
+        {
+            vec3 norm = normalize(normal);
+            vec3 lightDir = normalize(lightPos.xyz - pos.xyz);
+            vec3 viewDir = normalize(viewPos.xyz - pos.xyz);
+            vec3 reflectDir = reflect(-lightDir, norm);
+
+            // Ambient
+            vec3 ambientProduct = ambientColor.w * ambientColor.rgb;
+            // Diffuse
+            float diffuseStr = max(dot(norm, lightDir), 0.0);
+            vec3 diffuseProduct = diffuseStr * lightColor.rgb;
+            // Specular
+            float specularStr = pow(max(dot(viewDir, reflectDir), 0.0), 32);
+            vec3 specularProduct = shininess * specularStr * color.xyz;
+            
+            vec3 result = (ambientProduct + (diffuseProduct + specularProduct) * lightColor.w) * color.xyz;
+            outputColor = vec4(result, 1);
+        }
+    """
+    SIMPLE_TEXTURE_VERT_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        layout (location=0) in vec4 vPos;
+        layout (location=1) in vec2 vTexCoord;
+
+        out vec2 fragmentTexCoord;
+
+        uniform mat4 model;
+
+        void main()
+        {
+            gl_Position = viewProj * model * vPos;
+            fragmentTexCoord = vTexCoord;
+        }
+    """
+    SIMPLE_TEXTURE_PHONG_VERT_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        layout (location=0) in vec4 vPos;
+        layout (location=1) in vec4 vNormal;
+        layout (location=2) in vec2 vTexCoord;
+
+        out vec2 fragmentTexCoord;
+        out vec4 pos;
+        out vec3 normal;
+
+        uniform mat4 model;
+
+        void main()
+        {
+            pos = model * vPos;
+            gl_Position = viewProj * pos;
+            fragmentTexCoord = vTexCoord;
+            normal = mat3(transpose(inverse(model))) * vNormal.xyz;
+        }
+    """
+    SIMPLE_TEXTURE_PHONG_FRAG_FRAMEBLOCK = """
+        #version 410
+        """ + FRAME_BLOCK + """
+        in vec2 fragmentTexCoord;
+        in vec4 pos;
+        in vec3 normal;
 
-    def __init__(self, name=None, type=None, id=None, vertex_source=None, fragment_source=None):
+        out vec4 outputColor;
+
+        // Material
+        uniform float shininess;
+
+        uniform sampler2D ImageTexture;
+
+        void main()
+        {
+            vec3 norm = normalize(normal);
+            vec3 lightDir = normalize(lightPos.xyz - pos.xyz);
+            vec3 viewDir = normalize(viewPos.xyz - pos.xyz);
+            vec3 reflectDir = reflect(-lightDir, norm);
+
+            // Ambient
+            vec3 ambientProduct = ambientColor.w * ambientColor.rgb;
+            // Diffuse
+            float diffuseStr = max(dot(norm, lightDir), 0.0);
+            vec3 diffuseProduct = diffuseStr * lightColor.rgb;
+            // Specular
+            float specularStr = pow(max(dot(viewDir, reflectDir), 0.0), 32);
+
+            vec4 tex = texture(ImageTexture,fragmentTexCoord);
+
+            vec3 specularProduct = shininess * specularStr * tex.xyz;
+            
+            vec3 result = (ambientProduct + (diffuseProduct + specularProduct) * lightColor.w) * tex.xyz;
+            outputColor = vec4(result, 1);
+        }
+    """
+    # ---------------------------------------------------------------------
+    #  pyGLV shader library (pyGLV/GL/shaders, see ShaderPreprocessor): uber shaders
+    #  whose variants are selected with Shader(defines={...}) instead of copied sources
+    #  VERT_PHONG_UBER: TEXTURED, FRAME_BLOCK, INDIRECT
+    #  FRAG_PHONG_UBER: TEXTURED, MATERIAL_COLOR, FRAME_BLOCK
+    # ---------------------------------------------------------------------
+    VERT_PHONG_UBER = os.path.join(ShaderPreprocessor.LIBRARY_DIRECTORY, 'phong.vert')
+    FRAG_PHONG_UBER = os.path.join(ShaderPreprocessor.LIBRARY_DIRECTORY, 'phong.frag')
+    # uniform block name -> fixed uniform buffer binding point, assigned to every program at link time
+    UNIFORM_BLOCK_BINDINGS = {FrameBlock.NAME: FrameBlock.BINDING}
+    # shader storage block name -> fixed shader storage buffer binding point, where the driver supports them
+    STORAGE_BLOCK_BINDINGS = {DrawBlock.NAME: DrawBlock.BINDING}
+
+
+    def __init__(self, name=None, type=None, id=None, vertex_source=None, fragment_source=None, defines=None):
         super().__init__(name, type, id)
         
         self._parent = self
 
-        self._texture = None
-        self._texture3D = None
-        
         self._glid = None
-        self._mat4fDict = {}
-        self._mat3fDict = {}
-        self._float1fDict = {}
-        self._float3fDict = {}
-        self._float4fDict = {}
-        self._aaaDict = {}
+        self._program = None # ShaderProgram shared with all Shaders of identical sources
+        self._reloadProgram = None # program submitted by beginReload(), swapped in by finishReload()
+        self._uniforms = UniformStore() # typed float32/int32 uniform storage, laid out once the program is linked
         self._textureDict = {}
         self._texture3DDict ={}
+        self._cachedTextures = set() # keys of _textureDict whose Texture holds a TextureCache reference
         
         if not vertex_source:
             self._vertex_source = Shader.COLOR_VERT
@@ -444,12 +668,25 @@ class Shader(Component):
             self._fragment_source = Shader.COLOR_FRAG
         else:
             self._fragment_source = fragment_source
+        self._defines = dict(defines) if defines else {} # preprocessor symbols selecting a variant of the sources
         #self.init(vertex_source, fragment_source) #init Shader under a valid GL context
     
     @property
     def glid(self):
         return self._glid
     
+    @property
+    def program(self):
+        return self._program
+    
+    @property
+    def uniforms(self):
+        return self._uniforms
+    
+    @property
+    def uniformLocations(self):
+        return self._uniforms.locations
+    
     @property
     def vertex_source(self):
         return self._vertex_source
@@ -465,47 +702,56 @@ class Shader(Component):
     @fragment_source.setter
     def fragment_source(self, value):
         self._fragment_source = value
+    
+    @property
+    def defines(self):
+        return self._defines
+    
+    @defines.setter
+    def defines(self, value):
+        self._defines = dict(value) if value else {}
         
     @property
     def mat4fDict(self):
-        return self._mat4fDict
+        return UniformDictView(self._uniforms, gl.GL_FLOAT_MAT4)
     @mat4fDict.setter
     def mat4fDict(self, value):
-        self._mat4fDict = value
+        self.mat4fDict.update(value)
         
     @property
     def mat3fDict(self):
-        return self._mat3fDict
+        return UniformDictView(self._uniforms, gl.GL_FLOAT_MAT3)
     @mat3fDict.setter
     def mat3fDict(self, value):
-        self._mat3fDict = value
+        self.mat3fDict.update(value)
     
     @property
     def float1fDict(self):
-        return self._float1fDict
+        return UniformDictView(self._uniforms, gl.GL_FLOAT)
     @float1fDict.setter
     def float1fDict(self, value):
-        self._float1fDict = value
+        self.float1fDict.update(value)
     
     @property
     def float3fDict(self):
-        return self._float3fDict
+        return UniformDictView(self._uniforms, gl.GL_FLOAT_VEC3)
     @float3fDict.setter
     def float3fDict(self, value):
-        self._float3fDict = value
+        self.float3fDict.update(value)
         
     @property
     def float4fDict(self):
-        return self._float4fDict
+        return UniformDictView(self._uniforms, gl.GL_FLOAT_VEC4)
     @float4fDict.setter
     def float4fDict(self, value):
-        self._float4fDict = value
-
+        self.float4fDict.update(value)
+    
     @property
     def textureDict(self):
         return self._textureDict
     @textureDict.setter
     def textureDict(self, value):
+        self.releaseTextures()
         self._textureDict = value
 
     @property
@@ -516,68 +762,127 @@ class Shader(Component):
         self._texture3DDict = value
     
     def __del__(self):
-        gl.glUseProgram(0)
-        if self._glid:
-            gl.glDeleteProgram(self._glid)
+        if self._program is not None:
+            ProgramCache.release(self._program) # deletes the GL program with its last Shader
+        if self._reloadProgram is not None:
+            ProgramCache.release(self._reloadProgram)
+        self.releaseTextures()
+    
+    def setTexture(self, key, texture, cached=False):
+        """
+        Assign the Texture of sampler `key`, the one it replaces is released if it came from TextureCache
+        
+        :param cached: `texture` holds a reference of TextureCache.acquire() that the Shader now owns
+        """
+        previous = self._textureDict.get(key)
+        if key in self._cachedTextures:
+            TextureCache.release(previous)
+            self._cachedTextures.discard(key)
+        self._textureDict[key] = texture
+        if cached:
+            self._cachedTextures.add(key)
+    
+    def releaseTextures(self):
+        """
+        Release the TextureCache references of the Textures the Shader was assigned, so unused ones can be evicted
+        """
+        for key in self._cachedTextures:
+            TextureCache.release(self._textureDict[key])
+        self._cachedTextures = set()
     
     def disableShader(self):
         gl.glUseProgram(0)
     
     def enableShader(self):
+        if self._glid is None and self._program is not None:
+            self.finishInit() # beginInit() without a second pass, finish on first use
         gl.glUseProgram(self._glid)
-        if self._mat4fDict is not None:
-            for key, value in self._mat4fDict.items():
-                loc = gl.glGetUniformLocation(self._glid, key)
-                gl.glUniformMatrix4fv(loc, 1, True, value) 
-        if self._mat3fDict is not None:
-            for key, value in self._mat3fDict.items():
-                loc = gl.glGetUniformLocation(self._glid, key)
-                gl.glUniformMatrix3fv(loc, 1, True, value)
-        if self._float1fDict is not None:
-            for key, value in self._float1fDict.items():
-                loc = gl.glGetUniformLocation(self._glid, key)
-                # gl.glUniform1fv(loc, 1, True, value) Bad call
-                gl.glUniform1fv(loc, 1, value)
-        if self._float3fDict is not None:
-            for key, value in self._float3fDict.items():
-                loc = gl.glGetUniformLocation(self._glid, key)
-                # gl.glUniform3fv(loc, 1, True, value) Bad call
-                gl.glUniform3fv(loc, 1, value)
-        if self._float4fDict is not None:
-            for key, value in self._float4fDict.items():
-                loc = gl.glGetUniformLocation(self._glid, key)
-                # gl.glUniform4fv(loc, 1, True, value) Bad call
-                gl.glUniform4fv(loc, 1, value)
+        if self._program is not None and self._program.owner is not self._uniforms:
+            # the shared program holds the values of another Shader, upload those of ours that differ
+            self._program.owner = self._uniforms
+            self._uniforms.upload(full=True)
+        else:
+            self._uniforms.upload()
+        # every sampler has its own texture unit, TextureUnits skips textures that are already bound
+        samplerUnits = self._program.samplerUnits if self._program is not None else {}
         if self._textureDict is not None:
             for key,value in self._textureDict.items():
-                if self._texture is None:
-                    loc = gl.glGetUniformLocation(self._glid,key)
-                    gl.glUniform1i(loc,0)
-                    value.bind()
+                unit = samplerUnits.get(key)
+                if unit is not None:
+                    value.bind(unit)
         if self._texture3DDict is not None:
             for key,value in self._texture3DDict.items():
-                if self._texture3D is None:
-                    loc = gl.glGetUniformLocation(self._glid,key)
-                    gl.glUniform1i(loc,0)
-                    value.bind()
+                unit = samplerUnits.get(key)
+                if unit is not None:
+                    value.bind(unit)
+    
+    @staticmethod
+    def _bindUniformBlocks(glid):
+        """
+        Attach the uniform and shader storage blocks a program declares to their fixed binding points
+        (GLSL 4.1 has no layout(binding=N) for blocks, so this is done once after linking)
+        """
+        for blockName, binding in Shader.UNIFORM_BLOCK_BINDINGS.items():
+            index = gl.glGetUniformBlockIndex(glid, blockName)
+            if index != gl.GL_INVALID_INDEX:
+                gl.glUniformBlockBinding(glid, index, binding)
+        if not gl.glShaderStorageBlockBinding: # GL 4.1 contexts
+            return
+        for blockName, binding in Shader.STORAGE_BLOCK_BINDINGS.items():
+            index = gl.glGetProgramResourceIndex(glid, gl.GL_SHADER_STORAGE_BLOCK, blockName)
+            if index != gl.GL_INVALID_INDEX:
+                gl.glShaderStorageBlockBinding(glid, index, binding)
+    
+    def getUniformLocation(self, key):
+        """
+        Return the cached location of uniform `key` for this program.
+        Names not reported as active at link time (e.g. optimised out by the GLSL compiler)
+        are queried once and cached as well, so the driver is never asked twice for the same name.
+        """
+        return self._uniforms.location(key)
             
     @staticmethod
-    def _compile_shader(src, shader_type):
-        src = open(src, 'r').read() if os.path.exists(src) else src
+    def _load_source(src, defines=None):
+        """
+        Return the GLSL source text of a raw string or of a source file name,
+        with #include and the given #defines expanded (see ShaderPreprocessor)
+        """
+        return ShaderPreprocessor.expand(src, defines)
+    
+    @staticmethod
+    def _compile_shader(src, shader_type, defines=None):
+        src = Shader._load_source(src, defines)
         #src = src.decode('ascii') if isinstance(src, bytes) else src.decode
+        shader = Shader._submit_shader(src, shader_type)
+        if not Shader._check_shader(shader, src, shader_type):
+            gl.glDeleteShader(shader)
+            return None
+        return shader
+    
+    @staticmethod
+    def _submit_shader(src, shader_type):
+        """
+        Hand a shader to the driver for compilation without waiting for the result
+        """
         shader = gl.glCreateShader(shader_type)
         gl.glShaderSource(shader, src)
         gl.glCompileShader(shader)
+        return shader
+    
+    @staticmethod
+    def _check_shader(shader, src, shader_type):
+        """
+        Query (and wait for) the compile status of a submitted shader, print the log on failure
+        """
         status = gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS)
         src = ('%3d: %s' % (i+1, l) for i,l in enumerate(src.splitlines()) ) 
         print('Compile shader success for %s\n%s\n%s' % (shader_type, status, src))
         if not status:
             log = gl.glGetShaderInfoLog(shader).decode('ascii')
-            gl.glDeleteShader(shader)
             src = '\n'.join(src)
             print('Compile failed for %s\n%s\n%s' % (shader_type, log, src))
-            return None
-        return shader
+            return False
+        return True
         
     
     def update(self):
@@ -596,22 +901,177 @@ class Shader(Component):
     def init(self):
         """
         shader extra initialisation from raw strings or source file names
+        
+        Programs are shared through the ProgramCache: Shaders with identical sources reuse
+        the already linked program instead of compiling and linking their own copy.
+        Same as beginInit() immediately followed by finishInit(), see InitGLShaderSystem for
+        initialising many Shaders in two phases.
+        """
+        self.beginInit()
+        self.finishInit()
+    
+    def beginInit(self):
+        """
+        First phase of init(): take the program from the caches, or submit its compilation
+        and linking to the driver without waiting for the result
+        """
+        program = self._acquireProgram()
+        if self._program is not None: # re-initialised: drop the previous program
+            ProgramCache.release(self._program)
+        self._program = program
+        self._glid = None
+    
+    def _acquireProgram(self):
         """
-        vert = self._compile_shader(self._vertex_source, gl.GL_VERTEX_SHADER)
-        frag = self._compile_shader(self._fragment_source, gl.GL_FRAGMENT_SHADER)
-        
-        if vert and frag:
-            self._glid = gl.glCreateProgram()
-            gl.glAttachShader(self._glid, vert)
-            gl.glAttachShader(self._glid, frag)
-            gl.glLinkProgram(self._glid)
-            gl.glDeleteShader(vert)
-            gl.glDeleteShader(frag)
-            status = gl.glGetProgramiv(self._glid, gl.GL_LINK_STATUS)
-            if not status:
-                print(gl.glGetProgramInfoLog(self._glid).decode('ascii'))
-                gl.glDeleteProgram(self._glid)
-                self._glid = None
+        Program of the current sources and defines, with a reference held by the caller
+        """
+        vertex_source = self._load_source(self._vertex_source, self._defines)
+        fragment_source = self._load_source(self._fragment_source, self._defines)
+        key = ProgramCache.key(vertex_source, fragment_source)
+        
+        program = ProgramCache.acquire(key)
+        if program is None:
+            # optional on-disk binary of a previous run, else compile and link from source
+            glid = ProgramBinaryCache.load(key)
+            if glid is not None:
+                program = ProgramCache.register(key, glid)
+                self._introspect(program)
+            else:
+                program = self._submitLink(key, vertex_source, fragment_source)
+        return program
+    
+    def isInitReady(self):
+        """
+        True if finishInit() will not block on the driver
+        """
+        program = self._program
+        return program is None or program.pending is None or ParallelShaderCompile.isComplete(program.glid)
+    
+    def finishInit(self):
+        """
+        Second phase of init(): check the compile and link status of the submitted program
+        and prepare the uniform storage, blocks until the driver is done
+        """
+        program = self._program
+        if program is None:
+            return
+        if program.pending is not None: # the first Shader to finish completes a shared program
+            self._completeLink(program)
+        self._glid = program.glid
+        if self._glid is not None:
+            self._buildUniforms(program)
+    
+    def sourceFiles(self):
+        """
+        Paths of the files the sources are read from, including #include files (see ShaderPreprocessor)
+        """
+        files = ShaderPreprocessor.dependencies(self._vertex_source, self._defines)
+        files += [f for f in ShaderPreprocessor.dependencies(self._fragment_source, self._defines) if f not in files]
+        return files
+    
+    def beginReload(self):
+        """
+        Submit the compilation of the current sources, e.g. after their files changed, 
+        while the program in use keeps rendering until finishReload()
+        
+        :return: False if the sources could not be read
+        """
+        try:
+            self._reloadProgram = self._acquireProgram()
+        except OSError as e:
+            print(f'{self.getClassName()}: reload failed, keeping the previous program\n{e}')
+            return False
+        return True
+    
+    def isReloadReady(self):
+        """
+        True if finishReload() will not block on the driver
+        """
+        program = self._reloadProgram
+        return program is None or program.pending is None or ParallelShaderCompile.isComplete(program.glid)
+    
+    def finishReload(self):
+        """
+        Swap in the program submitted by beginReload() if it compiled and linked, otherwise
+        keep the previous one. Uniform values carry over to the new program.
+        
+        :return: True if the new program is in use
+        """
+        program, self._reloadProgram = self._reloadProgram, None
+        if program is None:
+            return False
+        if program.pending is not None:
+            self._completeLink(program)
+        if program.glid is None or program is self._program: # failed, or the sources did not change
+            ProgramCache.release(program)
+            if program.glid is None:
+                print(f'{self.getClassName()}: reload failed, keeping the previous program')
+            return False
+        if self._program is not None:
+            ProgramCache.release(self._program)
+        self._program = program
+        self._glid = program.glid
+        self._buildUniforms(program)
+        return True
+    
+    def _submitLink(self, key, vertex_source, fragment_source):
+        """
+        Submit the compilation and linking of a new GL program and register it as pending
+        """
+        ParallelShaderCompile.available() # enables the driver's compiler threads before the first compile
+        start = time.perf_counter()
+        vert = self._submit_shader(vertex_source, gl.GL_VERTEX_SHADER)
+        frag = self._submit_shader(fragment_source, gl.GL_FRAGMENT_SHADER)
+        glid = gl.glCreateProgram()
+        gl.glAttachShader(glid, vert)
+        gl.glAttachShader(glid, frag)
+        if ProgramBinaryCache.enabled(): # glGetProgramBinary will be called on the program
+            gl.glProgramParameteri(glid, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE)
+        gl.glLinkProgram(glid)
+        program = ProgramCache.register(key, glid)
+        program.pending = (vert, frag, vertex_source, fragment_source, start)
+        return program
+    
+    def _completeLink(self, program):
+        """
+        Check the status of a pending program, on failure the program is deleted and its glid is None
+        """
+        vert, frag, vertex_source, fragment_source, start = program.pending
+        program.pending = None
+        glid = program.glid
+        compiled = self._check_shader(vert, vertex_source, gl.GL_VERTEX_SHADER)
+        compiled = self._check_shader(frag, fragment_source, gl.GL_FRAGMENT_SHADER) and compiled
+        status = compiled and gl.glGetProgramiv(glid, gl.GL_LINK_STATUS)
+        if compiled and not status:
+            print(gl.glGetProgramInfoLog(glid).decode('ascii'))
+        gl.glDeleteShader(vert)
+        gl.glDeleteShader(frag)
+        if not status:
+            gl.glDeleteProgram(glid)
+            ProgramCache.discard(program)
+            return
+        self._introspect(program)
+        ProgramBinaryCache.store(program.key, glid, time.perf_counter() - start)
+    
+    def _introspect(self, program):
+        program.activeUniforms = UniformStore.introspect(program.glid)
+        # one texture unit per sampler, in declaration order, so that all textures are bound for a single draw
+        unit = 0
+        for name, location, glType, size in program.activeUniforms:
+            if glType in UniformStore.SAMPLER_TYPES and location != -1:
+                program.samplerUnits[name] = unit
+                unit += size
+        self._bindUniformBlocks(program.glid)
+    
+    def _buildUniforms(self, program):
+        """
+        Lay out the uniform storage for `program` and point its samplers to their texture units
+        """
+        self._uniforms.build(self._glid, program.activeUniforms, program.uploaded)
+        program.uploaded = self._uniforms.uploaded
+        for name, unit in program.samplerUnits.items():
+            size = self._uniforms.uniforms[name].size
+            self._uniforms.set(name, unit if size == 1 else np.arange(unit, unit + size))
     
     def __iter__(self) ->CompNullIterator:
         """ A component does not have children to iterate, thus a NULL iterator
@@ -629,6 +1089,15 @@ class ShaderGLDecorator(ComponentDecorator):
     def init(self):
         self.component.init()
     
+    def beginInit(self):
+        self.component.beginInit()
+    
+    def isInitReady(self):
+        return self.component.isInitReady()
+    
+    def finishInit(self):
+        self.component.finishInit()
+    
     def update(self):
         self.component.update()
         # add here custom shader draw calls, e.g. glGetUniformLocation(), glUniformMatrix4fv() etc.add()
@@ -647,10 +1116,19 @@ class ShaderGLDecorator(ComponentDecorator):
         if float4:
             self.component.float4fDict[key]=value
         if texture:
-            self.component.textureDict[key]=Texture(value)
-            #self.component.textureDict[key]=Texture(value)
+            # the resident Texture of an image file is shared, assigning the same file again is a dict lookup;
+            # Texture and TextureArray objects (e.g. of a TextureAtlas) are bound as they are
+            if isinstance(value, (str, os.PathLike)):
+                self.component.setTexture(key, TextureCache.acquire(value), cached=True)
+            else:
+                self.component.setTexture(key, value)
         if texture3D:
+            # cube map faces arrive decoded (get_texture_faces), without one file to share them by, so they
+            # are not cached: the Shader owns its Texture3D and deletes the one a new assignment replaces
+            previous = self.component.texture3DDict.get(key)
             self.component.texture3DDict[key]=Texture3D(value)
+            if previous is not None:
+                previous.unbind()
             
     def enableShader(self):
         self.component.enableShader()
@@ -678,10 +1156,73 @@ class ShaderGLDecorator(ComponentDecorator):
 class InitGLShaderSystem(System):
     """Initialise outside of the rendering loop RenderMesh, Shader, VertexArray, ShaderGLDecorator classes
 
+    Shaders are initialised in two phases: the traversal only submits the compilation and
+    linking of every program, finishInit() then checks their status once the driver is done, 
+    so with GL_KHR/ARB_parallel_shader_compile all programs are compiled concurrently.
+    Shaders that are not finished through finishInit() finish on their first enableShader().
+    
+    With bulk=True VertexArrays are initialised in finishInit() as well: the traversal only
+    collects them, then VertexArray.init_many() packs all static meshes into GeometryArena pools
+    (one pool per vertex format) with a few large uploads instead of buffers and a VAO per entity.
+    finishInit() must then be called before the first frame is rendered.
     """
+    def __init__(self, name=None, type=None, id=None, bulk=False, arena=None):
+        """
+        :param bulk: initialise all VertexArrays of the traversal together in finishInit()
+        :param arena: GeometryArena of the bulk initialised meshes, GeometryArena.default() if None
+        """
+        super().__init__(name, type, id)
+        self._pendingShaders = [] # Shaders and ShaderGLDecorators submitted during the traversal
+        self._bulk = bulk
+        self._arena = arena
+        self._pendingVertexArrays = [] # VertexArrays collected during a bulk traversal
+        self._vertexArrayTime = 0.0 # seconds spent in VertexArray.init() during the traversal
+        self._vertexArrayCount = 0
+    
     def init(self):
         pass
     
+    def finishInit(self):
+        """
+        Second phase of the Shader initialisation, to be called after traverse_visit(): 
+        Shaders whose programs the driver already completed are finished first, the traversal
+        order is only waited on when none is ready. In bulk mode the collected VertexArrays are initialised first.
+        """
+        self._finishVertexArrays()
+        start = time.perf_counter()
+        pending, self._pendingShaders = self._pendingShaders, []
+        count = len(pending)
+        while pending:
+            waiting = []
+            for shader in pending:
+                if shader.isInitReady():
+                    shader.finishInit()
+                else:
+                    waiting.append(shader)
+            if waiting and len(waiting) == len(pending):
+                waiting.pop(0).finishInit() # nothing completed yet, block on the first one
+            pending = waiting
+        print(f'{self.getClassName()}: {count} shaders initialised in {(time.perf_counter() - start) * 1000.0:.2f} ms')
+    
+    def _finishVertexArrays(self):
+        """
+        Initialise the VertexArrays collected in bulk mode and print the VertexArray timing report
+        """
+        pending, self._pendingVertexArrays = self._pendingVertexArrays, []
+        packed = 0
+        if pending:
+            start = time.perf_counter()
+            packed = VertexArray.init_many(pending, self._arena)
+            self._vertexArrayTime += time.perf_counter() - start
+            self._vertexArrayCount += len(pending)
+        if not self._vertexArrayCount:
+            return
+        report = f'{self.getClassName()}: {self._vertexArrayCount} vertex arrays initialised in {self._vertexArrayTime * 1000.0:.2f} ms'
+        if self._bulk:
+            report += f', {packed} packed into shared buffers\n{(self._arena or GeometryArena.default()).report()}'
+        print(report)
+        self._vertexArrayTime, self._vertexArrayCount = 0.0, 0
+    
     def update(self):
         """
         """
@@ -711,7 +1252,13 @@ class InitGLShaderSystem(System):
             # Copy RenderMesh::vertex_attributes and vertex_indices to vertexArray
             vertexArray.attributes = parentRenderMesh.vertex_attributes
             vertexArray.index = parentRenderMesh.vertex_index
-            vertexArray.init()
+            if self._bulk:
+                self._pendingVertexArrays.append(vertexArray)
+            else:
+                start = time.perf_counter()
+                vertexArray.init()
+                self._vertexArrayTime += time.perf_counter() - start
+                self._vertexArrayCount += 1
         else:
             print("\n no RenderMesh to copy vertex attributes from! \n")
         # Init vertexArray
@@ -725,7 +1272,8 @@ class InitGLShaderSystem(System):
         # if there is no ShaderGLDecorator, init Shader
         # for the moment assume that the user will not be directly adding both a shader and shaderDecorator at scenegraph level
         # we can prevent this at ECSSManager level, but not at scenegraph direct access level
-        shader.init()
+        shader.beginInit()
+        self._pendingShaders.append(shader)
         print(f'\n{shader} accessed within {self.getClassName()}::apply2Shader() \n')
     
     def apply2ShaderGLDecorator(self, shaderGLDecorator:ShaderGLDecorator):
@@ -735,7 +1283,8 @@ class InitGLShaderSystem(System):
         
         """
         #init ShaderGLDecorator if there is such a node
-        shaderGLDecorator.init()
+        shaderGLDecorator.beginInit()
+        self._pendingShaders.append(shaderGLDecorator)
         print(f'\n{shaderGLDecorator} accessed within {self.getClassName()}::apply2ShaderGLDecorator() \n')
 
 
@@ -743,6 +1292,8 @@ class RenderGLShaderSystem(System):
     """A RenderSystem specifically for GL vertex and fragment Shaders and associated 
     VertexArray components attached to a specific Entity
 
+    InstancedVertexArray components are visited as VertexArrays and draw all their instances
+    in the single call of their draw().
     """
     def init(self):
         pass
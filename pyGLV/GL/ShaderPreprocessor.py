@@ -0,0 +1,153 @@
+"""
+ShaderPreprocessor class
+
+Expands GLSL sources before they are handed to the driver:
+
+    - ``#include "file"`` (or ``<file>``) is replaced by the file's text, looked up next to the
+      including file first and then in the include directories (the pyGLV shader library by default).
+      Every file is included at most once per expansion, so headers need no include guards.
+      Includes are resolved before GLSL's own preprocessor runs, i.e. independently of
+      surrounding ``#ifdef`` blocks: optional parts of a header are guarded inside the header.
+    - a defines dict selects variants of an uber shader: ``#define NAME VALUE`` lines are inserted
+      right after ``#version``, in sorted order so that equal dicts give identical sources.
+
+Expansions are memoized per (source or file, defines) and stay valid as long as the
+modification times of the source file and of every included file are unchanged.
+The expanded text feeds ProgramCache.key(), so each variant is compiled once.
+
+"""
+
+from __future__         import annotations
+import os
+import re
+
+
+class ShaderPreprocessor:
+    """
+    Memoized #include and #define expansion of GLSL sources
+    """
+    LIBRARY_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shaders')
+    INCLUDE = re.compile(r'^\s*#\s*include\s+["<]([^">]+)[">]')
+
+    _includeDirectories = [LIBRARY_DIRECTORY]
+    _cache = {} # (source, defines) -> (expanded source, {dependency path: mtime})
+    stats = {'hits': 0, 'misses': 0}
+
+    @classmethod
+    def addIncludeDirectory(cls, directory):
+        """
+        Search `directory` for #include files before the directories added earlier
+        """
+        directory = os.path.abspath(directory)
+        if directory not in cls._includeDirectories:
+            cls._includeDirectories.insert(0, directory)
+
+    @classmethod
+    def includeDirectories(cls):
+        return cls._includeDirectories
+
+    @classmethod
+    def clear(cls):
+        """
+        Forget all memoized expansions
+        """
+        cls._cache = {}
+
+    @classmethod
+    def expand(cls, src, defines=None):
+        """
+        Return the expanded GLSL text of a raw string or of a source file name
+
+        :param defines: dict of preprocessor symbols, a value of None or True defines the bare
+            symbol, False leaves it undefined, anything else is written as its value
+        """
+        definesKey = tuple(sorted((defines or {}).items()))
+        key = (src, definesKey)
+        entry = cls._cache.get(key)
+        if entry is not None and cls._isCurrent(entry[1]):
+            cls.stats['hits'] += 1
+            return entry[0]
+        cls.stats['misses'] += 1
+
+        dependencies = {}
+        if os.path.exists(src):
+            path = os.path.abspath(src)
+            dependencies[path] = os.path.getmtime(path)
+            text = cls._read(path)
+            directory = os.path.dirname(path)
+        else:
+            text = src
+            directory = None
+        lines = cls._include(text, directory, dependencies)
+        expanded = '\n'.join(cls._define(lines, definesKey))
+        cls._cache[key] = (expanded, dependencies)
+        return expanded
+
+    @classmethod
+    def dependencies(cls, src, defines=None):
+        """
+        Paths of the files the expansion of `src` reads: the source file itself and all its includes,
+        empty for raw strings without #include
+        """
+        cls.expand(src, defines)
+        return list(cls._cache[(src, tuple(sorted((defines or {}).items())))][1])
+
+    @staticmethod
+    def _isCurrent(dependencies):
+        for path, mtime in dependencies.items():
+            try:
+                if os.path.getmtime(path) != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'r') as f:
+            return f.read()
+
+    @classmethod
+    def _resolve(cls, name, directory):
+        candidates = [directory] if directory is not None else []
+        for candidate in candidates + cls._includeDirectories:
+            path = os.path.join(candidate, name)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+        raise FileNotFoundError(f"ShaderPreprocessor: cannot find #include '{name}' in {candidates + cls._includeDirectories}")
+
+    @classmethod
+    def _include(cls, text, directory, dependencies):
+        """
+        Lines of `text` with every #include replaced, recursively, by the lines of the included file
+        """
+        lines = []
+        for line in text.splitlines():
+            match = cls.INCLUDE.match(line)
+            if match is None:
+                lines.append(line)
+                continue
+            path = cls._resolve(match.group(1), directory)
+            if path in dependencies: # already included
+                continue
+            dependencies[path] = os.path.getmtime(path)
+            lines.extend(cls._include(cls._read(path), os.path.dirname(path), dependencies))
+        return lines
+
+    @staticmethod
+    def _define(lines, definesKey):
+        """
+        Insert the #define lines after #version, which must stay the first statement of a GLSL source
+        """
+        defines = []
+        for name, value in definesKey:
+            if value is None or value is True:
+                defines.append(f'#define {name}')
+            elif value is not False:
+                defines.append(f'#define {name} {value}')
+        if not defines:
+            return lines
+        for i, line in enumerate(lines):
+            if line.strip().startswith('#version'):
+                return lines[:i + 1] + defines + lines[i + 1:]
+        return defines + lines
@@ -0,0 +1,121 @@
+"""
+ShaderWatcher class
+
+Hot-reload of file based shaders while the render loop keeps running.
+
+The watcher visits the scenegraph like InitGLShaderSystem to collect the Shaders whose sources
+(or #include files) are files, then checks the modification times of those files at most once
+every `interval` frames; in between, update() costs a counter increment. A changed program is
+submitted to the driver next to the one in use (see Shader.beginReload()), and swapped into
+the Shader component on a later frame once the driver completed it. A program that fails to
+compile or link is dropped and the Shader keeps rendering with its previous program.
+
+"""
+
+from __future__         import annotations
+import os
+
+from pyECSS.System import System
+from pyGLV.GL.Shader import Shader, ShaderGLDecorator
+
+
+class ShaderWatcher(System):
+    """
+    Visits Shader and ShaderGLDecorator components and reloads them when their source files change
+    """
+    INTERVAL = 30 # frames between two checks of the source files
+
+    def __init__(self, name=None, type=None, id=None, interval=INTERVAL):
+        super().__init__(name, type, id)
+        self._interval = max(1, interval)
+        self._frame = 0
+        self._watched = [] # (Shader, source file paths)
+        self._mtimes = {} # source file path -> mtime at the last check
+        self._reloading = [] # Shaders with a reload in flight
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def watched(self):
+        return [shader for shader, files in self._watched]
+
+    def watch(self, shader:Shader):
+        """
+        Watch the source files of `shader`, raw string sources have none and are ignored
+        """
+        files = shader.sourceFiles()
+        if not files or any(s is shader for s, f in self._watched):
+            return
+        self._watched.append((shader, files))
+        for path in files:
+            self._mtimes.setdefault(path, ShaderWatcher._mtime(path))
+
+    def apply2Shader(self, shader:Shader):
+        self.watch(shader)
+
+    def apply2ShaderGLDecorator(self, shaderGLDecorator:ShaderGLDecorator):
+        self.watch(shaderGLDecorator.component)
+
+    def update(self):
+        """
+        Called once per frame, between frames: swaps in completed reloads and, every `interval`
+        frames, submits the reload of Shaders whose files changed
+        """
+        if self._reloading:
+            self._finishReloads()
+        self._frame += 1
+        if self._frame < self._interval:
+            return
+        self._frame = 0
+        self.check()
+
+    def check(self):
+        """
+        Compare the modification times of all watched files and submit the reload of changed Shaders
+
+        :return: list of the changed file paths
+        """
+        changed = []
+        for path, mtime in self._mtimes.items():
+            current = ShaderWatcher._mtime(path)
+            # a file that is missing for a moment (e.g. an editor replacing it) is checked again later
+            if current is not None and current != mtime:
+                changed.append(path)
+        if not changed:
+            return changed
+        for path in changed:
+            self._mtimes[path] = ShaderWatcher._mtime(path)
+            print(f'{self.getClassName()}: {path} changed')
+        for shader, files in self._watched:
+            if any(path in files for path in changed) and not any(s is shader for s in self._reloading):
+                if shader.beginReload():
+                    self._reloading.append(shader)
+        return changed
+
+    def _finishReloads(self):
+        waiting = []
+        for shader in self._reloading:
+            if not shader.isReloadReady():
+                waiting.append(shader)
+                continue
+            if shader.finishReload():
+                self._rewatch(shader)
+        self._reloading = waiting
+
+    def _rewatch(self, shader):
+        """
+        Pick up #include files added or removed by the reloaded sources
+        """
+        files = shader.sourceFiles()
+        self._watched = [(s, files if s is shader else f) for s, f in self._watched]
+        for path in files:
+            self._mtimes.setdefault(path, ShaderWatcher._mtime(path))
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
@@ -0,0 +1,235 @@
+"""
+TextureAtlas and SkylinePacker classes
+
+Packing of images of mixed sizes into one atlas image, so that meshes with different images share
+one Texture: the shaders of all of them bind the same texture, and draws of different materials can
+be batched. Packing runs on the CPU only and needs no GL context.
+
+The images are placed with the skyline bottom-left heuristic, largest first; the order, positions
+and atlas size only depend on the images and the order they were added in. Every image is surrounded
+by `padding` pixels repeating its edges, so that linear filtering does not blend in its neighbours.
+Texture coordinates of a mesh are mapped into the rectangle of its image with rewriteUVs(); they must
+lie within [0, 1], images that repeat over a mesh need their own Texture or a TextureArray layer.
+
+    atlas = TextureAtlas()
+    atlas.add('wood', 'textures/dark_wood_texture.jpg')
+    atlas.add('logo', 'textures/uoc_logo.png')
+    atlas.pack()
+    texture = Texture('atlas', image=atlas.image())
+    mesh.vertex_attributes.append(atlas.rewriteUVs('wood', Texture.CUBE_TEX_COORDINATES))
+    shader.setUniformVariable(key='ImageTexture', value=texture, texture=True)
+
+Images are kept as TextureLoader.decode gives them, i.e. in the orientation of Texture.
+
+"""
+
+from __future__         import annotations
+import os
+
+import numpy as np
+
+from pyGLV.GL.CompressedImage import CompressedImage
+from pyGLV.GL.TextureLoader import TextureLoader
+
+
+class SkylinePacker:
+    """
+    Skyline bottom-left packing of rectangles into a width x height area
+    """
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+        self._skyline = [[0, 0, width]] # segments [x, y, width] from left to right, y is the height filled
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    def insert(self, width, height):
+        """
+        Place a rectangle where its top edge is lowest, the leftmost of those positions
+
+        :return: (x, y) of the rectangle, or None if it does not fit
+        """
+        best = None
+        for i, (x, y, segmentWidth) in enumerate(self._skyline):
+            top = self._fit(i, width, height)
+            if top is not None and (best is None or (top + height, x) < (best[1] + height, best[0])):
+                best = (x, top, i)
+        if best is None:
+            return None
+        x, y, i = best
+        self._place(i, x, y, width, height)
+        return x, y
+
+    def _fit(self, i, width, height):
+        """
+        y of a rectangle placed at the start of segment i, None if it leaves the area
+        """
+        x = self._skyline[i][0]
+        if x + width > self._width:
+            return None
+        y = 0
+        remaining = width
+        while remaining > 0:
+            y = max(y, self._skyline[i][1])
+            if y + height > self._height:
+                return None
+            remaining -= self._skyline[i][2]
+            i += 1
+        return y
+
+    def _place(self, i, x, y, width, height):
+        self._skyline.insert(i, [x, y + height, width])
+        # cut the segments the rectangle covers
+        j = i + 1
+        while j < len(self._skyline):
+            segment = self._skyline[j]
+            covered = x + width - segment[0]
+            if covered <= 0:
+                break
+            segment[0] += covered
+            segment[2] -= covered
+            if segment[2] > 0:
+                break
+            del self._skyline[j]
+        # merge neighbours of the same height
+        j = 0
+        while j < len(self._skyline) - 1:
+            if self._skyline[j][1] == self._skyline[j + 1][1]:
+                self._skyline[j][2] += self._skyline.pop(j + 1)[2]
+            else:
+                j += 1
+
+
+class TextureAtlas:
+    """
+    Images of mixed sizes packed into one RGBA8 image, with the texture coordinates of each image
+    """
+    PADDING = 2 # pixels around each image repeating its edges
+    MAX_SIZE = 8192 # largest width and height of the atlas
+
+    def __init__(self, padding=PADDING, maxSize=MAX_SIZE):
+        self._padding = padding
+        self._maxSize = maxSize
+        self._images = {} # name -> (height, width, 4) uint8 pixels, in the order they were added
+        self._rects = {} # name -> (x, y, width, height) of the image in the atlas, without padding
+        self._width = 0
+        self._height = 0
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def names(self):
+        return list(self._images)
+
+    def add(self, name, image):
+        """
+        Add an image to be packed by the next pack()
+
+        :param image: image file path, decoded (width, height, data) image or (height, width, 3 or 4) uint8 array
+        """
+        if isinstance(image, (str, os.PathLike)):
+            image = TextureLoader.decode(image)
+        if isinstance(image, CompressedImage):
+            raise ValueError(f'TextureAtlas: {name} is block compressed, atlases are built from uncompressed images')
+        pixels = np.asarray(image[2] if isinstance(image, tuple) else image, np.uint8)
+        if pixels.ndim != 3 or pixels.shape[2] not in (3, 4):
+            raise ValueError(f'TextureAtlas: {name} is not an RGB or RGBA image, shape {pixels.shape}')
+        if pixels.shape[2] == 3:
+            pixels = np.dstack([pixels, np.full(pixels.shape[:2], 255, np.uint8)])
+        self._images[name] = pixels
+        self._rects = {}
+        return name
+
+    def pack(self):
+        """
+        Place all images, in the smallest power of two atlas found by doubling its shorter side
+
+        :return: (width, height) of the atlas
+        """
+        padding = self._padding
+        sizes = {name: (pixels.shape[1] + 2 * padding, pixels.shape[0] + 2 * padding) for name, pixels in self._images.items()}
+        # largest first, ties in the order the images were added
+        order = sorted(sizes, key=lambda name: (-sizes[name][1], -sizes[name][0]))
+        area = sum(width * height for width, height in sizes.values())
+        width = TextureAtlas._powerOfTwo(max([int(np.sqrt(area))] + [size[0] for size in sizes.values()]))
+        height = TextureAtlas._powerOfTwo(max([1] + [size[1] for size in sizes.values()]))
+        while True:
+            if width > self._maxSize or height > self._maxSize:
+                raise ValueError(f'TextureAtlas: the images do not fit into {self._maxSize}x{self._maxSize}')
+            packer = SkylinePacker(width, height)
+            positions = {}
+            for name in order:
+                position = packer.insert(*sizes[name])
+                if position is None:
+                    break
+                positions[name] = position
+            else:
+                break
+            if width <= height:
+                width *= 2
+            else:
+                height *= 2
+        self._width, self._height = width, height
+        self._rects = {name: (positions[name][0] + padding, positions[name][1] + padding,
+                              self._images[name].shape[1], self._images[name].shape[0]) for name in self._images}
+        return width, height
+
+    def rect(self, name):
+        """
+        (x, y, width, height) of the image in the atlas, in pixels
+        """
+        if not self._rects:
+            self.pack()
+        return self._rects[name]
+
+    def uvRect(self, name):
+        """
+        (u0, v0, u1, v1) of the image in the atlas
+        """
+        x, y, width, height = self.rect(name)
+        return x / self._width, y / self._height, (x + width) / self._width, (y + height) / self._height
+
+    def rewriteUVs(self, name, uvs):
+        """
+        Map texture coordinates in [0, 1] of the image `name` to the atlas
+
+        :param uvs: (vertices, 2) texture coordinates, further columns are kept
+        :return: float32 array of the atlas coordinates
+        """
+        u0, v0, u1, v1 = self.uvRect(name)
+        uvs = np.array(uvs, np.float32)
+        uvs[:, 0] = u0 + uvs[:, 0] * (u1 - u0)
+        uvs[:, 1] = v0 + uvs[:, 1] * (v1 - v0)
+        return uvs
+
+    def image(self):
+        """
+        The atlas image, for Texture(name, image=atlas.image())
+
+        :return: (width, height, (height, width, 4) uint8 array)
+        """
+        if not self._rects:
+            self.pack()
+        atlas = np.zeros((self._height, self._width, 4), np.uint8)
+        padding = self._padding
+        for name, pixels in self._images.items():
+            x, y, width, height = self._rects[name]
+            atlas[y - padding:y + height + padding, x - padding:x + width + padding] = \
+                np.pad(pixels, ((padding, padding), (padding, padding), (0, 0)), mode='edge')
+        return self._width, self._height, atlas
+
+    @staticmethod
+    def _powerOfTwo(n):
+        return 1 << max(0, int(n) - 1).bit_length()
@@ -0,0 +1,286 @@
+"""
+TextureCache class
+
+Textures shared by image file: ShaderGLDecorator.setUniformVariable(texture=True) is typically called
+in the render loop with the same file every frame, and used to decode the image and allocate a new
+GL texture on every call. TextureCache keeps one resident Texture per (path, mtime, orient) key, so
+that a repeated assignment costs a dict lookup and only new or modified files are loaded.
+
+Textures are reference counted: acquire() adds a reference and release() drops it. A Texture that
+is not referenced any more stays resident, in least recently used order, until the resident textures
+exceed the byte budget; then the least recently used unreferenced textures are deleted. Referenced
+textures are never evicted, so the budget is exceeded while more textures than it holds are in use.
+Evicted textures are handed to the DeletionQueue, as a Shader finalizer may drop the last reference.
+
+Decoded images are kept in a second, CPU side LRU cache with its own budget, so that an evicted
+texture that is needed again is uploaded without decoding its file again.
+
+File changes are picked up by check(), which update() calls every INTERVAL frames from
+SDL2Window.display(): a modified file gets a new key, the next acquire() loads it, and holders of
+the previous Texture keep it until they release it.
+
+    texture = TextureCache.acquire("brick.jpg")
+    ...
+    TextureCache.release(texture)
+    GPUMemory.addEvictionCallback(TextureCache.evict) # unused textures also give way to the GPUMemory budget
+
+"""
+
+from __future__         import annotations
+from collections        import OrderedDict
+from concurrent.futures import Future
+import os
+import threading
+
+from pyGLV.GL.CompressedImage import CompressedImage
+from pyGLV.GL.TextureLoader import TextureLoader
+from pyGLV.GL.Textures import Texture
+
+
+class TextureCache:
+    """
+    Process-wide cache of the Textures of image files, reference counted with LRU eviction
+    """
+    BUDGET = 512 * 2**20 # GPU bytes of resident textures, unreferenced ones are evicted above it
+    CPU_BUDGET = 256 * 2**20 # bytes of the decoded images kept in memory
+    INTERVAL = 60 # frames between two checks of the file modification times in update()
+
+    _textures = OrderedDict() # (path, mtime, orient) -> [Texture, references], least recently used first
+    _current = {} # (path, orient) -> key of the version of the file loaded last
+    _keys = {} # id of Texture -> key
+    _images = OrderedDict() # (path, mtime, orient) -> decoded (width, height, data) or CompressedImage, least recently used first
+    _imageBytes = 0
+    _lock = threading.Lock() # _images is also filled by the TextureLoader workers
+    _budget = BUDGET
+    _cpuBudget = CPU_BUDGET
+    _frame = 0
+    stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'imageHits': 0}
+
+    @classmethod
+    def acquire(cls, filepath, orient=True, asynchronous=None):
+        """
+        The resident Texture of an image file, loaded if it is not, with one more reference
+
+        :param orient: see Texture, part of the key
+        :param asynchronous: how a Texture that is not resident decodes its image, see Texture
+        :return: Texture
+        """
+        key = cls._current.get((filepath, orient))
+        if key is None:
+            key = (filepath, TextureCache._mtime(filepath), orient)
+        entry = cls._textures.get(key)
+        if entry is not None:
+            cls._textures.move_to_end(key)
+            entry[1] += 1
+            cls.stats['hits'] += 1
+            return entry[0]
+        cls.stats['misses'] += 1
+        texture = Texture(filepath, asynchronous, orient, cls._image(key, asynchronous))
+        cls._current[(filepath, orient)] = key
+        cls._textures[key] = [texture, 1]
+        cls._keys[id(texture)] = key
+        cls._trim()
+        return texture
+
+    @classmethod
+    def release(cls, texture):
+        """
+        Drop a reference of a Texture from acquire(), Textures of other origins are ignored
+        """
+        key = cls._keys.get(id(texture))
+        if key is None:
+            return
+        entry = cls._textures[key]
+        entry[1] = max(0, entry[1] - 1)
+        if entry[1]:
+            return
+        if cls._current.get((key[0], key[2])) != key:
+            cls._delete(key) # an old version of a modified file is never acquired again
+        else:
+            cls._trim()
+
+    @classmethod
+    def references(cls, texture):
+        key = cls._keys.get(id(texture))
+        return cls._textures[key][1] if key is not None else 0
+
+    @classmethod
+    def evict(cls, nbytes):
+        """
+        Delete unreferenced Textures, least recently used first, until `nbytes` are freed.
+        Has the signature of GPUMemory eviction callbacks.
+
+        :return: bytes freed
+        """
+        freed = 0
+        for key, (texture, references) in list(cls._textures.items()):
+            if freed >= nbytes:
+                break
+            if not references:
+                freed += texture.nbytes
+                cls._delete(key)
+        return freed
+
+    @classmethod
+    def check(cls):
+        """
+        Compare the modification times of the cached files, the next acquire() of a changed file loads it again
+
+        :return: list of the changed file paths
+        """
+        changed = []
+        for current, key in list(cls._current.items()):
+            mtime = TextureCache._mtime(key[0])
+            # a file that is missing for a moment (e.g. an editor replacing it) is checked again later
+            if mtime is None or mtime == key[1]:
+                continue
+            changed.append(key[0])
+            print(f'TextureCache: {key[0]} changed')
+            del cls._current[current]
+            entry = cls._textures.get(key)
+            if entry is not None and not entry[1]:
+                cls._delete(key)
+            with cls._lock:
+                image = cls._images.pop(key, None)
+                if image is not None:
+                    cls._imageBytes -= TextureCache._size(image)
+        return changed
+
+    @classmethod
+    def update(cls):
+        """
+        Called once per frame by SDL2Window.display(), checks the files every INTERVAL frames
+        """
+        cls._frame += 1
+        if cls._frame < cls.INTERVAL:
+            return
+        cls._frame = 0
+        if cls._current:
+            cls.check()
+
+    @classmethod
+    def resident(cls):
+        """
+        GPU bytes of the cached Textures, referenced or not
+        """
+        return sum(entry[0].nbytes for entry in cls._textures.values())
+
+    @classmethod
+    def count(cls):
+        return len(cls._textures)
+
+    @classmethod
+    def imageBytes(cls):
+        """
+        Bytes of the decoded images in the CPU side cache
+        """
+        return cls._imageBytes
+
+    @classmethod
+    def budget(cls):
+        return cls._budget
+
+    @classmethod
+    def setBudget(cls, nbytes):
+        """
+        Set the GPU byte budget of the resident Textures and evict what exceeds it
+        """
+        cls._budget = nbytes
+        cls._trim()
+
+    @classmethod
+    def cpuBudget(cls):
+        return cls._cpuBudget
+
+    @classmethod
+    def setCpuBudget(cls, nbytes):
+        """
+        Set the byte budget of the decoded images, 0 keeps none
+        """
+        with cls._lock:
+            cls._cpuBudget = nbytes
+            cls._trimImages()
+
+    @classmethod
+    def reset(cls):
+        """
+        Forget all Textures and images without GL calls, e.g. when the GL context is destroyed with them
+        """
+        cls._textures = OrderedDict()
+        cls._current = {}
+        cls._keys = {}
+        with cls._lock:
+            cls._images = OrderedDict()
+            cls._imageBytes = 0
+        cls._budget = TextureCache.BUDGET
+        cls._cpuBudget = TextureCache.CPU_BUDGET
+        cls._frame = 0
+        cls.stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'imageHits': 0}
+
+    @classmethod
+    def _image(cls, key, asynchronous):
+        """
+        The decoded image of `key` from the CPU side cache, else the image or a Future of it decoded
+        by TextureLoader, which is added to the CPU side cache once decoded
+        """
+        with cls._lock:
+            image = cls._images.get(key)
+            if image is not None:
+                cls._images.move_to_end(key)
+                cls.stats['imageHits'] += 1
+                return image
+        filepath, mtime, orient = key
+        if TextureLoader.enabled if asynchronous is None else asynchronous:
+            future = TextureLoader.submit(TextureLoader.decode, filepath, orient)
+            def store(future:Future):
+                # in the worker thread that decoded the image
+                if not future.cancelled() and future.exception() is None:
+                    cls._store(key, future.result())
+            future.add_done_callback(store)
+            return future
+        image = TextureLoader.decode(filepath, orient)
+        cls._store(key, image)
+        return image
+
+    @classmethod
+    def _store(cls, key, image):
+        with cls._lock:
+            if key in cls._images or TextureCache._size(image) > cls._cpuBudget:
+                return
+            cls._images[key] = image
+            cls._imageBytes += TextureCache._size(image)
+            cls._trimImages()
+
+    @classmethod
+    def _trimImages(cls):
+        # with the lock held
+        while cls._imageBytes > cls._cpuBudget:
+            cls._imageBytes -= TextureCache._size(cls._images.popitem(last=False)[1])
+
+    @classmethod
+    def _trim(cls):
+        excess = cls.resident() - cls._budget
+        if excess > 0:
+            cls.evict(excess)
+
+    @classmethod
+    def _delete(cls, key):
+        texture = cls._textures.pop(key)[0]
+        del cls._keys[id(texture)]
+        # release() is called from Shader finalizers, the GL texture is deleted by the DeletionQueue
+        texture.release()
+        cls.stats['evicted'] += 1
+
+    @staticmethod
+    def _size(image):
+        """
+        Bytes of a decoded (width, height, data) image or CompressedImage
+        """
+        return image.nbytes if isinstance(image, CompressedImage) else image[2].nbytes
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
@@ -0,0 +1,196 @@
+"""
+TextureLoader class
+
+Decoding of texture images in a thread pool, so that scenes start rendering while their images load.
+
+PIL releases the GIL while it decodes and converts images, so a concurrent.futures thread pool
+decodes several images at the same time, and in parallel to the render loop. GL calls on the
+other hand need the context of the render thread: a Texture loaded asynchronously uploads a 1x1
+placeholder right away, and its image replaces the placeholder when TextureLoader.poll() runs on
+the render thread after the decode completed. SDL2Window.display() polls once per frame, so
+shaders keep their Texture objects and simply sample the real image from the next frame on.
+
+    TextureLoader.enabled = True # Texture(path) of e.g. ShaderGLDecorator.setUniformVariable loads asynchronously
+    texture = Texture("brick.jpg", asynchronous=True) # or per texture
+
+"""
+
+from __future__         import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from pyGLV.GL.CompressedImage import CompressedImage
+
+
+class TextureLoader:
+    """
+    Process-wide thread pool decoding images, and the uploads waiting for the render thread
+    """
+    WORKERS = min(8, os.cpu_count() or 1)
+    UPLOADS_PER_FRAME = 8 # finished images uploaded by one poll() of SDL2Window, to spread large loads over frames
+    PLACEHOLDER_COLOR = (128, 128, 128, 255) # RGBA of the 1x1 image shown until the decode completed
+    TILE = 64 # side in pixels of the tiles decode() transposes images in
+
+    enabled = False # default of Texture(asynchronous=None)
+    _executor = None
+    _pending = [] # (Future, upload callback), only touched by the render thread
+    stats = {'uploaded': 0, 'failed': 0}
+
+    @staticmethod
+    def decode(filepath, orient=True):
+        """
+        Decode an image file into an RGBA8 array for glTexImage2D, safe to run in a worker thread
+
+        Flipping an image top to bottom and then rotating it clockwise by a quarter turn, the orientation
+        Texture (CUBE_TEX_COORDINATES) expects, is a transpose: it is taken as a NumPy view of the decoded
+        pixels and written out tile by tile, in the same single pass that adds the alpha channel of RGB images.
+        Unlike the former PIL rotate, which kept the image size, non-square images are not cropped.
+
+        DDS and KTX2 files are read as a CompressedImage, uploaded with their mip chain as they are.
+
+        :param orient: transpose the image to the orientation of Texture, cube map faces are used as they are
+        :return: (width, height, contiguous (height, width, 4) uint8 array), or a CompressedImage
+        """
+        if CompressedImage.isContainer(filepath):
+            return CompressedImage.load(filepath) # oriented when it was compressed, see pyGLV.utils.compress_textures
+        img = Image.open(filepath)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        pixels = np.asarray(img) # (rows, columns, channels), the first row is the top of the image
+        del img # frees the decoded image, only its pixels are kept
+        if orient:
+            pixels = pixels.transpose(1, 0, 2)
+        elif pixels.shape[2] == 4:
+            return pixels.shape[1], pixels.shape[0], pixels
+        height, width, channels = pixels.shape
+        rgba = np.empty((height, width, 4), np.uint8)
+        if channels == 3:
+            rgba[..., 3] = 255
+        # copying the transposed view in tiles keeps both the reads and the writes within the CPU caches
+        tile = TextureLoader.TILE if orient else max(height, width)
+        for row in range(0, height, tile):
+            for column in range(0, width, tile):
+                rgba[row:row + tile, column:column + tile, :channels] = pixels[row:row + tile, column:column + tile]
+        return width, height, rgba
+
+    @classmethod
+    def placeholder(cls):
+        """
+        (width, height, RGBA array) of the 1x1 placeholder image
+        """
+        return 1, 1, np.array(cls.PLACEHOLDER_COLOR, np.uint8).reshape(1, 1, 4)
+
+    @classmethod
+    def executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.WORKERS, thread_name_prefix='TextureLoader')
+        return cls._executor
+
+    @classmethod
+    def submit(cls, function, *args):
+        """
+        Run `function(*args)` in the thread pool
+
+        :return: concurrent.futures.Future
+        """
+        return cls.executor().submit(function, *args)
+
+    @classmethod
+    def decodeMany(cls, filepaths, orient=True):
+        """
+        Decode several images concurrently and wait for all of them, e.g. the six faces of a cube map
+
+        :return: list of (width, height, RGBA array) in the order of filepaths
+        """
+        return list(cls.executor().map(TextureLoader.decode, filepaths, [orient] * len(filepaths)))
+
+    @classmethod
+    def decodeManyAsync(cls, filepaths, orient=True, combine=None):
+        """
+        Decode several images concurrently without waiting for them
+
+        :param combine: function applied to the list of decoded images, in a worker thread
+        :return: Future of the list decodeMany() returns, or of combine(list)
+        """
+        futures = [cls.submit(TextureLoader.decode, filepath, orient) for filepath in filepaths]
+        combined = Future()
+        lock = threading.Lock()
+        remaining = [len(futures)]
+        def collect(future):
+            # called by the worker that finished an image, the last one completes the combined Future
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                images = [future.result() for future in futures]
+                combined.set_result(combine(images) if combine is not None else images)
+            except Exception as e:
+                combined.set_exception(e)
+        for future in futures:
+            future.add_done_callback(collect)
+        return combined
+
+    @classmethod
+    def whenDone(cls, future, upload):
+        """
+        Call `upload(result)` on the render thread, in the first poll() after `future` completed
+        """
+        cls._pending.append((future, upload))
+
+    @classmethod
+    def pending(cls):
+        return len(cls._pending)
+
+    @classmethod
+    def poll(cls, limit=None):
+        """
+        Upload the images decoded since the last poll, needs the GL context of the render thread to be current
+
+        :param limit: largest number of uploads, the others wait for the next poll
+        :return: number of uploads
+        """
+        done, waiting = [], []
+        for entry in cls._pending:
+            ready = entry[0].done() and (limit is None or len(done) < limit)
+            (done if ready else waiting).append(entry)
+        if not done:
+            return 0
+        cls._pending = waiting
+        for future, upload in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                cls.stats['failed'] += 1
+                print(f'TextureLoader: decoding failed, keeping the placeholder: {e}')
+                continue
+            upload(result)
+            cls.stats['uploaded'] += 1
+        return len(done)
+
+    @classmethod
+    def wait(cls):
+        """
+        Block until all submitted images are decoded and upload them, e.g. before taking a screenshot
+        """
+        while cls._pending:
+            for future, upload in cls._pending:
+                future.exception() # waits without raising
+            cls.poll()
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Drop the pending uploads and stop the thread pool, to be called before the GL context is destroyed
+        """
+        # cancel_futures of ThreadPoolExecutor.shutdown needs Python 3.9
+        for future, upload in cls._pending:
+            future.cancel()
+        cls._pending = []
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False)
+            cls._executor = None
@@ -4,8 +4,80 @@ Texture classes
 """
 
 
+from concurrent.futures import Future
+import os
+
 import OpenGL.GL as gl
-from PIL import Image
+import numpy as np
+
+from pyGLV.GL.CompressedImage import CompressedImage
+from pyGLV.GL.DeletionQueue import DeletionQueue
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureLoader import TextureLoader
+
+
+class TextureUnits:
+    """
+    Global texture binding cache: remembers which texture is bound to each texture unit, so that 
+    glActiveTexture/glBindTexture are only called when the texture of a unit actually changes.
+    All texture binding must go through TextureUnits.bind(), or bindForUpdate() before changing a
+    texture, for the cache to stay valid.
+    """
+    _bound = {} # unit -> (target, texture id)
+    _active = None # currently active texture unit
+    stats = {'binds': 0, 'skipped': 0}
+
+    @classmethod
+    def bind(cls, unit, target, texture):
+        """
+        Bind `texture` to `target` on texture unit `unit`, if it is not bound there already
+
+        :return: True if GL calls were made
+        """
+        if cls._bound.get(unit) == (target, texture):
+            cls.stats['skipped'] += 1
+            return False
+        if cls._active != unit:
+            gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+            cls._active = unit
+        gl.glBindTexture(target, texture)
+        cls._bound[unit] = (target, texture)
+        cls.stats['binds'] += 1
+        return True
+
+    @classmethod
+    def bindForUpdate(cls, unit, target, texture):
+        """
+        Bind `texture` like bind() and make `unit` the active unit even if the texture is bound there
+        already, for glTexImage2D, glTexParameteri etc. which change the texture of the active unit
+        """
+        if cls._active != unit:
+            gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+            cls._active = unit
+        return cls.bind(unit, target, texture)
+
+    @classmethod
+    def bound(cls, unit):
+        """
+        (target, texture id) bound to `unit`, or None
+        """
+        return cls._bound.get(unit)
+
+    @classmethod
+    def forget(cls, texture):
+        """
+        Drop a deleted texture from the cache, GL names are reused for new textures
+        """
+        cls._bound = {unit: binding for unit, binding in cls._bound.items() if binding[1] != texture}
+
+    @classmethod
+    def reset(cls):
+        """
+        Forget all bindings, e.g. for a new GL context or after GL code that binds textures directly
+        """
+        cls._bound = {}
+        cls._active = None
+
 
 class Texture:
     """
@@ -21,20 +93,22 @@ class Texture:
     [0.0, 1.0]]*6
 
 
-    def __init__(self,filepath):
+    def __init__(self,filepath, asynchronous=None, orient=True, image=None):
         """
         Used to initialize a 2D texture
-        """
-        angle = -90
-
-        img = Image.open(filepath)
-        img = img.transpose(Image.FLIP_TOP_BOTTOM)
-        img = img.rotate(angle) #need to rotate by 90 degrees
-        image_data = img.convert("RGBA").tobytes()
 
+        :param asynchronous: decode the image in the TextureLoader thread pool and show a 1x1 placeholder
+            until TextureLoader.poll() uploads it, None for TextureLoader.enabled
+        :param orient: transpose the image to the orientation of CUBE_TEX_COORDINATES (TextureLoader.decode)
+        :param image: the image of filepath already decoded, (width, height, data) or a Future of it
+            (e.g. from TextureCache), which is uploaded instead of decoding the file
+        """
+        self._filepath = filepath
+        self._ready = False
+        self._nbytes = 0
         self._texture = gl.glGenTextures(1)
         
-        gl.glBindTexture(gl.GL_TEXTURE_2D,self._texture)
+        TextureUnits.bindForUpdate(0, gl.GL_TEXTURE_2D, self._texture)
         
         #gl.glTexParameteri(gl.GL_TEXTURE_2D,gl.GL_TEXTURE_WRAP_S,gl.GL_MIRRORED_REPEAT)
         #gl.glTexParameteri(gl.GL_TEXTURE_2D,gl.GL_TEXTURE_WRAP_T,gl.GL_MIRRORED_REPEAT)
@@ -44,32 +118,177 @@ class Texture:
         gl.glTexParameteri(gl.GL_TEXTURE_2D,gl.GL_TEXTURE_MIN_FILTER,gl.GL_LINEAR)
         gl.glTexParameteri(gl.GL_TEXTURE_2D,gl.GL_TEXTURE_MAG_FILTER,gl.GL_LINEAR)
 
+        if image is None and (TextureLoader.enabled if asynchronous is None else asynchronous):
+            image = TextureLoader.submit(TextureLoader.decode, filepath, orient)
+        if isinstance(image, Future):
+            self._upload(TextureLoader.placeholder(), mipmaps=False)
+            TextureLoader.whenDone(image, self._finish)
+        else:
+            self._finish(image if image is not None else TextureLoader.decode(filepath, orient))
+
+    @property
+    def glid(self):
+        return self._texture
+
+    @property
+    def ready(self):
+        """
+        False while the image of an asynchronous Texture is decoded and the placeholder is shown
+        """
+        return self._ready
+
+    @property
+    def filepath(self):
+        return self._filepath
+
+    @property
+    def nbytes(self):
+        """
+        GPU bytes of the uploaded image and its mip chain
+        """
+        return self._nbytes
+
+    def _finish(self, image):
+        """
+        Upload the decoded image, on the render thread
+        """
+        self._upload(image)
+        self._ready = True
+
+    def _upload(self, image, mipmaps=True):
+        TextureUnits.bindForUpdate(0, gl.GL_TEXTURE_2D, self._texture)
+        if isinstance(image, CompressedImage):
+            # stays compressed in video memory, with the mip chain computed offline
+            _compressed(gl.GL_TEXTURE_2D, image)
+            self._nbytes = image.nbytes
+            GPUMemory.register(self, GPUMemory.TEXTURE, self._nbytes, f'Texture {self._filepath}')
+            return
+        width, height, image_data = image
         gl.glTexImage2D(gl.GL_TEXTURE_2D, #Target
                         0, # Level
                         gl.GL_RGBA, # Internal Format
-                        img.width, # Width
-                        img.height, # Height
+                        width, # Width
+                        height, # Height
                         0, # Border
                         gl.GL_RGBA, # Format
                         gl.GL_UNSIGNED_BYTE, # Type
                         image_data # Data
                         )
-        gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+        if mipmaps:
+            gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+        self._nbytes = GPUMemory.textureBytes(width, height, mipmaps=mipmaps)
+        GPUMemory.register(self, GPUMemory.TEXTURE, self._nbytes, f'Texture {self._filepath}')
     
     
-    def bind(self):
+    def bind(self, unit=0):
         """
-    Bind and Activate texture
+    Bind and Activate texture on texture unit `unit`
     """
-        gl.glActiveTexture(gl.GL_TEXTURE0)
-        gl.glBindTexture(gl.GL_TEXTURE_2D,self._texture)
+        TextureUnits.bind(unit, gl.GL_TEXTURE_2D, self._texture)
 
     """
         unbind texture
     """
     def unbind(self):
+        TextureUnits.forget(self._texture)
+        GPUMemory.unregister(self)
         gl.glDeleteTextures(1,self._texture)
 
+    def release(self):
+        """
+        Delete the texture at the next safe point of the render loop (see DeletionQueue), unlike unbind()
+        safe where the GL context may not be current, e.g. when a finalizer drops its last reference
+        """
+        TextureUnits.forget(self._texture)
+        GPUMemory.unregister(self)
+        DeletionQueue.release(DeletionQueue.TEXTURE, self._texture)
+
+
+class TextureArray:
+    """
+    Same-sized images in the layers of one GL_TEXTURE_2D_ARRAY. Shaders sample it with a sampler2DArray
+    and (u, v, layer) texture coordinates (Shader.SIMPLE_TEXTURE_ARRAY_VERT/FRAG), so that meshes with
+    different images bind the same texture and draws of many materials can be batched.
+    Images of mixed sizes are packed into one Texture with a TextureAtlas instead.
+    """
+
+    def __init__(self, images, mipmaps=True):
+        """
+        Upload the images into the layers, in the order of `images`
+
+        :param images: image file paths, decoded in the TextureLoader thread pool, or decoded (width, height, data)
+            images, all of the same size; at most GL_MAX_ARRAY_TEXTURE_LAYERS (2048 on GL 4.x)
+        """
+        files = [image for image in images if isinstance(image, (str, os.PathLike))]
+        decoded = iter(TextureLoader.decodeMany(files) if files else [])
+        images = [next(decoded) if isinstance(image, (str, os.PathLike)) else image for image in images]
+        if not images:
+            raise ValueError('TextureArray: no images')
+        if any(isinstance(image, CompressedImage) for image in images):
+            raise ValueError('TextureArray: block compressed images are not supported')
+        sizes = sorted({(image[0], image[1]) for image in images})
+        if len(sizes) > 1:
+            raise ValueError(f'TextureArray: the layers must have the same size, got {sizes}, pack mixed sizes with a TextureAtlas')
+        self._width, self._height = sizes[0]
+        self._layers = len(images)
+        self._texture = gl.glGenTextures(1)
+
+        TextureUnits.bindForUpdate(0, gl.GL_TEXTURE_2D_ARRAY, self._texture)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_WRAP_S, gl.GL_REPEAT)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_WRAP_T, gl.GL_REPEAT)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        # allocate all layers once, then fill them one by one without stacking the images in memory
+        gl.glTexImage3D(gl.GL_TEXTURE_2D_ARRAY, 0, gl.GL_RGBA, self._width, self._height, self._layers, 0,
+                        gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
+        for layer, (width, height, data) in enumerate(images):
+            gl.glTexSubImage3D(gl.GL_TEXTURE_2D_ARRAY, 0, 0, 0, layer, width, height, 1, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, data)
+        if mipmaps:
+            gl.glGenerateMipmap(gl.GL_TEXTURE_2D_ARRAY)
+        self._nbytes = GPUMemory.textureBytes(self._width, self._height, mipmaps=mipmaps, layers=self._layers)
+        GPUMemory.register(self, GPUMemory.TEXTURE, self._nbytes, f'TextureArray {self._width}x{self._height}x{self._layers}')
+
+    @property
+    def glid(self):
+        return self._texture
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def layers(self):
+        return self._layers
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    @staticmethod
+    def texCoords(uvs, layer):
+        """
+        (u, v, layer) texture coordinates of a mesh that shows `layer`, from its (u, v) coordinates
+
+        :return: (vertices, 3) float32 array
+        """
+        uvs = np.asarray(uvs, np.float32)
+        return np.column_stack([uvs[:, :2], np.full(len(uvs), layer, np.float32)])
+
+    def bind(self, unit=0):
+        """
+        Bind the array texture on texture unit `unit`
+        """
+        TextureUnits.bind(unit, gl.GL_TEXTURE_2D_ARRAY, self._texture)
+
+    def unbind(self):
+        TextureUnits.forget(self._texture)
+        GPUMemory.unregister(self)
+        gl.glDeleteTextures(1, self._texture)
+
 
 class texture_data:
     """
@@ -108,12 +327,43 @@ class Texture3D:
     def __init__(self, texture_faces: list):
         """
         Initializes a 3D texture using the texture data for all faces (texture_faces)
+
+        :param texture_faces: list of texture_data, or a Future of it (get_texture_faces(asynchronous=True)),
+            then 1x1 placeholder faces are shown until TextureLoader.poll() uploads the faces
         """
         self._texture = gl.glGenTextures(1)
-        gl.glBindTexture(gl.GL_TEXTURE_CUBE_MAP, self._texture)
-        
+        self._ready = False
+        if isinstance(texture_faces, Future):
+            self._upload(_faces([TextureLoader.placeholder()] * 6))
+            TextureLoader.whenDone(texture_faces, self._finish)
+        else:
+            self._finish(texture_faces)
+        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_WRAP_R, gl.GL_CLAMP_TO_EDGE)
+
+    @property
+    def glid(self):
+        return self._texture
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def _finish(self, texture_faces):
+        self._upload(texture_faces)
+        self._ready = True
+
+    def _upload(self, texture_faces):
+        TextureUnits.bindForUpdate(0, gl.GL_TEXTURE_CUBE_MAP, self._texture)
         count = 0
         for face in texture_faces:
+            if isinstance(face.get_data(), CompressedImage):
+                _compressed(gl.GL_TEXTURE_CUBE_MAP_POSITIVE_X+count, face.get_data())
+                count = count + 1
+                continue
             gl.glTexImage2D(gl.GL_TEXTURE_CUBE_MAP_POSITIVE_X+count, # Target
                             0, # Level
                             gl.GL_RGBA, # Internal Format
@@ -125,53 +375,63 @@ class Texture3D:
                             face.get_data() # Data
                             )
             count = count + 1
-        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
-        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
-        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
-        gl.glTexParameteri(gl.GL_TEXTURE_CUBE_MAP, gl.GL_TEXTURE_WRAP_R, gl.GL_CLAMP_TO_EDGE)
+        GPUMemory.register(self, GPUMemory.CUBE_MAP, sum(_faceBytes(face) for face in texture_faces))
 
-    def bind(self):
+    def bind(self, unit=0):
         """
-        Bind and Activate texture
+        Bind and Activate texture on texture unit `unit`
         """
-        gl.glActiveTexture(gl.GL_TEXTURE0)
-        gl.glBindTexture(gl.GL_TEXTURE_CUBE_MAP,self._texture)
+        TextureUnits.bind(unit, gl.GL_TEXTURE_CUBE_MAP, self._texture)
 
     def unbind(self):
         """
         unbind texture
         """
+        TextureUnits.forget(self._texture)
+        GPUMemory.unregister(self)
         gl.glDeleteTextures(1,self._texture)
     
 
-def get_texture_faces(front,back,top,bottom,left,right):
+def get_texture_faces(front,back,top,bottom,left,right,asynchronous=False):
     """
-    Takes 6 images as input and creates an array with their data that are used for cube mapping
+    Takes 6 images as input and creates an array with their data that are used for cube mapping.
+    The faces are decoded concurrently in the TextureLoader thread pool.
+
+    :param asynchronous: return a Future of the array right away, for Texture3D to load asynchronously
     """
-    faces = []
-    front_img = Image.open(front)
-    back_img = Image.open(back)
-    top_img = Image.open(top)
-    bottom_img = Image.open(bottom)
-    left_img = Image.open(left)
-    right_img = Image.open(right)
+    # GL order of the cube map faces: +x, -x, +y, -y, +z, -z
+    filepaths = [right, left, top, bottom, front, back]
+    if asynchronous:
+        return TextureLoader.decodeManyAsync(filepaths, orient=False, combine=_faces)
+    return _faces(TextureLoader.decodeMany(filepaths, orient=False))
 
-    faces.append(texture_data(right_img.height,right_img.width,right_img.convert("RGBA").tobytes())) #right face
-    faces.append(texture_data(left_img.height,left_img.width,left_img.convert("RGBA").tobytes())) #left face
-    faces.append(texture_data(top_img.height,top_img.width,top_img.convert("RGBA").tobytes())) #top face
-    faces.append(texture_data(bottom_img.height,bottom_img.width,bottom_img.convert("RGBA").tobytes())) #bottom face
-    faces.append(texture_data(front_img.height,front_img.width,front_img.convert("RGBA").tobytes())) #front face
-    faces.append(texture_data(back_img.height,back_img.width,back_img.convert("RGBA").tobytes())) #back_img face
+def get_single_texture_faces(Tex_file,faces=6,asynchronous=False):
+    """
+    Creates an array with the data from a single image
 
-    return faces
+    :param asynchronous: return a Future of the array right away, for Texture3D to load asynchronously
+    """
+    if asynchronous:
+        return TextureLoader.decodeManyAsync([Tex_file], orient=False, combine=lambda images: _faces(images * faces))
+    return _faces([TextureLoader.decode(Tex_file, orient=False)] * faces)
 
-def get_single_texture_faces(Tex_file,faces=6):
+def _faces(images):
     """
-    Creates an array with the data from a single image
+    texture_data of each decoded (width, height, data) image or CompressedImage
     """
-    img = Image.open(Tex_file)
+    return [texture_data(image.height, image.width, image) if isinstance(image, CompressedImage) else texture_data(image[1], image[0], image[2])
+            for image in images]
 
-    faces = [texture_data(img.height,img.width,img.convert("RGBA").tobytes()) for i in range(faces)]
+def _faceBytes(face):
+    data = face.get_data()
+    return data.nbytes if isinstance(data, CompressedImage) else GPUMemory.textureBytes(face.get_width(), face.get_height())
 
-    return faces
\ No newline at end of file
+def _compressed(target, image):
+    """
+    Upload the mip chain of a CompressedImage to `target` of the bound texture
+    """
+    for level, (width, height, data) in enumerate(image.levels):
+        gl.glCompressedTexImage2D(target, level, image.glFormat, width, height, 0, len(data), data)
+    # the chain may stop before 1x1, the texture is complete with the levels it has
+    target = gl.GL_TEXTURE_2D if target == gl.GL_TEXTURE_2D else gl.GL_TEXTURE_CUBE_MAP
+    gl.glTexParameteri(target, gl.GL_TEXTURE_MAX_LEVEL, len(image.levels) - 1)
\ No newline at end of file
@@ -0,0 +1,316 @@
+"""
+UniformStore classes
+
+Typed, preallocated storage for the uniform variables of a linked GLSL program.
+
+The declared GLSL type of every active uniform is read once through program introspection
+and all values are laid out in one contiguous float32 (and one int32) NumPy buffer.
+Setters write in place into that buffer and uploads hand the driver ready-made float32/int32
+views, so there is no per-frame allocation and no type conversion at upload time.
+
+The stores of Shaders that share one program (see ProgramCache) also share a buffer of the values
+last uploaded into it. When a draw switches the program to another store, upload(full=True) only
+sends the uniforms whose values differ from it, e.g. the model matrix, not every uniform again.
+
+"""
+
+from __future__         import annotations
+from collections.abc    import MutableMapping
+
+import OpenGL.GL as gl
+import numpy as np
+
+
+class Uniform:
+    """
+    A single active uniform of a program: location, declared GLSL type and a view into the store buffer
+    """
+    __slots__ = ('name', 'location', 'glType', 'size', 'view', 'isMatrix', 'uploadFunction',
+                 'version', 'uploadedVersion', 'scratch', 'equal', 'uploaded')
+
+    def __init__(self, name, location, glType, size, view, isMatrix, uploadFunction, uploaded=None):
+        self.name = name
+        self.location = location
+        self.glType = glType
+        self.size = size # array length, 1 for plain uniforms
+        self.view = view # in-place view of the store buffer
+        self.isMatrix = isMatrix
+        self.uploadFunction = uploadFunction # name of the glUniform* call
+        self.version = 0 # 0: never set
+        self.uploadedVersion = 0
+        self.scratch = None # buffer of the view's dtype for values of another dtype or shape, allocated on first use
+        self.equal = np.empty(view.shape, bool) # element-wise comparison result of set() and upload()
+        self.uploaded = uploaded if uploaded is not None else np.empty_like(view) # value last uploaded into the program
+
+    def upload(self):
+        function = getattr(gl, self.uploadFunction)
+        if self.isMatrix:
+            function(self.location, self.size, True, self.view) # numpy matrices are row-major
+        else:
+            function(self.location, self.size, self.view)
+        self.uploaded[...] = self.view
+        self.uploadedVersion = self.version
+
+
+class UniformStore:
+    """
+    Per-program typed uniform storage, filled from the program's active uniforms after linking
+    """
+    # GLSL type -> (shape of one element, glUniform* call, is matrix), stored as float32
+    FLOAT_TYPES = {
+        gl.GL_FLOAT:        ((1,),   'glUniform1fv', False),
+        gl.GL_FLOAT_VEC2:   ((2,),   'glUniform2fv', False),
+        gl.GL_FLOAT_VEC3:   ((3,),   'glUniform3fv', False),
+        gl.GL_FLOAT_VEC4:   ((4,),   'glUniform4fv', False),
+        gl.GL_FLOAT_MAT2:   ((2,2),  'glUniformMatrix2fv', True),
+        gl.GL_FLOAT_MAT3:   ((3,3),  'glUniformMatrix3fv', True),
+        gl.GL_FLOAT_MAT4:   ((4,4),  'glUniformMatrix4fv', True),
+    }
+    # GLSL type -> (shape of one element, glUniform* call, is matrix), stored as int32
+    INT_TYPES = {
+        gl.GL_INT:                  ((1,), 'glUniform1iv', False),
+        gl.GL_BOOL:                 ((1,), 'glUniform1iv', False),
+        gl.GL_SAMPLER_2D:           ((1,), 'glUniform1iv', False),
+        gl.GL_SAMPLER_3D:           ((1,), 'glUniform1iv', False),
+        gl.GL_SAMPLER_CUBE:         ((1,), 'glUniform1iv', False),
+        gl.GL_SAMPLER_2D_ARRAY:     ((1,), 'glUniform1iv', False),
+        gl.GL_SAMPLER_2D_SHADOW:    ((1,), 'glUniform1iv', False),
+    }
+
+    # GLSL sampler types, each sampler is assigned its own texture unit (see Shader._introspect)
+    SAMPLER_TYPES = (gl.GL_SAMPLER_2D, gl.GL_SAMPLER_3D, gl.GL_SAMPLER_CUBE, gl.GL_SAMPLER_2D_ARRAY, gl.GL_SAMPLER_2D_SHADOW)
+    # initial values of the uploaded buffers, that no set value equals: never uploaded
+    NOT_UPLOADED_FLOAT = np.nan
+    NOT_UPLOADED_INT = np.iinfo(np.int32).min
+
+    def __init__(self):
+        self._program = None
+        self._uniforms = {} # name -> Uniform
+        self._locations = {} # name -> location, also for names that are not active
+        self._floatData = np.zeros(0, np.float32)
+        self._intData = np.zeros(0, np.int32)
+        self._dirty = [] # Uniforms set since the last upload()
+        self._pending = {} # name -> (value, GLSL type hint) set before the program was linked
+        self._uploaded = None # (float32, int32) values last uploaded into the program, shared with other stores of it
+
+    @property
+    def uniforms(self):
+        return self._uniforms
+
+    @property
+    def locations(self):
+        return self._locations
+
+    @property
+    def floatData(self):
+        return self._floatData
+
+    @property
+    def intData(self):
+        return self._intData
+
+    @property
+    def pending(self):
+        return self._pending
+
+    @property
+    def uploaded(self):
+        return self._uploaded
+
+    @staticmethod
+    def introspect(program):
+        """
+        List the active uniforms of a linked program as (name, location, GLSL type, array size) tuples
+        """
+        activeUniforms = []
+        count = gl.glGetProgramiv(program, gl.GL_ACTIVE_UNIFORMS)
+        for i in range(count):
+            name, size, glType = gl.glGetActiveUniform(program, i)
+            name = name.decode('ascii') if isinstance(name, bytes) else name
+            if name.endswith('[0]'): # arrays are reported by their first element
+                name = name[:-3]
+            activeUniforms.append((name, gl.glGetUniformLocation(program, name), glType, size))
+        return activeUniforms
+
+    def build(self, program, activeUniforms=None, uploaded=None):
+        """
+        Preallocate the storage of the active uniforms of a freshly linked program.
+        Values that were set earlier (before linking, or for a previous program with a uniform
+        of the same name and type) are carried over and will be uploaded on the next upload().
+
+        :param activeUniforms: result of introspect() if already known, e.g. for a shared program
+        :param uploaded: the `uploaded` buffers of another store of the same program, None for new ones
+        """
+        if activeUniforms is None:
+            activeUniforms = UniformStore.introspect(program)
+        previous = self._uniforms
+        self._program = program
+        self._uniforms = {}
+        self._locations = {}
+        self._dirty = []
+
+        active = []
+        floatCount, intCount = 0, 0
+        for name, location, glType, size in activeUniforms:
+            self._locations[name] = location
+            if location == -1: # members of uniform blocks have no location
+                continue
+            if glType in UniformStore.FLOAT_TYPES:
+                shape = UniformStore.FLOAT_TYPES[glType][0]
+                active.append((name, location, glType, size, shape, floatCount))
+                floatCount += size * int(np.prod(shape))
+            elif glType in UniformStore.INT_TYPES:
+                shape = UniformStore.INT_TYPES[glType][0]
+                active.append((name, location, glType, size, shape, intCount))
+                intCount += size * int(np.prod(shape))
+
+        self._floatData = np.zeros(floatCount, np.float32)
+        self._intData = np.zeros(intCount, np.int32)
+        if uploaded is None or (uploaded[0].size, uploaded[1].size) != (floatCount, intCount):
+            uploaded = (np.full(floatCount, UniformStore.NOT_UPLOADED_FLOAT, np.float32),
+                        np.full(intCount, UniformStore.NOT_UPLOADED_INT, np.int32))
+        self._uploaded = uploaded
+        for name, location, glType, size, shape, offset in active:
+            isFloat = glType in UniformStore.FLOAT_TYPES
+            _, uploadFunction, isMatrix = (UniformStore.FLOAT_TYPES if isFloat else UniformStore.INT_TYPES)[glType]
+            data = self._floatData if isFloat else self._intData
+            length = size * int(np.prod(shape))
+            viewShape = shape if size == 1 else (size,) + shape
+            view = data[offset:offset + length].reshape(viewShape)
+            uploadedView = uploaded[0 if isFloat else 1][offset:offset + length].reshape(viewShape)
+            self._uniforms[name] = Uniform(name, location, glType, size, view, isMatrix, uploadFunction, uploadedView)
+
+        # carry over values of a previous program, then values set before linking
+        for name, uniform in self._uniforms.items():
+            old = previous.get(name)
+            if old is not None and old.version and old.glType == uniform.glType and old.view.shape == uniform.view.shape:
+                uniform.view[...] = old.view
+                uniform.version = 1
+                self._dirty.append(uniform)
+        pending, self._pending = self._pending, {}
+        for name, (value, glType) in pending.items():
+            self.set(name, value)
+
+    def set(self, name, value, glType=None):
+        """
+        Write `value` in place into the storage of uniform `name`.
+        The uniform is marked dirty only if the value changed, compared element-wise against the
+        stored float32/int32 value into preallocated buffers, without allocating per call.
+        NumPy arrays of another dtype or shape and Python values are first converted into the uniform's scratch buffer.
+        Names that are not active in the program are ignored, as glUniform*() does for location -1.
+
+        :param glType: optional GLSL type hint, only used to classify values set before linking
+        :return: True if the value changed and will be uploaded
+        """
+        uniform = self._uniforms.get(name)
+        if uniform is None:
+            if self._program is None:
+                self._pending[name] = (value, glType)
+                return True
+            return False
+        view = uniform.view
+        if not (isinstance(value, np.ndarray) and value.dtype == view.dtype and value.shape == view.shape):
+            if uniform.scratch is None:
+                uniform.scratch = np.empty_like(view)
+            try:
+                np.copyto(uniform.scratch, value, casting='unsafe')
+            except (ValueError, TypeError):
+                print(f"UniformStore: cannot assign a value of shape {np.shape(value)} to uniform '{name}' of shape {view.shape}")
+                return False
+            value = uniform.scratch
+        if uniform.version and np.equal(view, value, out=uniform.equal).all():
+            return False
+        view[...] = value
+        if uniform.version == uniform.uploadedVersion:
+            self._dirty.append(uniform)
+        uniform.version += 1
+        return True
+
+    def get(self, name):
+        """
+        Current value of uniform `name`: a view into the store buffer, or the value set before linking
+        """
+        uniform = self._uniforms.get(name)
+        if uniform is not None:
+            return uniform.view
+        return self._pending[name][0]
+
+    def unset(self, name):
+        """
+        Forget the value of uniform `name` so that it is not uploaded any more
+        """
+        if name in self._pending:
+            del self._pending[name]
+            return
+        uniform = self._uniforms[name]
+        if uniform in self._dirty:
+            self._dirty.remove(uniform)
+        uniform.version = uniform.uploadedVersion = 0
+
+    def names(self, glType=None):
+        """
+        Names of all uniforms that have a value, optionally only those of GLSL type `glType`
+        """
+        names = [u.name for u in self._uniforms.values() if u.version and (glType is None or u.glType == glType)]
+        names += [n for n, (v, t) in self._pending.items() if glType is None or t == glType]
+        return names
+
+    def location(self, name):
+        """
+        Location of uniform `name`; names not reported as active are queried once and cached
+        """
+        location = self._locations.get(name)
+        if location is None:
+            location = gl.glGetUniformLocation(self._program, name)
+            self._locations[name] = location
+        return location
+
+    def upload(self, full=False):
+        """
+        Upload every uniform that changed since the last upload, the program must be in use
+
+        :param full: upload every uniform whose value differs from the one last uploaded into the program,
+            when the program is shared and another store uploaded its own values into it in the meantime
+        """
+        if full:
+            for uniform in self._uniforms.values():
+                if not uniform.version:
+                    continue
+                if np.equal(uniform.view, uniform.uploaded, out=uniform.equal).all():
+                    uniform.uploadedVersion = uniform.version
+                else:
+                    uniform.upload()
+        elif self._dirty:
+            for uniform in self._dirty:
+                uniform.upload()
+        self._dirty = []
+
+
+class UniformDictView(MutableMapping):
+    """
+    Dictionary-like view over the uniforms of one GLSL type in a UniformStore.
+    Keeps the old per-type dictionaries of Shader (mat4fDict, float3fDict etc.) working:
+    assignments are written into the typed store instead of being kept as loose Python objects.
+    """
+    def __init__(self, store: UniformStore, glType):
+        self._store = store
+        self._glType = glType
+
+    def __getitem__(self, key):
+        if key not in self._store.names(self._glType):
+            raise KeyError(key)
+        return self._store.get(key)
+
+    def __setitem__(self, key, value):
+        self._store.set(key, value, self._glType)
+
+    def __delitem__(self, key):
+        if key not in self._store.names(self._glType):
+            raise KeyError(key)
+        self._store.unset(key)
+
+    def __iter__(self):
+        return iter(self._store.names(self._glType))
+
+    def __len__(self):
+        return len(self._store.names(self._glType))
@@ -16,21 +16,36 @@ Based on the Composite and Iterator design patterns:
 from __future__         import annotations
 from abc                import ABC, abstractmethod
 from typing             import List
+import ctypes
 
 import OpenGL.GL as gl
 import numpy as np
 
 import pyECSS.System
 from pyECSS.Component import Component, CompNullIterator
+from pyGLV.GL.GeometryArena import GeometryArena
+from pyGLV.GL.DeletionQueue import DeletionQueue
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.VertexFormat import VertexFormat
 
 
 class VertexArray(Component):
     """
     A concrete VertexArray class
     """
-    def __init__(self, name=None, type=None, id=None, attributes=None, index=None, primitive = gl.GL_TRIANGLES, usage=gl.GL_STATIC_DRAW):
+    def __init__(self, name=None, type=None, id=None, attributes=None, index=None, primitive = gl.GL_TRIANGLES, usage=gl.GL_STATIC_DRAW, interleaved=False, streaming=False, arena=None, formats=None):
         """
         Initializes a VertexArray class
+        
+        :param usage: GL usage hint of the vertex buffers, GL_DYNAMIC_DRAW or GL_STREAM_DRAW for data 
+            changed through update_attribute()
+        :param interleaved: pack all vertex attributes into a single strided VBO instead of one VBO per attribute
+        :param streaming: keep every attribute in a persistently mapped PersistentRingBuffer (GL 4.4+), 
+            for data replaced through update_attribute() every frame
+        :param arena: GeometryArena to suballocate the mesh from instead of creating its own buffers and VAO,
+            True for GeometryArena.default(); for static meshes, drawn without VAO rebinds between meshes of one format
+        :param formats: dict shader location -> VertexFormat (or its name) of the attributes stored in fewer bytes 
+            than float32, e.g. {1: VertexFormat.UNORM8} for colors; attributes that are not listed stay float32
         """
         super().__init__(name, type, id)
         
@@ -45,10 +60,22 @@ class VertexArray(Component):
         self._index = index
         self._usage = usage
         self._primitive = primitive #e.g. GL.GL_TRIANGLES
+        self._interleaved = interleaved
+        self._layout = [] # (shader location, components, byte offset) per attribute of the interleaved VBO
+        self._stride = 0 # bytes per vertex of the interleaved VBO
+        self._interleavedData = None # CPU copy of the interleaved VBO, for update_attribute()
+        self._streaming = streaming
+        self._attributeBuffers = {} # shader location -> [buffer, capacity in bytes, components]
+        self._rings = {} # shader location -> PersistentRingBuffer of a streamed attribute
+        self._arena = GeometryArena.default() if arena is True else arena
+        self._allocation = None # GeometryAllocation of a mesh in the arena
+        self._formats = {loc: VertexFormat.get(format) for loc, format in (formats or {}).items()}
         #self.init(attributes, index, usage) #init after a valid GL context is active
     
     @property
     def glid(self):
+        if self._allocation is not None:
+            return self._allocation.pool.glid
         return self._glid
     
     @property
@@ -76,6 +103,42 @@ class VertexArray(Component):
     def usage(self, value):
         self._usage = value
         
+    @property
+    def interleaved(self):
+        return self._interleaved
+    
+    @interleaved.setter
+    def interleaved(self, value):
+        self._interleaved = value
+    
+    @property
+    def streaming(self):
+        return self._streaming
+    
+    @streaming.setter
+    def streaming(self, value):
+        self._streaming = value
+    
+    @property
+    def arena(self):
+        return self._arena
+    
+    @property
+    def allocation(self):
+        return self._allocation
+    
+    @property
+    def formats(self):
+        return self._formats
+    
+    @property
+    def layout(self):
+        return self._layout
+    
+    @property
+    def stride(self):
+        return self._stride
+    
     @property
     def primitive(self):
         return self._primitive
@@ -85,15 +148,26 @@ class VertexArray(Component):
         self._primitive = value
     
     def __del__(self):
-        gl.glDeleteVertexArrays(1, [self._glid])
-        gl.glDeleteBuffers(len(self._buffers), self._buffers)
+        if self._allocation is not None:
+            self._arena.free(self._allocation)
+            return
+        GPUMemory.unregister(self)
+        # deleted by the render window between frames, see DeletionQueue
+        DeletionQueue.release(DeletionQueue.VERTEX_ARRAY, self._glid)
+        DeletionQueue.release(DeletionQueue.BUFFER, *self._buffers)
+        for ring in self._rings.values():
+            ring.delete()
     
     def draw(self):
+        if self._allocation is not None:
+            # the pool's VAO stays bound for the next mesh of the same format
+            self._allocation.draw(self._primitive)
+            return
         
         gl.glBindVertexArray(self._glid)
         self._draw_command(self._primitive, *self._arguments)
         
-        gl.glBindVertexArray(0)
+        VertexArray._unbind()
         
     def update(self):
         self.draw()
@@ -113,22 +187,45 @@ class VertexArray(Component):
         Vertex array from attributes and optional index array. 
         Vertex Attributes should be list of arrays with one row per vertex. 
         """
+        if self._arena is not None:
+            self._init_arena()
+            return
+        
         # create and bind(use) a vertex array object
         self._glid = gl.glGenVertexArrays(1)
         gl.glBindVertexArray(self._glid)
         nb_primitives, size = 0, 0
         
-        # load buffer per vertex attribute (in a list with index = shader layout)
-        for loc, data in enumerate(self._attributes):
-            if data is not None and len(data) : #check if it is empty
-                # bind a new VBO, upload it to GPU, declare size and type
-                self._buffers.append(gl.glGenBuffers(1))
-                data = np.array(data, np.float32, copy=False)
-                nb_primitives, size = data.shape
-                gl.glEnableVertexAttribArray(loc)
-                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffers[-1])
-                gl.glBufferData(gl.GL_ARRAY_BUFFER, data, self._usage)
-                gl.glVertexAttribPointer(loc, size, gl.GL_FLOAT, False, 0, None)
+        if self._interleaved:
+            # a single strided VBO holding all attributes
+            nb_primitives = self._init_interleaved()
+        else:
+            streaming = self._streaming and PersistentRingBuffer.supported()
+            if self._streaming and not streaming:
+                print(f'{self.getClassName()}: persistent mapped buffers need GL 4.4, streaming through glBufferSubData instead')
+            # load buffer per vertex attribute (in a list with index = shader layout)
+            for loc, data in enumerate(self._attributes):
+                if data is not None and len(data) : #check if it is empty
+                    data = np.asarray(data, np.float32)
+                    nb_primitives, size = data.shape
+                    format = self._format(loc)
+                    data = format.pack(data)
+                    if streaming:
+                        # persistently mapped ring of sections, written without stalling on draws in flight
+                        ring = PersistentRingBuffer(data.nbytes)
+                        ring.init(data)
+                        self._rings[loc] = ring
+                        buffer = ring.glid
+                    else:
+                        # bind a new VBO, upload it to GPU, declare size and type
+                        self._buffers.append(gl.glGenBuffers(1))
+                        buffer = self._buffers[-1]
+                        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
+                        gl.glBufferData(gl.GL_ARRAY_BUFFER, data, self._usage)
+                    self._attributeBuffers[loc] = [buffer, data.nbytes, size]
+                    gl.glEnableVertexAttribArray(loc)
+                    gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
+                    gl.glVertexAttribPointer(loc, format.components(size), format.type, format.normalized, format.rowSize(size), None)
            
         
         #optionally create and upload an index buffer for this VBO         
@@ -136,18 +233,498 @@ class VertexArray(Component):
         self._arguments = (0, nb_primitives)
         if self._index is not None and len(self._index): #check if list is empty
             self._buffers += [gl.glGenBuffers(1)]
-            index_buffer = np.array(self._index, np.int32, copy=False)
+            index_buffer, index_type = VertexArray.narrow_index(self._index)
             gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._buffers[-1])
             gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, index_buffer, self._usage)
             self._draw_command = gl.glDrawElements
-            self._arguments = (index_buffer.size, gl.GL_UNSIGNED_INT, None)
+            self._arguments = (index_buffer.size, index_type, None)
+            GPUMemory.register(self, GPUMemory.INDEX, index_buffer.nbytes)
+        self._track_vertices()
         
         # cleanup and unbind so no accidental subsequent state update
+        VertexArray._unbind()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+    
+    def _init_arena(self):
+        """
+        Copy the interleaved mesh into free ranges of the arena's shared buffers
+        """
+        self._allocation = self._arena.allocate(*self._arena_mesh())
+    
+    def _arena_mesh(self):
+        """
+        :return: (interleaved data, layout, stride, index, index type, formats) as GeometryArena.allocate() takes them
+        """
+        data, layout, stride = VertexArray.interleave(self._attributes, self._formats)
+        index, indexType = None, gl.GL_UNSIGNED_SHORT
+        if self._index is not None and len(self._index):
+            index, indexType = VertexArray.narrow_index(self._index)
+        self._layout, self._stride = layout, stride
+        return data, layout, stride, index, indexType, self._formats
+    
+    @staticmethod
+    def init_many(vertexArrays, arena=None):
+        """
+        Initialise many VertexArrays at once, e.g. all VertexArrays of a scene (see InitGLShaderSystem(bulk=True)):
+        static ones (GL_STATIC_DRAW, not streamed, not instanced) are packed into `arena` per vertex format, with
+        one upload of all their vertices and one of all their indices per pool, the others and meshes without vertices
+        are initialised one by one.
+        Like any mesh in a GeometryArena, the packed VertexArrays cannot be updated with update_attribute() anymore.
+        
+        :param arena: GeometryArena for static VertexArrays created without one, GeometryArena.default() if None
+        :return: number of VertexArrays placed in arenas
+        """
+        arena = arena or GeometryArena.default()
+        packed = {} # id of arena -> (arena, [VertexArray])
+        for vertexArray in vertexArrays:
+            # meshes without vertices (e.g. an empty RenderMesh) are initialised as init() does without arena
+            empty = not any(data is not None and len(data) for data in vertexArray._attributes or [])
+            if (vertexArray._arena is None and vertexArray._usage == gl.GL_STATIC_DRAW and not vertexArray._streaming
+                    and not isinstance(vertexArray, InstancedVertexArray) and not empty):
+                vertexArray._arena = arena
+            if vertexArray._arena is None or empty:
+                vertexArray.init()
+            else:
+                packed.setdefault(id(vertexArray._arena), (vertexArray._arena, []))[1].append(vertexArray)
+        for arena, members in packed.values():
+            allocations = arena.allocateMany([vertexArray._arena_mesh() for vertexArray in members])
+            for vertexArray, allocation in zip(members, allocations):
+                vertexArray._allocation = allocation
+        return sum(len(members) for arena, members in packed.values())
+    
+    def _format(self, loc):
+        return self._formats.get(loc, VertexFormat.FLOAT)
+    
+    def _track_vertices(self):
+        """
+        Register the bytes allocated for the vertex buffers with GPUMemory
+        """
+        if self._interleaved:
+            nbytes = 0 if self._interleavedData is None else self._interleavedData.nbytes
+        else:
+            nbytes = sum(self._rings[loc].size if loc in self._rings else capacity 
+                         for loc, (buffer, capacity, size) in self._attributeBuffers.items())
+        GPUMemory.register(self, GPUMemory.VERTEX, nbytes)
+    
+    @staticmethod
+    def _unbind():
         gl.glBindVertexArray(0)
+        GeometryArena.unbound()
+    
+    @staticmethod
+    def narrow_index(index, allowByte=False):
+        """
+        Convert an index array to the narrowest unsigned integer type that holds its largest value,
+        uint16 for meshes of up to 65,536 vertices, which halves index memory compared to uint32.
+        Float indices with integral values (e.g. from generateTerrain) are converted with a warning,
+        anything else that is not a valid vertex index raises a ValueError.
+        
+        :param allowByte: also narrow to uint8, which several drivers emulate with a conversion
+        :return: (contiguous index array, GL index type)
+        """
+        index = np.asarray(index).reshape(-1)
+        if index.dtype.kind == 'f':
+            if not np.all(np.isfinite(index)) or np.any(index != np.floor(index)):
+                raise ValueError('VertexArray: index array holds non-integral values')
+            print(f'VertexArray: converting {index.dtype} index array to integers, pass an integer array instead')
+        elif index.dtype.kind not in 'iu':
+            raise ValueError(f'VertexArray: index array of type {index.dtype} is not an integer array')
+        if index.size and index.min() < 0:
+            raise ValueError('VertexArray: index array holds negative values')
+        maxIndex = int(index.max()) if index.size else 0
+        if allowByte and maxIndex <= np.iinfo(np.uint8).max:
+            return np.ascontiguousarray(index, np.uint8), gl.GL_UNSIGNED_BYTE
+        if maxIndex <= np.iinfo(np.uint16).max:
+            return np.ascontiguousarray(index, np.uint16), gl.GL_UNSIGNED_SHORT
+        if maxIndex > np.iinfo(np.uint32).max:
+            raise ValueError(f'VertexArray: index {maxIndex} does not fit in 32 bits')
+        return np.ascontiguousarray(index, np.uint32), gl.GL_UNSIGNED_INT
+    
+    @staticmethod
+    def interleave(attributes, formats=None):
+        """
+        Pack vertex attributes into one float32 array with one row per vertex
+        
+        :param attributes: list of per-vertex arrays (index = shader layout), None or empty entries are skipped
+        :param formats: dict shader location -> VertexFormat, if any attribute is not FLOAT the rows are packed
+            into a uint8 array of `stride` bytes instead
+        :return: (packed array, [(shader location, components, byte offset)], stride in bytes)
+        """
+        formats = {loc: VertexFormat.get(format) for loc, format in (formats or {}).items()}
+        packed = any(format is not VertexFormat.FLOAT for format in formats.values())
+        columns, layout = [], []
+        offset, nb_vertices = 0, None
+        for loc, data in enumerate(attributes):
+            if data is None or not len(data):
+                continue
+            data = np.asarray(data, np.float32)
+            data = data.reshape(len(data), -1)
+            if nb_vertices is not None and len(data) != nb_vertices:
+                raise ValueError(f'VertexArray: attribute {loc} has {len(data)} vertices, expected {nb_vertices}')
+            nb_vertices = len(data)
+            column = formats.get(loc, VertexFormat.FLOAT).pack(data)
+            if packed:
+                column = column.view(np.uint8)
+            columns.append(column)
+            layout.append((loc, data.shape[1], offset))
+            offset += column.shape[1] * column.itemsize
+        if not columns:
+            return np.zeros((0, 0), np.uint8 if packed else np.float32), layout, 0
+        # one vectorized copy, no loop over vertices
+        return np.ascontiguousarray(np.concatenate(columns, axis=1)), layout, offset
+    
+    def _init_interleaved(self):
+        """
+        Upload all attributes into a single VBO and point every attribute into it with the common stride
+        """
+        data, self._layout, self._stride = VertexArray.interleave(self._attributes, self._formats)
+        if not self._layout:
+            return 0
+        self._interleavedData = data
+        self._buffers.append(gl.glGenBuffers(1))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffers[-1])
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, data, self._usage)
+        for loc, size, offset in self._layout:
+            format = self._format(loc)
+            gl.glEnableVertexAttribArray(loc)
+            gl.glVertexAttribPointer(loc, format.components(size), format.type, format.normalized, self._stride, ctypes.c_void_p(offset))
+        return len(data)
+    
+    def update_attribute(self, loc, data, offset=0):
+        """
+        Replace the values of vertex attribute `loc` from vertex `offset` on, in place on the GPU 
+        instead of creating and initialising a new VertexArray
+        
+        - data that fits the buffer is written with glBufferSubData
+        - a whole attribute (offset 0) that does not fit, or replaces the buffer completely,
+          orphans the buffer (glBufferData with NULL) so the driver does not wait for draws in flight
+        - streamed attributes (streaming=True) are written into the next section of their PersistentRingBuffer
+        
+        :param loc: shader layout location of the attribute
+        :param data: one row per vertex
+        :param offset: index of the first vertex to replace
+        """
+        data = np.asarray(data, np.float32)
+        if self._allocation is not None:
+            raise ValueError(f'{self.getClassName()}: meshes in a GeometryArena are static, create the VertexArray without arena to update it')
+        if self._interleaved:
+            self._update_interleaved(loc, data, offset)
+            return
+        buffer, capacity, size = self._attributeBuffers[loc]
+        format = self._format(loc)
+        data = format.pack(data.reshape(-1, size))
+        byteOffset = offset * format.rowSize(size)
+        
+        ring = self._rings.get(loc)
+        if ring is not None:
+            if byteOffset + data.nbytes > ring.sectionSize:
+                raise ValueError(f'{self.getClassName()}: streamed attribute {loc} holds {ring.sectionSize} bytes, '
+                                 f'cannot write {data.nbytes} bytes at {byteOffset}')
+            ring.advance()
+            ring.write(data, byteOffset)
+            # point the attribute to the section just written
+            gl.glBindVertexArray(self._glid)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
+            gl.glVertexAttribPointer(loc, format.components(size), format.type, format.normalized, format.rowSize(size), ctypes.c_void_p(ring.offset))
+            VertexArray._unbind()
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+            return
+        
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
+        if offset == 0 and data.nbytes >= capacity:
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, data.nbytes, None, self._usage)
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+            self._attributeBuffers[loc][1] = data.nbytes
+            self._track_vertices()
+            if self._draw_command == gl.glDrawArrays: # more vertices to draw
+                self._arguments = (0, max(self._arguments[1], len(data)))
+        elif byteOffset + data.nbytes <= capacity:
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, byteOffset, data.nbytes, data)
+        else:
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+            raise ValueError(f'{self.getClassName()}: attribute {loc} holds {capacity} bytes, cannot write {data.nbytes} bytes '
+                             f'at {byteOffset}, pass the whole attribute to grow it')
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+    
+    def _update_interleaved(self, loc, data, offset):
+        """
+        Write the attribute into its columns of the CPU copy and upload the rows that changed
+        """
+        layout = [entry for entry in self._layout if entry[0] == loc]
+        if not layout:
+            raise KeyError(loc)
+        _, size, byteOffset = layout[0]
+        column = byteOffset // self._interleavedData.itemsize
+        data = self._format(loc).pack(data.reshape(-1, size))
+        if self._interleavedData.dtype == np.uint8:
+            data = data.view(np.uint8)
+        end = offset + len(data)
+        if end > len(self._interleavedData):
+            raise ValueError(f'{self.getClassName()}: interleaved attributes hold {len(self._interleavedData)} vertices, '
+                             f'cannot write vertices {offset} to {end}')
+        self._interleavedData[offset:end, column:column + data.shape[1]] = data
+        rows = self._interleavedData[offset:end]
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffers[0])
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, offset * self._stride, rows.nbytes, rows)
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
     
     def __iter__(self) ->CompNullIterator:
         """ 
         A component does not have children to iterate, thus a NULL iterator
         """
-        return CompNullIterator(self) 
\ No newline at end of file
+        return CompNullIterator(self) 
+
+
+class PersistentRingBuffer:
+    """
+    A GL_ARRAY_BUFFER with immutable storage (glBufferStorage, GL 4.4+) that stays mapped through
+    GL_MAP_PERSISTENT_BIT, split in `sections` equal parts that are written round-robin.
+    Leaving a section places a fence behind the draws that read it, and the CPU only waits on that
+    fence when it comes back to the section: with 3 sections, streaming is triple buffered.
+    The mapping is write only (no GL_MAP_READ_BIT) and often write-combined, so the contents are
+    kept in a CPU shadow copy that new sections are filled from, the mapped bytes are never read.
+    """
+    FLAGS = gl.GL_MAP_WRITE_BIT | gl.GL_MAP_PERSISTENT_BIT | gl.GL_MAP_COHERENT_BIT
+    WAIT_TIMEOUT = 1000000 # nanoseconds per glClientWaitSync
+    
+    def __init__(self, sectionSize, sections=3):
+        self._sectionSize = sectionSize
+        self._sections = sections
+        self._glid = None
+        self._mapped = None # uint8 view of the mapped storage, written only
+        self._shadow = np.zeros(sectionSize, np.uint8) # the contents of the current section
+        self._fences = [None] * sections
+        self._current = 0
+    
+    @staticmethod
+    def supported():
+        """
+        True if the current context offers glBufferStorage (GL 4.4 or ARB_buffer_storage)
+        """
+        return bool(gl.glBufferStorage)
+    
+    @property
+    def glid(self):
+        return self._glid
+    
+    @property
+    def sectionSize(self):
+        return self._sectionSize
+    
+    @property
+    def size(self):
+        """
+        Bytes of the whole storage, all sections
+        """
+        return self._sectionSize * self._sections
+    
+    @property
+    def offset(self):
+        """
+        Byte offset of the current section in the buffer
+        """
+        return self._current * self._sectionSize
+    
+    def init(self, data=None):
+        """
+        Create and map the storage, optionally with `data` in the first section
+        """
+        size = self._sectionSize * self._sections
+        self._glid = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._glid)
+        gl.glBufferStorage(gl.GL_ARRAY_BUFFER, size, None, PersistentRingBuffer.FLAGS)
+        address = gl.glMapBufferRange(gl.GL_ARRAY_BUFFER, 0, size, PersistentRingBuffer.FLAGS)
+        address = ctypes.cast(address, ctypes.c_void_p).value
+        self._mapped = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(address))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        if data is not None:
+            self.write(data)
+    
+    def section(self):
+        """
+        Mapped bytes of the current section, to be written only
+        """
+        return self._mapped[self.offset:self.offset + self._sectionSize]
+    
+    def advance(self):
+        """
+        Move on to the next section, waiting only if the GPU may still read it.
+        The new section starts as a copy of the previous one from the shadow copy, so partial writes
+        keep the other values.
+        """
+        self._fences[self._current] = gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self._current = (self._current + 1) % self._sections
+        fence = self._fences[self._current]
+        if fence is not None:
+            while gl.glClientWaitSync(fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, PersistentRingBuffer.WAIT_TIMEOUT) == gl.GL_TIMEOUT_EXPIRED:
+                pass
+            gl.glDeleteSync(fence)
+            self._fences[self._current] = None
+        self.section()[...] = self._shadow
+    
+    def write(self, data, byteOffset=0):
+        """
+        Copy `data` into the current section at `byteOffset`
+        """
+        raw = np.ascontiguousarray(data).view(np.uint8).reshape(-1)
+        if byteOffset + raw.size > self._sectionSize:
+            raise ValueError(f'PersistentRingBuffer: cannot write {raw.size} bytes at {byteOffset} into a section of {self._sectionSize} bytes')
+        self._shadow[byteOffset:byteOffset + raw.size] = raw
+        self.section()[byteOffset:byteOffset + raw.size] = raw
+    
+    def delete(self):
+        DeletionQueue.release(DeletionQueue.SYNC, *self._fences)
+        self._fences = [None] * self._sections
+        DeletionQueue.release(DeletionQueue.BUFFER, self._glid) # also unmaps the storage
+        self._glid = None
+        self._mapped = None
+
+
+class InstancedVertexArray(VertexArray):
+    """
+    A VertexArray drawn many times in a single glDrawElementsInstanced/glDrawArraysInstanced call.
+    
+    Next to the per-vertex attributes of the mesh, `instanceAttributes` holds one row per instance,
+    e.g. a model matrix and a color, packed into one interleaved instance VBO whose attributes
+    advance once per instance (glVertexAttribDivisor 1). 4x4 matrices take four consecutive
+    locations, as a GLSL `mat4` attribute does, and are passed as NumPy (N, 4, 4) row-major arrays.
+    
+    RenderGLShaderSystem and InitGLShaderSystem visit it as any VertexArray, so one Entity with
+    an InstancedVertexArray replaces one Entity, VertexArray and draw call per copy of the mesh.
+    """
+    def __init__(self, name=None, type=None, id=None, attributes=None, index=None, primitive = gl.GL_TRIANGLES, usage=gl.GL_STATIC_DRAW, interleaved=False, instanceAttributes=None, instanceUsage=gl.GL_DYNAMIC_DRAW, formats=None):
+        """
+        Initializes an InstancedVertexArray class
+        
+        :param instanceAttributes: dict shader location -> array with one row (or one 4x4 matrix) per instance
+        :param instanceUsage: GL usage hint of the instance VBO, GL_DYNAMIC_DRAW or GL_STREAM_DRAW 
+            when the instances are updated every frame
+        """
+        super().__init__(name, type, id, attributes, index, primitive, usage, interleaved, formats=formats)
+        self._instanceAttributes = dict(instanceAttributes or {})
+        self._instanceUsage = instanceUsage
+        self._instanceBuffer = None
+        self._instanceCapacity = 0 # bytes allocated for the instance VBO
+        self._instanceLayout = [] # (shader location, components, byte offset) per location slot of the instance VBO
+        self._instanceStride = 0
+        self._instanceCount = 0
+    
+    @property
+    def instanceAttributes(self):
+        return self._instanceAttributes
+    
+    @property
+    def instanceCount(self):
+        return self._instanceCount
+    
+    @property
+    def instanceLayout(self):
+        return self._instanceLayout
+    
+    @property
+    def instanceStride(self):
+        return self._instanceStride
+    
+    def __del__(self):
+        super().__del__()
+        DeletionQueue.release(DeletionQueue.BUFFER, self._instanceBuffer)
+    
+    @staticmethod
+    def pack_instances(instanceAttributes):
+        """
+        Pack per-instance attributes into one float32 array with one row per instance
+        
+        :param instanceAttributes: dict shader location -> per-instance array, (N, 4, 4) arrays are 
+            row-major matrices and are stored column by column as GLSL expects
+        :return: (packed array, [(shader location, components, byte offset)] with at most 4 components 
+            per location, stride in bytes)
+        """
+        if not instanceAttributes:
+            return np.zeros((0, 0), np.float32), [], 0
+        columns = [None] * (max(instanceAttributes) + 1)
+        for loc, data in instanceAttributes.items():
+            data = np.asarray(data, np.float32)
+            if data.ndim == 3: # matrices, transposed in one vectorized copy
+                data = data.transpose(0, 2, 1)
+            columns[loc] = data.reshape(len(data), -1)
+        data, layout, stride = VertexArray.interleave(columns)
+        # attributes wider than a vec4 (matrices) take one location per 4 components
+        slots = []
+        for loc, size, offset in layout:
+            for i in range(0, size, 4):
+                slots.append((loc + i // 4, min(4, size - i), offset + i * data.itemsize))
+        locations = [loc for loc, size, offset in slots]
+        if len(set(locations)) != len(locations):
+            raise ValueError(f'InstancedVertexArray: instance attributes overlap at locations {sorted(locations)}')
+        return data, slots, stride
+    
+    def init(self):
+        """
+        Initialise the per-vertex buffers as VertexArray does, then the instance VBO
+        """
+        super().init()
+        self._instanceBuffer = gl.glGenBuffers(1)
+        data, layout, stride = InstancedVertexArray.pack_instances(self._instanceAttributes)
+        if data.nbytes:
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._instanceBuffer)
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, data, self._instanceUsage)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self._instanceCapacity = data.nbytes
+        self._instanceCount = len(data)
+        GPUMemory.register(self, GPUMemory.INSTANCE, self._instanceCapacity)
+        self._point_instances(layout, stride)
+    
+    def _point_instances(self, layout, stride):
+        """
+        Point the instance attributes into the instance VBO, advancing once per instance
+        """
+        gl.glBindVertexArray(self._glid)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._instanceBuffer)
+        for loc, size, offset in self._instanceLayout:
+            if loc not in [entry[0] for entry in layout]:
+                gl.glDisableVertexAttribArray(loc)
+        for loc, size, offset in layout:
+            gl.glEnableVertexAttribArray(loc)
+            gl.glVertexAttribPointer(loc, size, gl.GL_FLOAT, False, stride, ctypes.c_void_p(offset))
+            gl.glVertexAttribDivisor(loc, 1)
+        VertexArray._unbind()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self._instanceLayout = layout
+        self._instanceStride = stride
+    
+    def update_instances(self, instanceAttributes=None):
+        """
+        Replace the per-instance attributes with a single upload of the whole instance VBO, 
+        e.g. once per frame after moving the instances. The number of instances may change.
+        
+        - a VBO that is large enough is orphaned (glBufferData with NULL) and refilled with glBufferSubData, 
+          so the driver does not wait for the draws of the previous frame
+        - a larger one is reallocated
+        
+        :param instanceAttributes: dict shader location -> per-instance array, merged into the current ones
+        """
+        if instanceAttributes:
+            self._instanceAttributes.update(instanceAttributes)
+        data, layout, stride = InstancedVertexArray.pack_instances(self._instanceAttributes)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._instanceBuffer)
+        if data.nbytes > self._instanceCapacity:
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, data, self._instanceUsage)
+            self._instanceCapacity = data.nbytes
+            GPUMemory.register(self, GPUMemory.INSTANCE, self._instanceCapacity)
+        elif data.nbytes:
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, self._instanceCapacity, None, self._instanceUsage)
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self._instanceCount = len(data)
+        if layout != self._instanceLayout or stride != self._instanceStride:
+            self._point_instances(layout, stride)
+    
+    def draw(self):
+        if not self._instanceCount:
+            return
+        gl.glBindVertexArray(self._glid)
+        if self._draw_command == gl.glDrawElements:
+            gl.glDrawElementsInstanced(self._primitive, *self._arguments, self._instanceCount)
+        else:
+            gl.glDrawArraysInstanced(self._primitive, *self._arguments, self._instanceCount)
+        VertexArray._unbind()
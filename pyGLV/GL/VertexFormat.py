@@ -0,0 +1,144 @@
+"""
+VertexFormat class
+
+Storage formats of vertex attributes, to upload attributes in fewer bytes than 32-bit floats:
+
+    =========================== ======================== ========== ====================================
+    format                      GL type                  bytes      typical use
+    =========================== ======================== ========== ====================================
+    VertexFormat.FLOAT          GL_FLOAT                 4 per comp positions (default)
+    VertexFormat.HALF           GL_HALF_FLOAT            2 per comp texture coordinates
+    VertexFormat.UNORM8         GL_UNSIGNED_BYTE, norm.  1 per comp colors in [0, 1]
+    VertexFormat.SNORM8         GL_BYTE, normalized      1 per comp directions in [-1, 1]
+    VertexFormat.UNORM16        GL_UNSIGNED_SHORT, norm. 2 per comp high precision values in [0, 1]
+    VertexFormat.SNORM16        GL_SHORT, normalized     2 per comp high precision values in [-1, 1]
+    VertexFormat.INT_2_10_10_10 GL_INT_2_10_10_10_REV    4          normals, xyz in [-1, 1], w in {-1, 0, 1}
+    =========================== ======================== ========== ====================================
+
+Normalized formats are read by the vertex shader as floats in [0, 1] or [-1, 1], so shaders do not
+change: a vec4 color uploaded as 4 bytes instead of 16 still arrives as a vec4. Rows are padded to
+a multiple of 4 bytes, as GL expects attributes to be 4-byte aligned; GL_INT_2_10_10_10_REV always
+delivers 4 components, with w = 0 for 3-component data as a normal direction needs.
+
+A VertexArray takes a dict shader location -> VertexFormat, e.g. for the phong shaders
+
+    VertexArray(attributes=[vertices, colors, normals],
+                formats={1: VertexFormat.UNORM8, 2: VertexFormat.INT_2_10_10_10})
+
+which stores 16 + 4 + 4 instead of 48 bytes per vertex.
+
+"""
+
+from __future__         import annotations
+
+import OpenGL.GL as gl
+import numpy as np
+
+
+class VertexFormat:
+    """
+    GL type of a vertex attribute and its vectorized packing from float data
+    """
+    def __init__(self, name, type, dtype, normalized=False, scale=None, lower=None):
+        self._name = name
+        self._type = type # GL type of glVertexAttribPointer
+        self._dtype = np.dtype(dtype)
+        self._normalized = normalized
+        self._scale = scale # largest integer of normalized formats
+        self._lower = lower # values are clipped to [lower, 1] before scaling
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def type(self):
+        return self._type
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def normalized(self):
+        return self._normalized
+
+    def __repr__(self):
+        return f'VertexFormat.{self._name}'
+
+    def components(self, size):
+        """
+        Components passed to glVertexAttribPointer for data with `size` components per vertex
+        """
+        return size
+
+    def rowSize(self, size):
+        """
+        Bytes per vertex of data with `size` components, padded to a multiple of 4
+        """
+        return -(-size * self._dtype.itemsize // 4) * 4
+
+    def pack(self, data):
+        """
+        Convert float data with one row per vertex to the format, in one vectorized pass
+
+        :return: contiguous (vertices, components) array of the format's dtype, rows padded to a multiple of 4 bytes
+        """
+        data = np.asarray(data, np.float32)
+        data = data.reshape(len(data), -1)
+        if self._scale is not None:
+            data = np.rint(np.clip(data, self._lower, 1.0) * self._scale)
+        columns = self.rowSize(data.shape[1]) // self._dtype.itemsize
+        packed = np.zeros((len(data), columns), self._dtype)
+        packed[:, :data.shape[1]] = data
+        return packed
+
+    @staticmethod
+    def get(format):
+        """
+        VertexFormat from an instance, its name (e.g. 'HALF') or None for FLOAT
+        """
+        if format is None:
+            return VertexFormat.FLOAT
+        if isinstance(format, VertexFormat):
+            return format
+        try:
+            return getattr(VertexFormat, format.upper())
+        except AttributeError:
+            raise ValueError(f'VertexFormat: unknown vertex format {format}') from None
+
+
+class PackedNormalFormat(VertexFormat):
+    """
+    GL_INT_2_10_10_10_REV: x, y, z as 10-bit and w as 2-bit signed normalized integers in one 32-bit word
+    """
+    def __init__(self):
+        super().__init__('INT_2_10_10_10', gl.GL_INT_2_10_10_10_REV, np.uint32, normalized=True)
+
+    def components(self, size):
+        return 4
+
+    def rowSize(self, size):
+        return 4
+
+    def pack(self, data):
+        data = np.asarray(data, np.float32)
+        data = data.reshape(len(data), -1)
+        if data.shape[1] > 4:
+            raise ValueError(f'VertexFormat: {self._name} packs up to 4 components, got {data.shape[1]}')
+        values = np.zeros((len(data), 4), np.float32)
+        values[:, :data.shape[1]] = data
+        values = np.clip(values, -1.0, 1.0) * np.float32([511, 511, 511, 1])
+        # two's complement bit fields, x in the lowest bits
+        fields = np.rint(values).astype(np.int32) & np.int32([0x3FF, 0x3FF, 0x3FF, 0x3])
+        fields = fields.astype(np.uint32) << np.uint32([0, 10, 20, 30])
+        return np.bitwise_or.reduce(fields, axis=1, keepdims=True)
+
+
+VertexFormat.FLOAT = VertexFormat('FLOAT', gl.GL_FLOAT, np.float32)
+VertexFormat.HALF = VertexFormat('HALF', gl.GL_HALF_FLOAT, np.float16)
+VertexFormat.UNORM8 = VertexFormat('UNORM8', gl.GL_UNSIGNED_BYTE, np.uint8, True, 255, 0.0)
+VertexFormat.SNORM8 = VertexFormat('SNORM8', gl.GL_BYTE, np.int8, True, 127, -1.0)
+VertexFormat.UNORM16 = VertexFormat('UNORM16', gl.GL_UNSIGNED_SHORT, np.uint16, True, 65535, 0.0)
+VertexFormat.SNORM16 = VertexFormat('SNORM16', gl.GL_SHORT, np.int16, True, 32767, -1.0)
+VertexFormat.INT_2_10_10_10 = PackedNormalFormat()
@@ -0,0 +1,16 @@
+// DrawBlock shader storage buffer, see pyGLV.GL.DrawBlock for the std430 layout.
+// Defines MODEL, the model matrix of the current draw: in the INDIRECT variants of the library
+// shaders the DrawBlock matrix of the draw (see IndirectRenderGLShaderSystem) when the driver
+// supports it, the model uniform otherwise. Must be included before any declaration.
+#if defined(INDIRECT) && defined(GL_ARB_shader_draw_parameters) && defined(GL_ARB_shader_storage_buffer_object)
+#extension GL_ARB_shader_draw_parameters : require
+#extension GL_ARB_shader_storage_buffer_object : require
+layout (std430, row_major) readonly buffer DrawBlock
+{
+    mat4 models[];
+};
+#define MODEL models[gl_DrawIDARB]
+#else
+uniform mat4 model;
+#define MODEL model
+#endif
@@ -0,0 +1,14 @@
+// FrameBlock uniform buffer, see pyGLV.GL.FrameBlock for the std140 layout.
+// Declared only in the FRAME_BLOCK variants of the library shaders.
+#ifdef FRAME_BLOCK
+layout (std140, row_major) uniform FrameBlock
+{
+    mat4 view;
+    mat4 projection;
+    mat4 viewProj;
+    vec4 viewPos;
+    vec4 lightPos;
+    vec4 lightColor;    // rgb: color, w: intensity
+    vec4 ambientColor;  // rgb: color, w: strength
+};
+#endif
@@ -0,0 +1,20 @@
+// Phong lighting term shared by the library shaders: multiply with the base color of the fragment
+vec3 phongLight(vec3 pos, vec3 normal, vec3 viewPos, vec3 lightPos, vec3 lightColor, float lightIntensity,
+                vec3 ambientColor, float ambientStr, float shininess, vec3 specularColor)
+{
+    vec3 norm = normalize(normal);
+    vec3 lightDir = normalize(lightPos - pos);
+    vec3 viewDir = normalize(viewPos - pos);
+    vec3 reflectDir = reflect(-lightDir, norm);
+
+    // Ambient
+    vec3 ambientProduct = ambientStr * ambientColor;
+    // Diffuse
+    float diffuseStr = max(dot(norm, lightDir), 0.0);
+    vec3 diffuseProduct = diffuseStr * lightColor;
+    // Specular
+    float specularStr = pow(max(dot(viewDir, reflectDir), 0.0), 32);
+    vec3 specularProduct = shininess * specularStr * specularColor;
+
+    return ambientProduct + (diffuseProduct + specularProduct) * lightIntensity;
+}
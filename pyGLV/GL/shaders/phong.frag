@@ -0,0 +1,59 @@
+#version 410
+// Phong fragment uber shader, variants (see Shader.FRAG_PHONG_UBER):
+//   TEXTURED        base color from the ImageTexture sampler instead of the vertex color
+//   MATERIAL_COLOR  lit result tinted by the matColor uniform instead of the base color,
+//                   as in Shader.FRAG_PHONG_MATERIAL
+//   FRAME_BLOCK     camera and light from the FrameBlock uniform buffer instead of per-entity uniforms
+#include "frame_block.glsl"
+#include "lighting.glsl"
+
+in vec4 pos;
+in vec3 normal;
+#ifdef TEXTURED
+in vec2 fragmentTexCoord;
+
+uniform sampler2D ImageTexture;
+#else
+in vec4 color;
+#endif
+
+out vec4 outputColor;
+
+#ifndef FRAME_BLOCK
+// Phong products
+uniform vec3 ambientColor;
+uniform float ambientStr;
+
+// Lighting
+uniform vec3 viewPos;
+uniform vec3 lightPos;
+uniform vec3 lightColor;
+uniform float lightIntensity;
+#endif
+
+// Material
+uniform float shininess;
+#ifdef MATERIAL_COLOR
+uniform vec3 matColor;
+#endif
+
+void main()
+{
+#ifdef TEXTURED
+    vec3 baseColor = texture(ImageTexture, fragmentTexCoord).xyz;
+#else
+    vec3 baseColor = color.xyz;
+#endif
+#ifdef FRAME_BLOCK
+    vec3 light = phongLight(pos.xyz, normal, viewPos.xyz, lightPos.xyz, lightColor.rgb, lightColor.w,
+                            ambientColor.rgb, ambientColor.w, shininess, baseColor);
+#else
+    vec3 light = phongLight(pos.xyz, normal, viewPos, lightPos, lightColor, lightIntensity,
+                            ambientColor, ambientStr, shininess, baseColor);
+#endif
+#ifdef MATERIAL_COLOR
+    outputColor = vec4(light * matColor, 1);
+#else
+    outputColor = vec4(light * baseColor, 1);
+#endif
+}
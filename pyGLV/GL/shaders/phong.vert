@@ -0,0 +1,49 @@
+#version 410
+// Phong vertex uber shader, variants (see Shader.VERT_PHONG_UBER):
+//   TEXTURED     vertices carry (position, normal, texture coordinate) instead of (position, color, normal),
+//                camera from the View and Proj uniforms as in Shader.SIMPLE_TEXTURE_PHONG_VERT
+//   FRAME_BLOCK  camera from the FrameBlock uniform buffer instead of per-entity uniforms
+//   INDIRECT     model matrix from the DrawBlock storage buffer when drawn by IndirectRenderGLShaderSystem
+#include "draw_block.glsl"
+#include "frame_block.glsl"
+
+#ifdef TEXTURED
+layout (location=0) in vec4 vPosition;
+layout (location=1) in vec4 vNormal;
+layout (location=2) in vec2 vTexCoord;
+
+out vec2 fragmentTexCoord;
+#else
+layout (location=0) in vec4 vPosition;
+layout (location=1) in vec4 vColor;
+layout (location=2) in vec4 vNormal;
+
+out vec4 color;
+#endif
+out vec4 pos;
+out vec3 normal;
+
+#if !defined(FRAME_BLOCK) && defined(TEXTURED)
+uniform mat4 View;
+uniform mat4 Proj;
+#elif !defined(FRAME_BLOCK)
+uniform mat4 modelViewProj;
+#endif
+
+void main()
+{
+    pos = MODEL * vPosition;
+#if defined(FRAME_BLOCK)
+    gl_Position = viewProj * pos;
+#elif defined(TEXTURED)
+    gl_Position = Proj * View * pos;
+#else
+    gl_Position = modelViewProj * vPosition;
+#endif
+#ifdef TEXTURED
+    fragmentTexCoord = vTexCoord;
+#else
+    color = vColor;
+#endif
+    normal = mat3(transpose(inverse(MODEL))) * vNormal.xyz;
+}
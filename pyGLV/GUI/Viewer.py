@@ -31,6 +31,10 @@ import pyECSS.utilities as util
 import pyECSS.Event
 from pyECSS.System import System 
 from pyECSS.Component import BasicTransform
+from pyGLV.GL.DeletionQueue import DeletionQueue
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureLoader import TextureLoader
+from pyGLV.GL.TextureCache import TextureCache
 import numpy as np
 
 
@@ -123,6 +127,7 @@ class SDL2Window(RenderWindow):
         self._gWindow = None
         self._gContext = None
         self._gVersionLabel = "None"
+        self._deletionQueue = DeletionQueue() # GL objects released by finalizers, deleted in display_post()
 
         self.openGLversion = openGLversion
         
@@ -165,6 +170,10 @@ class SDL2Window(RenderWindow):
     def gContext(self):
         return self._gContext
     
+    @property
+    def deletionQueue(self):
+        return self._deletionQueue
+    
     
     def init(self):
         """
@@ -238,6 +247,7 @@ class SDL2Window(RenderWindow):
             print("OpenGL Context could not be created! SDL Error: ", sdl2.SDL_GetError())
             exit(1)
         sdl2.SDL_GL_MakeCurrent(self._gWindow, self._gContext)
+        self._deletionQueue.activate()
         if sdl2.SDL_GL_SetSwapInterval(1) < 0:
             print("Warning: Unable to set VSync! SDL Error: " + sdl2.SDL_GetError())
             # exit(1)
@@ -260,6 +270,9 @@ class SDL2Window(RenderWindow):
         """
         #GPTODO make background clear color as parameter at class level
 
+        # upload the textures decoded in the background since the last frame
+        TextureLoader.poll(TextureLoader.UPLOADS_PER_FRAME)
+        TextureCache.update()
             
         gl.glClearColor(*self._colorEditor, 1.0)
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
@@ -290,6 +303,8 @@ class SDL2Window(RenderWindow):
         """
         To be called at the end of each drawn frame to swap double buffers
         """
+        # the frame is submitted and the context is current: delete what finalizers released
+        self._deletionQueue.drain()
         sdl2.SDL_GL_SwapWindow(self._gWindow)
         #print(f'{self.getClassName()}: display_post()')       
     
@@ -300,6 +315,9 @@ class SDL2Window(RenderWindow):
         """
         print(f'{self.getClassName()}: shutdown()')
         if (self._gContext and self._gWindow is not None):
+            TextureLoader.shutdown() # images still decoding have no context to be uploaded to
+            TextureCache.reset() # cached textures are deleted with the context
+            self._deletionQueue.deactivate() # objects released after this died with the context
             sdl2.SDL_GL_DeleteContext(self._gContext)
             sdl2.SDL_DestroyWindow(self._gWindow)
             sdl2.SDL_Quit()   
@@ -415,6 +433,7 @@ class ImGUIDecorator(RenderDecorator):
         self._eye = (2.5, 2.5, 2.5)
         self._target = (0.0, 0.0, 0.0) 
         self._up = (0.0, 1.0, 0.0)
+        self._gpuMemoryTop = 10 # largest resources listed in the GPU memory window
        
     def init(self):
         """
@@ -460,6 +479,8 @@ class ImGUIDecorator(RenderDecorator):
         self.extra()
         #draw scenegraph tree widget
         self.scenegraphVisualiser()
+        #GPU memory of buffers and textures
+        self.gpuMemoryVisualiser()
         #print(f'{self.getClassName()}: display()')
         
         
@@ -578,6 +599,25 @@ class ImGUIDecorator(RenderDecorator):
         Typically this is a custom widget to be extended in an ImGUIDecorator subclass 
         """
         pass
+    
+    def gpuMemoryVisualiser(self):
+        """display the GPUMemory totals per category, peaks, budget and the largest resources
+        """
+        imgui.begin("GPU memory")
+        imgui.text(f"Total: {GPUMemory.format(GPUMemory.total())} in {GPUMemory.count()} resources")
+        imgui.text(f"Peak: {GPUMemory.format(GPUMemory.peak())}")
+        budget = GPUMemory.budget()
+        if budget is not None:
+            imgui.text(f"Budget: {GPUMemory.format(budget)}")
+            imgui.progress_bar(min(1.0, GPUMemory.total() / budget) if budget else 1.0, (0, 0))
+        imgui.separator()
+        for category, total in sorted(GPUMemory.totals().items()):
+            imgui.text(f"{category}: {GPUMemory.format(total)} (peak {GPUMemory.format(GPUMemory.peak(category))})")
+        if imgui.tree_node(f"Largest {self._gpuMemoryTop}"):
+            for label, category, nbytes in GPUMemory.top(self._gpuMemoryTop):
+                imgui.text(f"{GPUMemory.format(nbytes):>12}  {category}  {label}")
+            imgui.tree_pop()
+        imgui.end()
         
         
     def accept(self, system: pyECSS.System, event = None):
@@ -108,6 +108,7 @@ scene.init(imgui=True, windowWidth = 1024, windowHeight = 768, windowTitle = "El
 # pre-pass scenegraph to initialise all GL context dependent geometry, shader classes
 # needs an active GL context
 scene.world.traverse_visit(initUpdate, scene.world.root)
+initUpdate.finishInit() # check all shader programs submitted during the traversal
 
 ################### EVENT MANAGER ###################
 
@@ -142,8 +143,9 @@ top_img = os.path.join(os.path.dirname(__file__), "Skyboxes", "Cloudy", "top.jpg
 
 mat_img = os.path.join(os.path.dirname(__file__), "textures", "dark_wood_texture.jpg")
 
-face_data = get_texture_faces(front_img,back_img,top_img,bottom_img,left_img,right_img)
-face_data_2 = get_single_texture_faces(mat_img)
+# decoded in the background, the window shows placeholder faces until they are uploaded
+face_data = get_texture_faces(front_img,back_img,top_img,bottom_img,left_img,right_img,asynchronous=True)
+face_data_2 = get_single_texture_faces(mat_img,asynchronous=True)
 
 shaderSkybox.setUniformVariable(key='cubemap', value=face_data, texture3D=True)
 shaderDec4.setUniformVariable(key='cubemap', value=face_data_2, texture3D=True)
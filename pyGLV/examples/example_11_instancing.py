@@ -0,0 +1,138 @@
+import numpy as np
+
+import pyECSS.utilities as util
+from pyECSS.Entity import Entity
+from pyECSS.Component import BasicTransform, Camera, RenderMesh
+from pyECSS.System import TransformSystem, CameraSystem
+from pyGLV.GL.Scene import Scene
+from pyGLV.GUI.Viewer import RenderGLStateSystem, ImGUIecssDecorator
+
+from pyGLV.GL.Shader import InitGLShaderSystem, Shader, ShaderGLDecorator, RenderGLShaderSystem
+from pyGLV.GL.VertexArray import InstancedVertexArray
+
+import OpenGL.GL as gl
+
+
+# number of cubes along each side of the grid, 100 x 100 cubes drawn in a single call
+GRID = 100
+
+scene = Scene()    
+
+# Scenegraph with Entities, Components
+rootEntity = scene.world.createEntity(Entity(name="RooT"))
+entityCam1 = scene.world.createEntity(Entity(name="Entity1"))
+scene.world.addEntityChild(rootEntity, entityCam1)
+trans1 = scene.world.addComponent(entityCam1, BasicTransform(name="Entity1_TRS", trs=util.translate(0,0,-8)))
+
+entityCam2 = scene.world.createEntity(Entity(name="Entity_Camera"))
+scene.world.addEntityChild(entityCam1, entityCam2)
+trans2 = scene.world.addComponent(entityCam2, BasicTransform(name="Camera_TRS", trs=util.identity()))
+orthoCam = scene.world.addComponent(entityCam2, Camera(util.ortho(-100.0, 100.0, -100.0, 100.0, 1.0, 100.0), "orthoCam","Camera","500"))
+
+#Simple Cube
+vertexCube = np.array([
+    [-0.5, -0.5, 0.5, 1.0],
+    [-0.5, 0.5, 0.5, 1.0],
+    [0.5, 0.5, 0.5, 1.0],
+    [0.5, -0.5, 0.5, 1.0], 
+    [-0.5, -0.5, -0.5, 1.0], 
+    [-0.5, 0.5, -0.5, 1.0], 
+    [0.5, 0.5, -0.5, 1.0], 
+    [0.5, -0.5, -0.5, 1.0]
+],dtype=np.float32) 
+colorCube = np.array([
+    [0.0, 0.0, 0.0, 1.0],
+    [1.0, 0.0, 0.0, 1.0],
+    [1.0, 1.0, 0.0, 1.0],
+    [0.0, 1.0, 0.0, 1.0],
+    [0.0, 0.0, 1.0, 1.0],
+    [1.0, 0.0, 1.0, 1.0],
+    [1.0, 1.0, 1.0, 1.0],
+    [0.0, 1.0, 1.0, 1.0]
+], dtype=np.float32)
+indexCube = np.array((1,0,3, 1,3,2, 
+                  2,3,7, 2,7,6,
+                  3,0,4, 3,4,7,
+                  6,5,1, 6,1,2,
+                  4,5,6, 4,6,7,
+                  5,4,0, 5,0,1), np.uint32)
+
+# per instance model matrices (N, 4, 4) and colors (N, 4), all computed with vectorized NumPy
+x, z = np.meshgrid(np.arange(GRID) - GRID / 2, np.arange(GRID) - GRID / 2)
+x, z = x.reshape(-1) * 0.3, z.reshape(-1) * 0.3
+instanceModels = np.tile(util.scale(0.1).astype(np.float32), (GRID * GRID, 1, 1))
+instanceModels[:, 0, 3] = x
+instanceModels[:, 2, 3] = z
+instanceColors = np.ones((GRID * GRID, 4), np.float32)
+instanceColors[:, 0] = (x - x.min()) / (x.max() - x.min())
+instanceColors[:, 2] = (z - z.min()) / (z.max() - z.min())
+
+# one Entity, one VertexArray and one Shader for all cubes
+cubes = scene.world.createEntity(Entity(name="Cubes"))
+scene.world.addEntityChild(rootEntity, cubes)
+cubes_trans = scene.world.addComponent(cubes, BasicTransform(name="Cubes_TRS", trs=util.identity()))
+cubes_mesh = scene.world.addComponent(cubes, RenderMesh(name="Cubes_mesh"))
+cubes_mesh.vertex_attributes.append(vertexCube)
+cubes_mesh.vertex_attributes.append(colorCube)
+cubes_mesh.vertex_index.append(indexCube)
+# model matrix at locations 2-5 and color at location 6, see Shader.COLOR_VERT_INSTANCED_FRAMEBLOCK
+cubes_vArray = scene.world.addComponent(cubes, InstancedVertexArray(instanceAttributes={2: instanceModels, 6: instanceColors}, instanceUsage=gl.GL_STREAM_DRAW))
+cubes_shader = scene.world.addComponent(cubes, ShaderGLDecorator(Shader(vertex_source = Shader.COLOR_VERT_INSTANCED_FRAMEBLOCK, fragment_source=Shader.COLOR_FRAG)))
+
+# Systems
+transUpdate = scene.world.createSystem(TransformSystem("transUpdate", "TransformSystem", "001"))
+camUpdate = scene.world.createSystem(CameraSystem("camUpdate", "CameraUpdate", "200"))
+renderUpdate = scene.world.createSystem(RenderGLShaderSystem())
+initUpdate = scene.world.createSystem(InitGLShaderSystem())
+
+
+# MAIN RENDERING LOOP
+
+running = True
+scene.init(imgui=True, windowWidth = 1200, windowHeight = 800, windowTitle = "Elements: Instancing", openGLversion = 4, customImGUIdecorator = ImGUIecssDecorator)
+
+# pre-pass scenegraph to initialise all GL context dependent geometry, shader classes
+# needs an active GL context
+scene.world.traverse_visit(initUpdate, scene.world.root)
+initUpdate.finishInit() # check all shader programs submitted during the traversal
+
+################### EVENT MANAGER ###################
+
+eManager = scene.world.eventManager
+gWindow = scene.renderWindow
+gGUI = scene.gContext
+
+renderGLEventActuator = RenderGLStateSystem()
+
+eManager._subscribers['OnUpdateWireframe'] = gWindow
+eManager._actuators['OnUpdateWireframe'] = renderGLEventActuator
+eManager._subscribers['OnUpdateCamera'] = gWindow 
+eManager._actuators['OnUpdateCamera'] = renderGLEventActuator
+
+
+eye = util.vec(15.0, 15.0, 15.0)
+target = util.vec(0.0, 0.0, 0.0)
+up = util.vec(0.0, 1.0, 0.0)
+view = util.lookat(eye, target, up)
+projMat = util.perspective(50.0, 1200/800, 0.01, 100.0)   
+
+gWindow._myCamera = view # otherwise, an imgui slider must be moved to properly update
+
+frame = 0
+while running:
+    running = scene.render(running)
+    scene.world.traverse_visit(renderUpdate, scene.world.root)
+    scene.world.traverse_visit_pre_camera(camUpdate, orthoCam)
+    scene.world.traverse_visit(camUpdate, scene.world.root)
+    view =  gWindow._myCamera # updates view via the imgui
+    scene.frameBlock.setCamera(view, projMat, eye=eye)
+    cubes_shader.setUniformVariable(key='model', value=cubes_trans.trs, mat4=True)
+
+    # a wave through the grid: all instances are moved and uploaded at once
+    frame += 1
+    instanceModels[:, 1, 3] = 0.5 * np.sin(0.05 * frame + 0.5 * (x + z))
+    cubes_vArray.update_instances({2: instanceModels})
+
+    scene.render_post()
+    
+scene.shutdown()
@@ -157,6 +157,7 @@ scene.init(imgui=True, windowWidth = 1024, windowHeight = 768, windowTitle = "El
 # pre-pass scenegraph to initialise all GL context dependent geometry, shader classes
 # needs an active GL context
 scene.world.traverse_visit(initUpdate, scene.world.root)
+initUpdate.finishInit() # check all shader programs submitted during the traversal
 
 ################### EVENT MANAGER ###################
 
@@ -143,7 +143,7 @@ mesh4.vertex_attributes.append(colors)
 mesh4.vertex_attributes.append(normals)
 mesh4.vertex_index.append(indices)
 vArray4 = scene.world.addComponent(node4, VertexArray())
-shaderDec4 = scene.world.addComponent(node4, ShaderGLDecorator(Shader(vertex_source = Shader.VERT_PHONG_MVP, fragment_source=Shader.FRAG_PHONG)))
+shaderDec4 = scene.world.addComponent(node4, ShaderGLDecorator(Shader(vertex_source = Shader.VERT_PHONG_FRAMEBLOCK, fragment_source=Shader.FRAG_PHONG_FRAMEBLOCK)))
 
 
 
@@ -160,7 +160,7 @@ terrain_mesh.vertex_attributes.append(vertexTerrain)
 terrain_mesh.vertex_attributes.append(colorTerrain)
 terrain_mesh.vertex_index.append(indexTerrain)
 terrain_vArray = scene.world.addComponent(terrain, VertexArray(primitive=GL_LINES))
-terrain_shader = scene.world.addComponent(terrain, ShaderGLDecorator(Shader(vertex_source = Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)))
+terrain_shader = scene.world.addComponent(terrain, ShaderGLDecorator(Shader(vertex_source = Shader.COLOR_VERT_FRAMEBLOCK, fragment_source=Shader.COLOR_FRAG)))
 # terrain_shader.setUniformVariable(key='modelViewProj', value=mvpMat, mat4=True)
 
 ## ADD AXES ##
@@ -175,7 +175,7 @@ axes_vArray = scene.world.addComponent(axes, VertexArray(primitive=gl.GL_LINES))
 
 # shaderDec_axes = scene.world.addComponent(axes, Shader())
 # OR
-axes_shader = scene.world.addComponent(axes, ShaderGLDecorator(Shader(vertex_source = Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)))
+axes_shader = scene.world.addComponent(axes, ShaderGLDecorator(Shader(vertex_source = Shader.COLOR_VERT_FRAMEBLOCK, fragment_source=Shader.COLOR_FRAG)))
 # axes_shader.setUniformVariable(key='modelViewProj', value=mvpMat, mat4=True)
 
 
@@ -187,6 +187,7 @@ scene.init(imgui=True, windowWidth = 1200, windowHeight = 800, windowTitle = "El
 # pre-pass scenegraph to initialise all GL context dependent geometry, shader classes
 # needs an active GL context
 scene.world.traverse_visit(initUpdate, scene.world.root)
+initUpdate.finishInit() # check all shader programs submitted during the traversal
 
 ################### EVENT MANAGER ###################
 
@@ -216,6 +217,9 @@ gWindow._myCamera = view # otherwise, an imgui slider must be moved to properly
 model_terrain_axes = util.translate(0.0,0.0,0.0)
 model_cube = util.scale(1.0) @ util.translate(0.0,0.5,0.0)
 
+# light parameters are shared by all shaders through the per-frame FrameBlock uniform buffer
+scene.frameBlock.setLight(position=Lposition, color=Lcolor, intensity=Lintensity, ambientColor=Lambientcolor, ambientStr=Lambientstr)
+shaderDec4.setUniformVariable(key='shininess',value=Mshininess,float1=True)
 
 
 while running:
@@ -224,24 +228,13 @@ while running:
     scene.world.traverse_visit_pre_camera(camUpdate, orthoCam)
     scene.world.traverse_visit(camUpdate, scene.world.root)
     view =  gWindow._myCamera # updates view via the imgui
-    # mvp_cube = projMat @ view @ model_cube
-    mvp_cube = projMat @ view @ trans4.trs
-    mvp_terrain = projMat @ view @ terrain_trans.trs
-    mvp_axes = projMat @ view @ axes_trans.trs
-    axes_shader.setUniformVariable(key='modelViewProj', value = mvp_axes, mat4=True)
-
-    terrain_shader.setUniformVariable(key='modelViewProj', value=mvp_terrain, mat4=True)
-
-    shaderDec4.setUniformVariable(key='modelViewProj', value=mvp_cube, mat4=True)
-    shaderDec4.setUniformVariable(key='model',value=model_cube,mat4=True)
-    shaderDec4.setUniformVariable(key='ambientColor',value=Lambientcolor,float3=True)
-    shaderDec4.setUniformVariable(key='ambientStr',value=Lambientstr,float1=True)
-    shaderDec4.setUniformVariable(key='viewPos',value=LviewPos,float3=True)
-    shaderDec4.setUniformVariable(key='lightPos',value=Lposition,float3=True)
-    shaderDec4.setUniformVariable(key='lightColor',value=Lcolor,float3=True)
-    shaderDec4.setUniformVariable(key='lightIntensity',value=Lintensity,float1=True)
-    shaderDec4.setUniformVariable(key='shininess',value=Mshininess,float1=True)
-    shaderDec4.setUniformVariable(key='matColor',value=Mcolor,float3=True)
+    # camera is written once per frame for all shaders, entities only upload their model matrix
+    scene.frameBlock.setCamera(view, projMat, eye=LviewPos)
+    axes_shader.setUniformVariable(key='model', value=axes_trans.trs, mat4=True)
+
+    terrain_shader.setUniformVariable(key='model', value=terrain_trans.trs, mat4=True)
+
+    shaderDec4.setUniformVariable(key='model',value=trans4.trs,mat4=True)
 
 
     scene.render_post()
@@ -123,7 +123,7 @@ mesh4.vertex_attributes.append(vertices)
 mesh4.vertex_attributes.append(colors)
 mesh4.vertex_attributes.append(normals)
 mesh4.vertex_index.append(indices)
-vArray4 = scene.world.addComponent(node4, VertexArray())
+vArray4 = scene.world.addComponent(node4, VertexArray(interleaved=True)) # one strided VBO for the large imported mesh
 shaderDec4 = scene.world.addComponent(node4, ShaderGLDecorator(Shader(vertex_source = Shader.VERT_PHONG_MVP, fragment_source=Shader.FRAG_PHONG)))
 
 
@@ -168,6 +168,7 @@ scene.init(imgui=True, windowWidth = 1200, windowHeight = 800, windowTitle = "El
 # pre-pass scenegraph to initialise all GL context dependent geometry, shader classes
 # needs an active GL context
 scene.world.traverse_visit(initUpdate, scene.world.root)
+initUpdate.finishInit() # check all shader programs submitted during the traversal
 
 ################### EVENT MANAGER ###################
 
@@ -208,6 +208,7 @@ def main(imguiFlag = False):
     gl.glEnable(gl.GL_DEPTH_TEST);
     gl.glDepthFunc(gl.GL_LESS);
     scene.world.traverse_visit(initUpdate, scene.world.root)
+    initUpdate.finishInit() # check all shader programs submitted during the traversal
     
 
     ############################################
@@ -0,0 +1,134 @@
+"""
+CountingGL test helper
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+from collections import Counter
+
+import OpenGL.GL as GL
+import numpy as np
+
+
+class CountingGL:
+    """
+    Minimal stand-in for the OpenGL.GL module that counts every GL call, so that
+    the Shader logic can be tested without an active GL context.
+    GL_* constants are forwarded to the real OpenGL.GL module.
+    """
+    def __init__(self, uniforms=None, blocks=None):
+        # list of (name, size, GL type) reported as the program's active uniforms
+        self.uniforms = uniforms if uniforms is not None else []
+        # list of uniform block names declared by the program
+        self.blocks = blocks if blocks is not None else []
+        self.storageBlocks = [] # shader storage block names declared by the program
+        self.linkStatus = 1
+        self.completed = None # ids of programs reporting GL_COMPLETION_STATUS, None: all of them
+        self.nextProgram = 7
+        self.nextTexture = 1
+        self.nextSync = 0
+        self.mapped = None # host memory handed out by glMapBufferRange
+        self.programBinary = b'stub program binary'
+        self.programBinaryFormat = 0x1234
+        self.calls = Counter()
+        self.log = []
+    
+    def __getattr__(self, name):
+        if name.startswith('GL_'):
+            return getattr(GL, name)
+        def glCall(*args):
+            self.calls[name] += 1
+            self.log.append((name, args))
+            return None
+        setattr(self, name, glCall) # the same function on every access, as with a module
+        return glCall
+    
+    def _record(self, name, *args):
+        self.calls[name] += 1
+        self.log.append((name, args))
+    
+    def glCreateShader(self, shaderType):
+        self._record('glCreateShader', shaderType)
+        return 1
+    
+    def glGetShaderiv(self, shader, pname):
+        self._record('glGetShaderiv', shader, pname)
+        return 1
+    
+    def glCreateProgram(self):
+        self._record('glCreateProgram')
+        self.nextProgram += 1
+        return self.nextProgram - 1
+    
+    def glGetProgramiv(self, program, pname):
+        self._record('glGetProgramiv', program, pname)
+        if pname == GL.GL_ACTIVE_UNIFORMS:
+            return len(self.uniforms)
+        if pname == GL.GL_LINK_STATUS:
+            return self.linkStatus
+        if pname == GL.GL_PROGRAM_BINARY_LENGTH:
+            return len(self.programBinary)
+        if pname == 0x91B1: # GL_COMPLETION_STATUS_KHR
+            return int(self.completed is None or program in self.completed)
+        return 1
+    
+    def glGetActiveUniform(self, program, index):
+        self._record('glGetActiveUniform', program, index)
+        name, size, uniformType = self.uniforms[index]
+        return name.encode('ascii'), size, uniformType
+    
+    def glGetUniformLocation(self, program, name):
+        self._record('glGetUniformLocation', program, name)
+        names = [u[0].replace('[0]', '') for u in self.uniforms]
+        return names.index(name) if name in names else -1
+    
+    def glGetUniformBlockIndex(self, program, name):
+        self._record('glGetUniformBlockIndex', program, name)
+        return self.blocks.index(name) if name in self.blocks else GL.GL_INVALID_INDEX
+    
+    def glGetProgramResourceIndex(self, program, interface, name):
+        self._record('glGetProgramResourceIndex', program, interface, name)
+        return self.storageBlocks.index(name) if name in self.storageBlocks else GL.GL_INVALID_INDEX
+    
+    def glGenBuffers(self, count):
+        self._record('glGenBuffers', count)
+        return 1 if count == 1 else list(range(1, count + 1))
+    
+    def glGenTextures(self, count):
+        self._record('glGenTextures', count)
+        self.nextTexture += count
+        return self.nextTexture - 1 if count == 1 else list(range(self.nextTexture - count, self.nextTexture))
+    
+    def glGetIntegerv(self, pname):
+        self._record('glGetIntegerv', pname)
+        if pname == GL.GL_NUM_PROGRAM_BINARY_FORMATS:
+            return 1
+        if pname == GL.GL_PROGRAM_BINARY_FORMATS:
+            return [self.programBinaryFormat]
+        return 0
+    
+    def glGetString(self, name):
+        self._record('glGetString', name)
+        return b'CountingGL'
+    
+    def glGetProgramBinary(self, program, bufSize, length, binaryFormat, binary):
+        self._record('glGetProgramBinary', program, bufSize)
+        binary[:len(self.programBinary)] = list(self.programBinary)
+        length[0] = len(self.programBinary)
+        binaryFormat[0] = self.programBinaryFormat
+    
+    def glGetProgramInfoLog(self, program):
+        self._record('glGetProgramInfoLog', program)
+        return b'CountingGL: link failed' if not self.linkStatus else b''
+    
+    def glMapBufferRange(self, target, offset, length, access):
+        self._record('glMapBufferRange', target, offset, length, access)
+        self.mapped = np.zeros(length, np.uint8)
+        return self.mapped.ctypes.data
+    
+    def glFenceSync(self, condition, flags):
+        self._record('glFenceSync', condition, flags)
+        self.nextSync += 1
+        return self.nextSync
@@ -0,0 +1,143 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import OpenGL.GL as GL
+from PIL import Image
+
+from pyGLV.GL.CompressedImage import CompressedImage
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureLoader import TextureLoader
+from pyGLV.GL.Textures import Texture, Texture3D, TextureUnits, get_texture_faces
+from pyGLV.tests.CountingGL import CountingGL
+from pyGLV.utils.compress_textures import convert, main
+
+
+class TestCompressedImage(unittest.TestCase):
+    """BC1/BC3/BC7 mip chains in DDS and KTX2 files, uploaded with glCompressedTexImage2D
+    """
+    def setUp(self):
+        print("TestCompressedImage:setUp START".center(100, '-'))
+
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.Textures.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        TextureUnits.reset()
+        GPUMemory.reset()
+        # a horizontal gradient, which block compression keeps within a few steps
+        ramp = np.linspace(0, 255, 16).astype(np.uint8)
+        self.pixels = np.full((16, 16, 4), 255, np.uint8)
+        self.pixels[..., 0] = ramp[None, :]
+        self.pixels[..., 1] = ramp[None, :] // 2
+        self.pixels[..., 2] = 64
+        self.directory = tempfile.mkdtemp()
+        self.imageFile = os.path.join(self.directory, 'gradient.png')
+        Image.fromarray(self.pixels, 'RGBA').save(self.imageFile)
+
+        print("TestCompressedImage:setUp END".center(100, '-'))
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        GPUMemory.reset()
+
+    @unittest.skipUnless(CompressedImage.canEncode(), 'needs the BCn encoder of Pillow 11.2+')
+    def test_encode(self):
+        print("TestCompressedImage:test_encode START".center(100, '-'))
+
+        image = CompressedImage.fromImage(self.pixels)
+        # opaque images are BC1, 8 bytes per 4x4 block
+        self.assertEqual(image.format, 'BC1')
+        self.assertEqual([level[:2] for level in image.levels], [(16, 16), (8, 8), (4, 4), (2, 2), (1, 1)])
+        self.assertEqual(image.levelBytes(0), self.pixels.nbytes // 8)
+        self.assertEqual(image.nbytes, (16 + 4 + 1 + 1 + 1) * 8)
+
+        translucent = self.pixels.copy()
+        translucent[0, 0, 3] = 0
+        self.assertEqual(CompressedImage.fromImage(translucent).format, 'BC3')
+        self.assertEqual(CompressedImage.fromImage(translucent, mipmaps=False).nbytes, self.pixels.nbytes // 4)
+        with self.assertRaises(ValueError):
+            CompressedImage.fromImage(self.pixels, 'BC7')
+
+        print("TestCompressedImage:test_encode END".center(100, '-'))
+
+    @unittest.skipUnless(CompressedImage.canEncode(), 'needs the BCn encoder of Pillow 11.2+')
+    def test_containers(self):
+        print("TestCompressedImage:test_containers START".center(100, '-'))
+
+        for format in ('BC1', 'BC3'):
+            image = CompressedImage.fromImage(self.pixels, format)
+            for container in ('dds', 'ktx2'):
+                filepath = os.path.join(self.directory, f'{format}.{container}')
+                image.save(filepath)
+                loaded = CompressedImage.load(filepath)
+                self.assertEqual((loaded.format, loaded.levels), (format, image.levels))
+            # Pillow decodes level 0 of the DDS file close to the original
+            decoded = np.asarray(Image.open(io.BytesIO(image.toDDS())).convert('RGBA'), np.int32)
+            self.assertLess(np.abs(decoded - self.pixels).max(), 16)
+
+        # BC7 files of other tools are read, DDS with the DX10 header
+        image = CompressedImage('BC7', 8, 4, [bytes(32), bytes(16), bytes(16), bytes(16)])
+        self.assertEqual(CompressedImage.fromDDS(image.toDDS()).levels, image.levels)
+        self.assertEqual(CompressedImage.fromKTX2(image.toKTX2()).glFormat, GL.GL_COMPRESSED_RGBA_BPTC_UNORM)
+        with self.assertRaises(ValueError):
+            CompressedImage('BC1', 8, 8, [bytes(16)])
+
+        print("TestCompressedImage:test_containers END".center(100, '-'))
+
+    @unittest.skipUnless(CompressedImage.canEncode(), 'needs the BCn encoder of Pillow 11.2+')
+    def test_texture_upload(self):
+        print("TestCompressedImage:test_texture_upload START".center(100, '-'))
+
+        filepath, image = convert(self.imageFile)
+        self.assertEqual(filepath, os.path.join(self.directory, 'gradient.ktx2'))
+        # compressed in the orientation of Texture
+        expected = CompressedImage.fromImage(TextureLoader.decode(self.imageFile)[2])
+        self.assertEqual(image.levels, expected.levels)
+
+        Texture(filepath)
+        uploads = [args[:5] for name, args in self.stubGL.log if name == 'glCompressedTexImage2D']
+        self.assertEqual(uploads, [(GL.GL_TEXTURE_2D, level, image.glFormat, width, height)
+                                   for level, (width, height, data) in enumerate(image.levels)])
+        # no uncompressed upload and no mipmap generation at load time
+        self.assertEqual((self.stubGL.calls['glTexImage2D'], self.stubGL.calls['glGenerateMipmap']), (0, 0))
+        self.assertEqual(GPUMemory.total(GPUMemory.TEXTURE), image.nbytes)
+
+        faces = [convert(self.imageFile, container='dds', faces=True)[0]] * 6
+        Texture3D(get_texture_faces(*faces))
+        targets = [args[0] for name, args in self.stubGL.log if name == 'glCompressedTexImage2D'][len(uploads):]
+        self.assertEqual(targets, [GL.GL_TEXTURE_CUBE_MAP_POSITIVE_X + face for face in range(6) for level in image.levels])
+        self.assertEqual(GPUMemory.total(GPUMemory.CUBE_MAP), 6 * image.nbytes)
+
+        print("TestCompressedImage:test_texture_upload END".center(100, '-'))
+
+    def test_missing_encoder(self):
+        print("TestCompressedImage:test_missing_encoder START".center(100, '-'))
+
+        # Pillow before 11.2, e.g. on Python 3.8: a clear error instead of an unknown codec
+        with mock.patch.object(CompressedImage, 'canEncode', return_value=False):
+            with self.assertRaisesRegex(RuntimeError, 'Pillow 11.2'):
+                CompressedImage.fromImage(self.pixels)
+            with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+                main([self.imageFile])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'gradient.ktx2')))
+
+        print("TestCompressedImage:test_missing_encoder END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
@@ -0,0 +1,90 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import gc
+import unittest
+from unittest import mock
+
+from pyGLV.GL.DeletionQueue import DeletionQueue
+from pyGLV.GL.ProgramCache import ProgramCache
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestDeletionQueue(unittest.TestCase):
+    """GL objects released by finalizers are deleted in batches at a safe point
+    """
+    def setUp(self):
+        print("TestDeletionQueue:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL), mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        self.queue = DeletionQueue()
+        
+        print("TestDeletionQueue:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+        DeletionQueue._current = None
+        DeletionQueue._discard = False
+    
+    def test_without_window(self):
+        print("TestDeletionQueue:test_without_window START".center(100, '-'))
+        
+        # no render window: deleted right away, None and 0 are not GL names
+        DeletionQueue.release(DeletionQueue.BUFFER, 3, None, 4)
+        DeletionQueue.release(DeletionQueue.VERTEX_ARRAY, None)
+        self.assertEqual(self.stubGL.log, [('glDeleteBuffers', (2, [3, 4]))])
+        
+        print("TestDeletionQueue:test_without_window END".center(100, '-'))
+    
+    def test_batched_drain(self):
+        print("TestDeletionQueue:test_batched_drain START".center(100, '-'))
+        
+        self.queue.activate()
+        for name in range(1, 1001):
+            DeletionQueue.release(DeletionQueue.VERTEX_ARRAY, name)
+            DeletionQueue.release(DeletionQueue.BUFFER, 2 * name, 2 * name + 1)
+        program = ProgramCache.register('key', 7)
+        ProgramCache.release(program)
+        self.assertEqual(self.stubGL.log, [])
+        self.assertEqual(self.queue.pending, 3001)
+        
+        # one call per kind of object
+        self.assertEqual(self.queue.drain(), 3001)
+        self.assertEqual([name for name, args in self.stubGL.log], ['glDeleteVertexArrays', 'glDeleteBuffers', 'glDeleteProgram'])
+        self.assertEqual(self.stubGL.log[1][1][0], 2000)
+        self.assertEqual(self.queue.stats['calls'], 3)
+        self.assertEqual(self.queue.drain(), 0)
+        
+        print("TestDeletionQueue:test_batched_drain END".center(100, '-'))
+    
+    def test_after_shutdown(self):
+        print("TestDeletionQueue:test_after_shutdown START".center(100, '-'))
+        
+        self.queue.activate()
+        DeletionQueue.release(DeletionQueue.TEXTURE, 5)
+        self.queue.deactivate()
+        self.assertEqual(self.stubGL.log, [('glDeleteTextures', (1, [5]))])
+        
+        # the context is gone with its objects, nothing to delete any more
+        DeletionQueue.release(DeletionQueue.TEXTURE, 6)
+        self.assertEqual(len(self.stubGL.log), 1)
+        self.assertIsNone(DeletionQueue.current())
+        
+        print("TestDeletionQueue:test_after_shutdown END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
@@ -0,0 +1,73 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import unittest
+from unittest import mock
+
+import OpenGL.GL as GL
+import numpy as np
+
+from pyGLV.GL.FrameBlock import FrameBlock
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestFrameBlock(unittest.TestCase):
+    
+    def setUp(self):
+        print("TestFrameBlock:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patcher = mock.patch('pyGLV.GL.FrameBlock.gl', self.stubGL)
+        self.patcher.start()
+        self.frameBlock = FrameBlock()
+        
+        print("TestFrameBlock:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        self.patcher.stop()
+    
+    def test_std140_layout(self):
+        print("TestFrameBlock:test_std140_layout START".center(100, '-'))
+        
+        view = np.identity(4)
+        view[:3, 3] = (0.0, 0.0, -5.0)
+        projection = np.diag([2.0, 2.0, -1.0, 1.0])
+        self.frameBlock.setCamera(view, projection)
+        self.frameBlock.setLight(position=(1.0, 2.0, 3.0), color=(0.5, 0.5, 0.5), intensity=0.8, ambientStr=0.3)
+        
+        data = self.frameBlock.data
+        self.assertEqual(data.nbytes, FrameBlock.SIZE)
+        np.testing.assert_array_equal(data[0:16].reshape(4,4), view)
+        np.testing.assert_array_equal(data[16:32].reshape(4,4), projection)
+        np.testing.assert_allclose(data[32:48].reshape(4,4), projection @ view)
+        np.testing.assert_allclose(data[48:51], (0.0, 0.0, 5.0)) # eye from the inverse view
+        np.testing.assert_allclose(data[52:55], (1.0, 2.0, 3.0))
+        np.testing.assert_allclose(data[56:60], (0.5, 0.5, 0.5, 0.8))
+        self.assertAlmostEqual(data[63], 0.3)
+        
+        print("TestFrameBlock:test_std140_layout END".center(100, '-'))
+    
+    def test_uploaded_once_per_change(self):
+        print("TestFrameBlock:test_uploaded_once_per_change START".center(100, '-'))
+        
+        self.frameBlock.init()
+        self.assertEqual(self.stubGL.log[-2], ('glBindBufferBase', (GL.GL_UNIFORM_BUFFER, FrameBlock.BINDING, 1)))
+        for frame in range(5):
+            self.frameBlock.update()
+        self.frameBlock.setLight(intensity=0.5)
+        self.frameBlock.update()
+        
+        self.assertEqual(self.stubGL.calls['glBufferSubData'], 2)
+        
+        print("TestFrameBlock:test_uploaded_once_per_change END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
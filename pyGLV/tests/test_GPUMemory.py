@@ -0,0 +1,118 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.GeometryArena import GeometryArena
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class Resource:
+    def __init__(self, name):
+        self.name = name
+
+
+class TestGPUMemory(unittest.TestCase):
+    """Byte sizes of buffers and textures accounted per category, with peaks and a soft budget
+    """
+    def setUp(self):
+        print("TestGPUMemory:setUp START".center(100, '-'))
+
+        GPUMemory.reset()
+
+        print("TestGPUMemory:setUp END".center(100, '-'))
+
+    def tearDown(self):
+        GPUMemory.reset()
+
+    def test_texture_bytes(self):
+        print("TestGPUMemory:test_texture_bytes START".center(100, '-'))
+
+        self.assertEqual(GPUMemory.textureBytes(256, 128), 256 * 128 * 4)
+        # 256x128, 128x64, ..., 2x1, 1x1
+        levels = [(256 >> i) * max(1, 128 >> i) for i in range(9)]
+        self.assertEqual(GPUMemory.textureBytes(256, 128, mipmaps=True), sum(levels) * 4)
+        self.assertEqual(GPUMemory.textureBytes(64, 64, layers=6), 6 * 64 * 64 * 4)
+
+        print("TestGPUMemory:test_texture_bytes END".center(100, '-'))
+
+    def test_totals_peak_top(self):
+        print("TestGPUMemory:test_totals_peak_top START".center(100, '-'))
+
+        mesh, texture = Resource('mesh'), Resource('brick')
+        GPUMemory.register(mesh, GPUMemory.VERTEX, 1000)
+        GPUMemory.register(mesh, GPUMemory.INDEX, 200)
+        GPUMemory.register(texture, GPUMemory.TEXTURE, 4096, 'Texture brick.png')
+        self.assertEqual(GPUMemory.totals(), {GPUMemory.VERTEX: 1000, GPUMemory.INDEX: 200, GPUMemory.TEXTURE: 4096})
+
+        # registering again replaces the size, e.g. after a buffer grew
+        GPUMemory.register(mesh, GPUMemory.VERTEX, 3000)
+        self.assertEqual(GPUMemory.total(), 7296)
+        self.assertEqual(GPUMemory.top(2), [('Texture brick.png', GPUMemory.TEXTURE, 4096), ('Resource mesh', GPUMemory.VERTEX, 3000)])
+
+        GPUMemory.unregister(mesh)
+        self.assertEqual(GPUMemory.total(), 4096)
+        self.assertEqual(GPUMemory.peak(), 7296)
+        self.assertEqual(GPUMemory.peak(GPUMemory.VERTEX), 3000)
+        self.assertEqual(GPUMemory.count(), 1)
+        self.assertIn('Texture brick.png', GPUMemory.report())
+
+        print("TestGPUMemory:test_totals_peak_top END".center(100, '-'))
+
+    def test_budget_eviction(self):
+        print("TestGPUMemory:test_budget_eviction START".center(100, '-'))
+
+        resources = [Resource(str(i)) for i in range(4)]
+        evicted = []
+        def evict(excess):
+            # free the oldest resources until the excess is covered
+            while excess > 0:
+                resource = resources.pop(0)
+                GPUMemory.unregister(resource)
+                evicted.append(resource.name)
+                excess -= 100
+        GPUMemory.setBudget(250)
+        GPUMemory.addEvictionCallback(evict)
+        for resource in list(resources):
+            GPUMemory.register(resource, GPUMemory.TEXTURE, 100)
+        self.assertEqual(evicted, ['0', '1'])
+        self.assertLessEqual(GPUMemory.total(), 250)
+
+        # without callbacks the budget is only reported, nothing is refused
+        GPUMemory.removeEvictionCallback(evict)
+        GPUMemory.register(Resource('large'), GPUMemory.TEXTURE, 1000)
+        self.assertEqual(GPUMemory.total(), 1200)
+
+        print("TestGPUMemory:test_budget_eviction END".center(100, '-'))
+
+    def test_arena_pools(self):
+        print("TestGPUMemory:test_arena_pools START".center(100, '-'))
+
+        stubGL = CountingGL()
+        with mock.patch('pyGLV.GL.GeometryArena.gl', stubGL):
+            arena = GeometryArena(vertexCapacity=16, indexCapacity=48)
+            layout, stride = [(0, 4, 0)], 16
+            arena.allocate(np.zeros((4, 4), np.float32), layout, stride, np.arange(6, dtype=np.uint16))
+            self.assertEqual(GPUMemory.total(GPUMemory.ARENA), 16 * 16 + 48 * 2)
+            # pools count their capacity, which doubles when they grow
+            arena.allocate(np.zeros((20, 4), np.float32), layout, stride)
+            self.assertEqual(GPUMemory.total(GPUMemory.ARENA), 32 * 16 + 48 * 2)
+            arena.delete()
+            self.assertEqual(GPUMemory.total(), 0)
+
+        print("TestGPUMemory:test_arena_pools END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
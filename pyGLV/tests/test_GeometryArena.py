@@ -0,0 +1,179 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import OpenGL.GL as GL
+
+from pyGLV.GL.GeometryArena import FreeList, GeometryArena
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestFreeList(unittest.TestCase):
+    
+    def test_allocate_free(self):
+        print("TestFreeList:test_allocate_free START".center(100, '-'))
+        
+        freeList = FreeList(100)
+        offsets = [freeList.allocate(size) for size in (10, 20, 30)]
+        self.assertEqual(offsets, [0, 10, 30])
+        self.assertEqual(freeList.used, 60)
+        
+        # freeing the middle range leaves a hole that the next fitting allocation reuses
+        freeList.free(10, 20)
+        self.assertEqual(freeList.freeRanges, [(10, 20), (60, 40)])
+        self.assertAlmostEqual(freeList.fragmentation(), 1.0 - 40 / 60)
+        self.assertEqual(freeList.allocate(15), 10)
+        self.assertIsNone(freeList.allocate(50))
+        
+        # neighbouring free ranges are merged
+        freeList.free(10, 15)
+        freeList.free(0, 10)
+        freeList.free(30, 30)
+        self.assertEqual(freeList.freeRanges, [(0, 100)])
+        self.assertEqual(freeList.fragmentation(), 0.0)
+        freeList.grow(150)
+        self.assertEqual(freeList.freeRanges, [(0, 150)])
+        with self.assertRaises(ValueError):
+            freeList.allocate(0)
+        
+        print("TestFreeList:test_allocate_free END".center(100, '-'))
+
+
+class TestGeometryArena(unittest.TestCase):
+    """Meshes suballocated from shared buffers, without an active GL context
+    """
+    def setUp(self):
+        print("TestGeometryArena:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patcher = mock.patch('pyGLV.GL.GeometryArena.gl', self.stubGL)
+        self.patcher.start()
+        self.arena = GeometryArena(vertexCapacity=20, indexCapacity=48)
+        self.layout = [(0, 4, 0), (1, 4, 16)]
+        self.cube = np.zeros((8, 8), np.float32)
+        self.index = np.arange(36, dtype=np.uint16) % 8
+        
+        print("TestGeometryArena:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        GeometryArena.unbound()
+        self.patcher.stop()
+    
+    def calls(self, name):
+        return [args for n, args in self.stubGL.log if n == name]
+    
+    def test_shared_vao(self):
+        print("TestGeometryArena:test_shared_vao START".center(100, '-'))
+        
+        first = self.arena.allocate(self.cube, self.layout, 32, self.index[:12])
+        second = self.arena.allocate(self.cube, self.layout, 32, self.index[:12])
+        self.assertEqual(len(self.arena.pools), 1)
+        self.assertEqual((second.vertexOffset, second.indexOffset), (8, 12))
+        self.stubGL.log.clear()
+        
+        first.draw(GL.GL_TRIANGLES)
+        second.draw(GL.GL_TRIANGLES)
+        # one VAO bind for both meshes, indices relative to each mesh's first vertex
+        self.assertEqual(len(self.calls('glBindVertexArray')), 1)
+        draw = self.calls('glDrawElementsBaseVertex')[1]
+        self.assertEqual((draw[1], draw[2], draw[3].value, draw[4]), (12, GL.GL_UNSIGNED_SHORT, 24, 8))
+        
+        # another vertex format gets its own pool
+        self.arena.allocate(self.cube[:, :4], [(0, 4, 0)], 16)
+        self.assertEqual(len(self.arena.pools), 2)
+        
+        print("TestGeometryArena:test_shared_vao END".center(100, '-'))
+    
+    def test_defragment_and_grow(self):
+        print("TestGeometryArena:test_defragment_and_grow START".center(100, '-'))
+        
+        first = self.arena.allocate(self.cube[:4], self.layout, 32)
+        second = self.arena.allocate(self.cube[:8], self.layout, 32)
+        third = self.arena.allocate(self.cube[:4], self.layout, 32)
+        self.arena.free(second)
+        pool = first.pool
+        self.assertEqual(pool.vertices.freeRanges, [(4, 8), (16, 4)])
+        
+        # 12 vertices are free in two ranges: the pool compacts instead of growing
+        self.stubGL.log.clear()
+        fourth = self.arena.allocate(np.zeros((10, 8), np.float32), self.layout, 32)
+        self.assertEqual((first.vertexOffset, third.vertexOffset, fourth.vertexOffset), (0, 4, 8))
+        copies = [args[2:] for args in self.calls('glCopyBufferSubData')]
+        self.assertEqual(copies, [(0, 0, 128), (12 * 32, 4 * 32, 128)])
+        self.assertEqual(pool.vertices.capacity, 20)
+        
+        # not enough free space in total: the buffers double
+        self.arena.allocate(self.cube, self.layout, 32)
+        self.assertEqual(pool.vertices.capacity, 40)
+        stats = self.arena.stats()
+        self.assertEqual((stats['pools'], stats['meshes']), (1, 4))
+        self.assertEqual(stats['usedBytes'], 26 * 32)
+        self.assertIn('4 meshes in 1 pools', self.arena.report())
+        
+        print("TestGeometryArena:test_defragment_and_grow END".center(100, '-'))
+    
+    def test_defragment_for_indices(self):
+        print("TestGeometryArena:test_defragment_for_indices START".center(100, '-'))
+        
+        arena = GeometryArena(vertexCapacity=16, indexCapacity=16)
+        index = np.arange(8, dtype=np.uint16)
+        first = arena.allocate(self.cube[:4], self.layout, 32, index[:4])
+        second = arena.allocate(self.cube[:8], self.layout, 32, index)
+        third = arena.allocate(self.cube[:4], self.layout, 32, index[:4])
+        arena.free(first)
+        arena.free(third)
+        pool = second.pool
+        
+        # the vertices fit, the indices only after compacting, which keeps the vertices reserved for the new mesh
+        fourth = arena.allocate(self.cube[:2], self.layout, 32, index)
+        self.assertEqual((second.vertexOffset, fourth.vertexOffset), (0, 8))
+        self.assertEqual((second.indexOffset, fourth.indexOffset), (0, 8))
+        self.assertEqual((pool.vertices.used, pool.indices.used), (10, 16))
+        self.assertEqual(pool.vertices.capacity, 16)
+        
+        print("TestGeometryArena:test_defragment_for_indices END".center(100, '-'))
+    
+    def test_allocate_many(self):
+        print("TestGeometryArena:test_allocate_many START".center(100, '-'))
+        
+        meshes = [(self.cube, self.layout, 32, self.index[:12], GL.GL_UNSIGNED_SHORT, None) for i in range(5)]
+        meshes.insert(2, (self.cube[:, :4], [(0, 4, 0)], 16, None, GL.GL_UNSIGNED_SHORT, None))
+        allocations = self.arena.allocateMany(meshes)
+        
+        # buffers sized for all 40 vertices at once, one upload of the vertices and one of the indices per pool
+        pool = allocations[0].pool
+        self.assertEqual((pool.vertices.capacity, pool.indices.capacity), (40, 60))
+        self.assertEqual(self.stubGL.calls['glBufferSubData'], 3)
+        self.assertEqual([a.vertexOffset for a in allocations], [0, 8, 0, 16, 24, 32])
+        self.assertEqual([a.indexOffset for a in allocations], [0, 12, 0, 24, 36, 48])
+        self.assertIsNot(allocations[2].pool, pool)
+        
+        # meshes allocated together are freed one by one
+        self.arena.free(allocations[1])
+        self.assertEqual(pool.vertices.freeRanges, [(8, 8)])
+        
+        # meshes without vertices are rejected before anything is allocated, also on a full pool
+        self.arena.allocate(np.zeros((pool.vertices.capacity - pool.vertices.used, 8), np.float32), self.layout, 32)
+        used = pool.vertices.used
+        with self.assertRaises(ValueError):
+            self.arena.allocate(self.cube[:0], self.layout, 32)
+        with self.assertRaises(ValueError):
+            self.arena.allocateMany([(self.cube, self.layout, 32, None, GL.GL_UNSIGNED_SHORT, None),
+                                     (self.cube[:0], self.layout, 32, None, GL.GL_UNSIGNED_SHORT, None)])
+        self.assertEqual(pool.vertices.used, used)
+        
+        print("TestGeometryArena:test_allocate_many END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
@@ -0,0 +1,145 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import gc
+import unittest
+from unittest import mock
+
+import OpenGL.GL as GL
+import numpy as np
+
+import pyECSS.utilities as util
+from pyECSS.Component import BasicTransform, RenderMesh
+
+from pyGLV.GL.Shader import Shader, ShaderGLDecorator
+from pyGLV.GL.VertexArray import VertexArray
+from pyGLV.GL.GeometryArena import GeometryArena
+from pyGLV.GL.IndirectRenderer import IndirectRenderGLShaderSystem
+from pyGLV.GL.ProgramCache import ProgramCache, ParallelShaderCompile
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class StubEntity:
+    """Parent of the components of one entity, found by type as with pyECSS Entity.getChildByType()
+    """
+    def __init__(self, *components):
+        self._components = components
+        for component in components:
+            component._parent = self
+    
+    def getChildByType(self, type):
+        return next((c for c in self._components if c.type == type), None)
+
+
+class TestIndirectRenderer(unittest.TestCase):
+    """Entities of INDIRECT shaders drawn in multi-draw indirect batches
+    """
+    def setUp(self):
+        print("TestIndirectRenderer:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('shininess', 1, GL.GL_FLOAT), ('model', 1, GL.GL_FLOAT_MAT4)])
+        self.patchers = [mock.patch(f'pyGLV.GL.{module}.gl', self.stubGL) for module in 
+                         ('Shader', 'UniformStore', 'ProgramCache', 'VertexArray', 'GeometryArena', 'DrawBlock', 'IndirectRenderer', 'DeletionQueue')]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        ParallelShaderCompile._available = False
+        IndirectRenderGLShaderSystem._available = True
+        self.arena = GeometryArena()
+        self.system = IndirectRenderGLShaderSystem()
+        
+        print("TestIndirectRenderer:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        del self.entities, self.system
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+        ParallelShaderCompile._available = None
+        IndirectRenderGLShaderSystem._available = None
+        GeometryArena.unbound()
+    
+    def entity(self, x, defines={'FRAME_BLOCK': True, 'INDIRECT': True}, arena=True, shininess=0.5):
+        vertexArray = VertexArray(attributes=[np.zeros((4, 4)), np.ones((4, 4))], index=[0, 1, 2, 0, 2, 3], 
+                                  arena=self.arena if arena else None)
+        vertexArray.init()
+        shader = ShaderGLDecorator(Shader(vertex_source=Shader.VERT_PHONG_UBER, fragment_source=Shader.FRAG_PHONG_UBER, defines=defines))
+        shader.init()
+        shader.setUniformVariable(key='shininess', value=shininess, float1=True)
+        transform = BasicTransform(name="trs")
+        transform.l2world = util.translate(x, 0.0, 0.0)
+        StubEntity(vertexArray, RenderMesh(name="mesh"), shader, transform)
+        return vertexArray
+    
+    def frame(self):
+        self.stubGL.log.clear()
+        for vertexArray in self.entities:
+            self.system.apply2VertexArray(vertexArray)
+        self.system.flush()
+        return [args for name, args in self.stubGL.log if name == 'glMultiDrawElementsIndirect']
+    
+    def test_batches(self):
+        print("TestIndirectRenderer:test_batches START".center(100, '-'))
+        
+        self.entities = [self.entity(x) for x in range(3)] + [self.entity(3, shininess=0.9)]
+        draws = self.frame()
+        
+        # the entity with another shininess value is a batch of its own, one program switch per batch
+        self.assertEqual([args[3] for args in draws], [3, 1])
+        self.assertEqual([name for name, args in self.stubGL.log].count('glUseProgram'), 3)
+        np.testing.assert_array_equal(self.system.commands['baseVertex'], [0, 4, 8, 12])
+        np.testing.assert_array_equal(self.system.commands['count'], [6, 6, 6, 6])
+        self.assertEqual(draws[1][2].value, IndirectRenderGLShaderSystem.COMMAND.itemsize * 3)
+        models = self.system.drawBlock.models
+        np.testing.assert_array_equal(models[:4, 0, 3], [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(self.stubGL.calls['glDrawElementsBaseVertex'], 0)
+        
+        # the next frame only uploads the model matrices
+        self.entities[0].parent.getChildByType(BasicTransform.getClassName()).l2world = util.translate(5.0, 0.0, 0.0)
+        draws = self.frame()
+        self.assertEqual(self.system.stats['builds'], 1)
+        uploaded = [args[3] for name, args in self.stubGL.log if name == 'glBufferSubData' and args[0] == GL.GL_SHADER_STORAGE_BUFFER]
+        self.assertEqual(uploaded[0][0, 0, 3], 5.0)
+        self.assertEqual(len(draws), 2)
+        
+        print("TestIndirectRenderer:test_batches END".center(100, '-'))
+    
+    def test_mixed_entities(self):
+        print("TestIndirectRenderer:test_mixed_entities START".center(100, '-'))
+        
+        # outside of an arena: drawn alone with its DrawBlock matrix; without INDIRECT: as by RenderGLShaderSystem
+        self.entities = [self.entity(0), self.entity(1, arena=False), self.entity(2, defines={'FRAME_BLOCK': True})]
+        draws = self.frame()
+        self.assertEqual(len(draws), 1)
+        self.assertEqual(self.stubGL.calls['glDrawElements'], 1)
+        self.assertEqual(self.stubGL.calls['glDrawElementsBaseVertex'], 1)
+        ranges = [args[3:] for name, args in self.stubGL.log if name == 'glBindBufferRange']
+        self.assertEqual(ranges, [(0, 64), (64, 64)])
+        
+        print("TestIndirectRenderer:test_mixed_entities END".center(100, '-'))
+    
+    def test_fallback(self):
+        print("TestIndirectRenderer:test_fallback START".center(100, '-'))
+        
+        IndirectRenderGLShaderSystem._available = False
+        self.entities = [self.entity(x) for x in range(3)]
+        draws = self.frame()
+        
+        # drawn one by one, with the model uniform set from the transform
+        self.assertEqual(draws, [])
+        self.assertEqual(self.stubGL.calls['glDrawElementsBaseVertex'], 3)
+        models = [args[3][0, 3] for name, args in self.stubGL.log if name == 'glUniformMatrix4fv']
+        self.assertEqual(models, [0.0, 1.0, 2.0])
+        
+        print("TestIndirectRenderer:test_fallback END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
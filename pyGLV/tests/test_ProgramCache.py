@@ -0,0 +1,149 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pyGLV.GL.ProgramCache import ProgramCache, ProgramBinaryCache
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestProgramCache(unittest.TestCase):
+    
+    def setUp(self):
+        print("TestProgramCache:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        
+        print("TestProgramCache:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        ProgramCache.clear()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_key(self):
+        print("TestProgramCache:test_key START".center(100, '-'))
+        
+        self.assertEqual(ProgramCache.key("vert", "frag"), ProgramCache.key("vert", "frag"))
+        self.assertNotEqual(ProgramCache.key("vert", "frag"), ProgramCache.key("frag", "vert"))
+        self.assertNotEqual(ProgramCache.key("ver", "tfrag"), ProgramCache.key("vert", "frag"))
+        
+        print("TestProgramCache:test_key END".center(100, '-'))
+    
+    def test_reference_count(self):
+        print("TestProgramCache:test_reference_count START".center(100, '-'))
+        
+        key = ProgramCache.key("vert", "frag")
+        self.assertIsNone(ProgramCache.acquire(key))
+        program = ProgramCache.register(key, 3)
+        self.assertIs(ProgramCache.acquire(key), program)
+        self.assertEqual(program.refCount, 2)
+        
+        ProgramCache.release(program)
+        self.assertEqual(self.stubGL.calls['glDeleteProgram'], 0)
+        ProgramCache.release(program)
+        self.assertEqual(self.stubGL.log[-1], ('glDeleteProgram', (3,)))
+        self.assertIsNone(ProgramCache.acquire(key))
+        
+        print("TestProgramCache:test_reference_count END".center(100, '-'))
+
+
+class TestProgramBinaryCache(unittest.TestCase):
+    
+    def setUp(self):
+        print("TestProgramBinaryCache:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.directory = tempfile.TemporaryDirectory()
+        ProgramBinaryCache.stats = {'hits': 0, 'misses': 0, 'rejected': 0, 'loadTime': 0.0, 'linkTime': 0.0}
+        ProgramBinaryCache.enable(self.directory.name, "OpenGL 4.1 GLSL 4.10 Renderer Stub")
+        self.key = ProgramCache.key("vert", "frag")
+        
+        print("TestProgramBinaryCache:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        ProgramBinaryCache.disable()
+        self.directory.cleanup()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_miss_store_hit(self):
+        print("TestProgramBinaryCache:test_miss_store_hit START".center(100, '-'))
+        
+        self.assertIsNone(ProgramBinaryCache.load(self.key))
+        ProgramBinaryCache.store(self.key, 7, 0.25)
+        glid = ProgramBinaryCache.load(self.key)
+        
+        self.assertEqual(glid, 7)
+        name, args = [call for call in self.stubGL.log if call[0] == 'glProgramBinary'][0]
+        self.assertEqual(args[1], self.stubGL.programBinaryFormat)
+        self.assertEqual(args[2].tobytes(), self.stubGL.programBinary)
+        self.assertEqual(ProgramBinaryCache.stats['hits'], 1)
+        self.assertEqual(ProgramBinaryCache.stats['misses'], 1)
+        self.assertEqual(ProgramBinaryCache.stats['linkTime'], 0.25)
+        self.assertIn("1 hits, 1 misses", ProgramBinaryCache.report())
+        
+        print("TestProgramBinaryCache:test_miss_store_hit END".center(100, '-'))
+    
+    def test_context_label_in_key(self):
+        print("TestProgramBinaryCache:test_context_label_in_key START".center(100, '-'))
+        
+        ProgramBinaryCache.store(self.key, 7)
+        ProgramBinaryCache.enable(self.directory.name, "OpenGL 4.6 GLSL 4.60 Renderer Other")
+        
+        self.assertIsNone(ProgramBinaryCache.load(self.key))
+        
+        print("TestProgramBinaryCache:test_context_label_in_key END".center(100, '-'))
+    
+    def test_rejected_binary_falls_back(self):
+        print("TestProgramBinaryCache:test_rejected_binary_falls_back START".center(100, '-'))
+        
+        ProgramBinaryCache.store(self.key, 7)
+        self.stubGL.linkStatus = 0 # driver refuses the binary
+        
+        self.assertIsNone(ProgramBinaryCache.load(self.key))
+        self.assertEqual(ProgramBinaryCache.stats['rejected'], 1)
+        self.assertFalse(os.path.exists(ProgramBinaryCache.path(self.key)))
+        self.assertEqual(self.stubGL.calls['glDeleteProgram'], 1)
+        
+        print("TestProgramBinaryCache:test_rejected_binary_falls_back END".center(100, '-'))
+    
+    def test_truncated_binary_falls_back(self):
+        print("TestProgramBinaryCache:test_truncated_binary_falls_back START".center(100, '-'))
+        
+        path = ProgramBinaryCache.path(self.key)
+        for size in (0, 3, 8, -1):
+            ProgramBinaryCache.store(self.key, 7)
+            with open(path, 'rb') as f:
+                data = f.read()
+            with open(path, 'wb') as f:
+                f.write(data[:size])
+            self.assertIsNone(ProgramBinaryCache.load(self.key))
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(ProgramBinaryCache.stats['rejected'], 4)
+        self.assertEqual(self.stubGL.calls['glProgramBinary'], 0)
+        
+        print("TestProgramBinaryCache:test_truncated_binary_falls_back END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
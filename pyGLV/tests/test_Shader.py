@@ -8,7 +8,15 @@ pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
 
 """
 
+import gc
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+import OpenGL.GL as GL
+import numpy as np
+from PIL import Image
 
 import pyECSS.utilities as util
 from pyECSS.Entity import Entity
@@ -17,7 +25,13 @@ from pyECSS.System import System, TransformSystem, CameraSystem, RenderSystem
 from pyGLV.GL.Scene import Scene
 from pyECSS.ECSSManager import ECSSManager
 
-from pyGLV.GL.Shader import Shader
+from pyGLV.GL.Shader import Shader, ShaderGLDecorator, InitGLShaderSystem
+from pyGLV.GL.FrameBlock import FrameBlock
+from pyGLV.GL.ProgramCache import ProgramCache, ParallelShaderCompile
+from pyGLV.GL.Textures import TextureArray, TextureUnits, get_single_texture_faces
+from pyGLV.GL.TextureCache import TextureCache
+from pyGLV.tests.CountingGL import CountingGL
+
 
 @unittest.skip("Requires active GL context, skipping the test")
 class TestShader(unittest.TestCase):
@@ -48,5 +62,527 @@ class TestShader(unittest.TestCase):
         print("TestShader:test_update END".center(100, '-'))
         
 
+class TestShaderUniformLocations(unittest.TestCase):
+    """Uniform locations are looked up once per program, not once per draw
+    """
+    def setUp(self):
+        print("TestShaderUniformLocations:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('modelViewProj', 1, GL.GL_FLOAT_MAT4),
+                                           ('model', 1, GL.GL_FLOAT_MAT4),
+                                           ('lightPos', 1, GL.GL_FLOAT_VEC3),
+                                           ('shininess', 1, GL.GL_FLOAT)])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        self.shaderDec = ShaderGLDecorator(Shader(vertex_source=Shader.VERT_PHONG_MVP, fragment_source=Shader.FRAG_PHONG))
+        self.shaderDec.init()
+        
+        print("TestShaderUniformLocations:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        del self.shaderDec
+        gc.collect() # Shader references itself as parent, release the program while the stub GL is in place
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_location_table(self):
+        print("TestShaderUniformLocations:test_location_table START".center(100, '-'))
+        
+        self.assertEqual(self.shaderDec.component.uniformLocations, 
+                         {'modelViewProj': 0, 'model': 1, 'lightPos': 2, 'shininess': 3})
+        self.assertEqual(self.stubGL.calls['glGetUniformLocation'], 4)
+        
+        print("TestShaderUniformLocations:test_location_table END".center(100, '-'))
+    
+    def test_enableShader_uses_cached_locations(self):
+        print("TestShaderUniformLocations:test_enableShader_uses_cached_locations START".center(100, '-'))
+        
+        self.shaderDec.setUniformVariable(key='modelViewProj', value=util.identity(), mat4=True)
+        self.shaderDec.setUniformVariable(key='model', value=util.identity(), mat4=True)
+        self.shaderDec.setUniformVariable(key='lightPos', value=util.vec(1.0, 2.0, 3.0), float3=True)
+        self.shaderDec.setUniformVariable(key='shininess', value=0.4, float1=True)
+        # not active in the program: ignored, as glUniform*() does for location -1
+        self.shaderDec.setUniformVariable(key='unused', value=0.4, float1=True)
+        
+        callsAfterInit = self.stubGL.calls['glGetUniformLocation']
+        for frame in range(100):
+            self.shaderDec.enableShader()
+            self.shaderDec.disableShader()
+        
+        self.assertEqual(self.stubGL.calls['glGetUniformLocation'], callsAfterInit)
+        self.assertEqual(self.stubGL.calls['glUseProgram'], 200)
+        # names that are not active are looked up once, then cached as -1
+        self.assertEqual(self.shaderDec.component.getUniformLocation('unused'), -1)
+        self.assertEqual(self.shaderDec.component.getUniformLocation('unused'), -1)
+        self.assertEqual(self.stubGL.calls['glGetUniformLocation'], callsAfterInit + 1)
+        
+        print("TestShaderUniformLocations:test_enableShader_uses_cached_locations END".center(100, '-'))
+        
+
+class TestShaderDirtyUniforms(unittest.TestCase):
+    """Only uniforms whose value changed since the last draw are uploaded
+    """
+    def setUp(self):
+        print("TestShaderDirtyUniforms:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('modelViewProj', 1, GL.GL_FLOAT_MAT4),
+                                           ('lightPos', 1, GL.GL_FLOAT_VEC3),
+                                           ('shininess', 1, GL.GL_FLOAT)])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        self.shaderDec = ShaderGLDecorator(Shader(vertex_source=Shader.VERT_PHONG_MVP, fragment_source=Shader.FRAG_PHONG))
+        self.shaderDec.init()
+        
+        print("TestShaderDirtyUniforms:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        del self.shaderDec
+        gc.collect() # Shader references itself as parent, release the program while the stub GL is in place
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_static_uniforms_uploaded_once(self):
+        print("TestShaderDirtyUniforms:test_static_uniforms_uploaded_once START".center(100, '-'))
+        
+        lightPos = util.vec(2.0, 5.5, 2.0)
+        for frame in range(10):
+            mvp = util.translate(frame, 0.0, 0.0)
+            self.shaderDec.setUniformVariable(key='modelViewProj', value=mvp, mat4=True)
+            self.shaderDec.setUniformVariable(key='lightPos', value=lightPos, float3=True)
+            self.shaderDec.setUniformVariable(key='shininess', value=0.4, float1=True)
+            self.shaderDec.enableShader()
+            self.shaderDec.disableShader()
+        
+        self.assertEqual(self.stubGL.calls['glUniformMatrix4fv'], 10)
+        self.assertEqual(self.stubGL.calls['glUniform3fv'], 1)
+        self.assertEqual(self.stubGL.calls['glUniform1fv'], 1)
+        
+        print("TestShaderDirtyUniforms:test_static_uniforms_uploaded_once END".center(100, '-'))
+    
+    def test_in_place_change_is_uploaded(self):
+        print("TestShaderDirtyUniforms:test_in_place_change_is_uploaded START".center(100, '-'))
+        
+        lightPos = util.vec(2.0, 5.5, 2.0)
+        self.shaderDec.setUniformVariable(key='lightPos', value=lightPos, float3=True)
+        self.shaderDec.enableShader()
+        lightPos[1] = 1.0
+        self.shaderDec.setUniformVariable(key='lightPos', value=lightPos, float3=True)
+        self.shaderDec.enableShader()
+        self.shaderDec.enableShader()
+        
+        self.assertEqual(self.stubGL.calls['glUniform3fv'], 2)
+        
+        print("TestShaderDirtyUniforms:test_in_place_change_is_uploaded END".center(100, '-'))
+        
+    
+    def test_compatibility_dicts(self):
+        print("TestShaderDirtyUniforms:test_compatibility_dicts START".center(100, '-'))
+        
+        shader = self.shaderDec.component
+        self.shaderDec.setUniformVariable(key='modelViewProj', value=util.translate(1.0, 2.0, 3.0), mat4=True)
+        shader.float1fDict['shininess'] = 0.25
+        
+        self.assertEqual(list(shader.mat4fDict), ['modelViewProj'])
+        self.assertEqual(shader.mat4fDict['modelViewProj'][0, 3], 1.0)
+        self.assertEqual(shader.float1fDict['shininess'][0], 0.25)
+        self.assertNotIn('lightPos', shader.float3fDict)
+        # values live in the float32 store, not as loose Python objects
+        self.assertEqual(shader.mat4fDict['modelViewProj'].dtype, np.float32)
+        self.assertIs(shader.mat4fDict['modelViewProj'].base, shader.uniforms.floatData)
+        
+        print("TestShaderDirtyUniforms:test_compatibility_dicts END".center(100, '-'))
+        
+
+class TestShaderFrameBlock(unittest.TestCase):
+    """FRAMEBLOCK shaders are attached to the shared per-frame uniform buffer at link time
+    """
+    def setUp(self):
+        print("TestShaderFrameBlock:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('model', 1, GL.GL_FLOAT_MAT4)], blocks=['FrameBlock'])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        
+        print("TestShaderFrameBlock:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_block_binding(self):
+        print("TestShaderFrameBlock:test_block_binding START".center(100, '-'))
+        
+        shader = Shader(vertex_source=Shader.VERT_PHONG_FRAMEBLOCK, fragment_source=Shader.FRAG_PHONG_FRAMEBLOCK)
+        shader.init()
+        
+        self.assertIn('layout (std140, row_major) uniform FrameBlock', shader.vertex_source)
+        self.assertTrue(shader.vertex_source.strip().startswith('#version 410'))
+        self.assertIn(('glUniformBlockBinding', (shader.glid, 0, FrameBlock.BINDING)), self.stubGL.log)
+        del shader
+        
+        print("TestShaderFrameBlock:test_block_binding END".center(100, '-'))
+        
+
+class TestShaderProgramCache(unittest.TestCase):
+    """Shaders with identical sources share one reference counted GL program
+    """
+    def setUp(self):
+        print("TestShaderProgramCache:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('modelViewProj', 1, GL.GL_FLOAT_MAT4)])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL),
+                         mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        
+        print("TestShaderProgramCache:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_identical_sources_link_once(self):
+        print("TestShaderProgramCache:test_identical_sources_link_once START".center(100, '-'))
+        
+        shaders = [ShaderGLDecorator(Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)) for i in range(100)]
+        for shaderDec in shaders:
+            shaderDec.init()
+        del shaderDec
+        other = Shader(vertex_source=Shader.VERT_PHONG_MVP, fragment_source=Shader.FRAG_PHONG)
+        other.init()
+        
+        self.assertEqual(self.stubGL.calls['glCreateProgram'], 2)
+        self.assertEqual(self.stubGL.calls['glCompileShader'], 4)
+        self.assertEqual(self.stubGL.calls['glGetActiveUniform'], 2)
+        self.assertEqual(len(ProgramCache.programs()), 2)
+        self.assertEqual(shaders[0].component.program.refCount, 100)
+        self.assertIs(shaders[0].component.program, shaders[99].component.program)
+        
+        # only the last reference deletes the GL program
+        del shaders[1:]
+        gc.collect()
+        self.assertEqual(self.stubGL.calls['glDeleteProgram'], 0)
+        del shaders
+        gc.collect()
+        self.assertEqual(self.stubGL.calls['glDeleteProgram'], 1)
+        del other
+        gc.collect()
+        self.assertEqual(self.stubGL.calls['glDeleteProgram'], 2)
+        self.assertEqual(ProgramCache.programs(), {})
+        
+        print("TestShaderProgramCache:test_identical_sources_link_once END".center(100, '-'))
+    
+    def test_shared_program_keeps_per_shader_values(self):
+        print("TestShaderProgramCache:test_shared_program_keeps_per_shader_values START".center(100, '-'))
+        
+        shaderA = ShaderGLDecorator(Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG))
+        shaderB = ShaderGLDecorator(Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG))
+        shaderA.init()
+        shaderB.init()
+        shaderA.setUniformVariable(key='modelViewProj', value=util.translate(1.0, 0.0, 0.0), mat4=True)
+        shaderB.setUniformVariable(key='modelViewProj', value=util.translate(2.0, 0.0, 0.0), mat4=True)
+        
+        for frame in range(3):
+            shaderA.enableShader()
+            shaderB.enableShader()
+        uploads = [args[3][0, 3] for name, args in self.stubGL.log if name == 'glUniformMatrix4fv']
+        
+        # every switch of Shader on the shared program restores that Shader's values
+        self.assertEqual(uploads, [1.0, 2.0] * 3)
+        del shaderA, shaderB
+        
+        print("TestShaderProgramCache:test_shared_program_keeps_per_shader_values END".center(100, '-'))
+    
+    def test_shared_program_uploads_differences(self):
+        print("TestShaderProgramCache:test_shared_program_uploads_differences START".center(100, '-'))
+        
+        self.stubGL.uniforms = [('modelViewProj', 1, GL.GL_FLOAT_MAT4), ('color', 1, GL.GL_FLOAT_VEC4), ('shininess', 1, GL.GL_FLOAT)]
+        shaders = [ShaderGLDecorator(Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)) for i in range(10)]
+        for i, shaderDec in enumerate(shaders):
+            shaderDec.init()
+            shaderDec.setUniformVariable(key='modelViewProj', value=util.translate(float(i), 0.0, 0.0), mat4=True)
+            shaderDec.setUniformVariable(key='color', value=np.array([1.0, 0.5, 0.0, 1.0]), float4=True)
+            shaderDec.setUniformVariable(key='shininess', value=32.0 if i < 5 else 64.0, float1=True)
+        
+        for frame in range(3):
+            for shaderDec in shaders:
+                shaderDec.enableShader()
+        # a switch of Shader only sends the uniforms whose values differ from those in the shared program:
+        # every model matrix, the common color once, the shininess when it changes between the two halves
+        self.assertEqual(self.stubGL.calls['glUniformMatrix4fv'], 30)
+        self.assertEqual(self.stubGL.calls['glUniform4fv'], 1)
+        self.assertEqual(self.stubGL.calls['glUniform1fv'], 2 * 3)
+        
+        # a changed value of the Shader that owns the program is still uploaded as it changes
+        shaders[-1].setUniformVariable(key='color', value=np.array([0.0, 0.0, 1.0, 1.0]), float4=True)
+        shaders[-1].enableShader()
+        shaders[0].enableShader()
+        self.assertEqual(self.stubGL.calls['glUniform4fv'], 3)
+        del shaders, shaderDec
+        
+        print("TestShaderProgramCache:test_shared_program_uploads_differences END".center(100, '-'))
+    
+    def test_variants_compile_once(self):
+        print("TestShaderProgramCache:test_variants_compile_once START".center(100, '-'))
+        
+        variants = [{}, {'TEXTURED': True}, {'TEXTURED': True, 'FRAME_BLOCK': True}, {'FRAME_BLOCK': True, 'TEXTURED': True},
+                    {'MATERIAL_COLOR': True}, {}]
+        shaders = [Shader(vertex_source=Shader.VERT_PHONG_UBER, fragment_source=Shader.FRAG_PHONG_UBER, defines=defines)
+                   for defines in variants]
+        for shader in shaders:
+            shader.init()
+        del shader
+        
+        # one program per distinct variant, whatever the order of the defines
+        self.assertEqual(self.stubGL.calls['glCreateProgram'], 4)
+        self.assertIs(shaders[0].program, shaders[5].program)
+        self.assertIs(shaders[2].program, shaders[3].program)
+        sources = [args[1] for name, args in self.stubGL.log if name == 'glShaderSource']
+        self.assertIn('#define TEXTURED', sources[2])
+        self.assertIn('vec3 phongLight(', sources[1])
+        
+        print("TestShaderProgramCache:test_variants_compile_once END".center(100, '-'))
+        
+
+class TestShaderParallelInit(unittest.TestCase):
+    """InitGLShaderSystem submits all compiles and links first and checks their status in a second pass
+    """
+    def setUp(self):
+        print("TestShaderParallelInit:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('modelViewProj', 1, GL.GL_FLOAT_MAT4)])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL),
+                         mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        ParallelShaderCompile._available = True
+        self.initUpdate = InitGLShaderSystem()
+        self.sources = [(Shader.COLOR_VERT_MVP, Shader.COLOR_FRAG), (Shader.VERT_PHONG_MVP, Shader.FRAG_PHONG),
+                        (Shader.SIMPLE_TEXTURE_VERT, Shader.SIMPLE_TEXTURE_FRAG)]
+        
+        print("TestShaderParallelInit:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        ParallelShaderCompile._available = None
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def linkStatusQueries(self):
+        return [args[0] for name, args in self.stubGL.log if name == 'glGetProgramiv' and args[1] == GL.GL_LINK_STATUS]
+    
+    def test_status_checked_after_traversal(self):
+        print("TestShaderParallelInit:test_status_checked_after_traversal START".center(100, '-'))
+        
+        shaders = [ShaderGLDecorator(Shader(vertex_source=v, fragment_source=f)) for v, f in self.sources]
+        for shaderDec in shaders:
+            self.initUpdate.apply2ShaderGLDecorator(shaderDec)
+        del shaderDec
+        
+        # the traversal only submits work to the driver
+        self.assertEqual(self.stubGL.calls['glCompileShader'], 6)
+        self.assertEqual(self.stubGL.calls['glLinkProgram'], 3)
+        self.assertEqual(self.stubGL.calls['glGetShaderiv'], 0)
+        self.assertEqual(self.linkStatusQueries(), [])
+        self.assertIsNone(shaders[0].get_glid())
+        
+        self.initUpdate.finishInit()
+        self.assertEqual(self.stubGL.calls['glGetShaderiv'], 6)
+        self.assertEqual(self.linkStatusQueries(), [7, 8, 9])
+        self.assertEqual([s.get_glid() for s in shaders], [7, 8, 9])
+        self.assertEqual(shaders[0].component.uniformLocations['modelViewProj'], 0)
+        
+        print("TestShaderParallelInit:test_status_checked_after_traversal END".center(100, '-'))
+    
+    def test_completed_programs_finish_first(self):
+        print("TestShaderParallelInit:test_completed_programs_finish_first START".center(100, '-'))
+        
+        shaders = [Shader(vertex_source=v, fragment_source=f) for v, f in self.sources]
+        for shader in shaders:
+            self.initUpdate.apply2Shader(shader)
+        del shader
+        self.stubGL.completed = {8}
+        
+        self.initUpdate.finishInit()
+        # the program the driver already completed first, then the others in traversal order
+        self.assertEqual(self.linkStatusQueries(), [8, 7, 9])
+        self.assertEqual([s.glid for s in shaders], [7, 8, 9])
+        
+        print("TestShaderParallelInit:test_completed_programs_finish_first END".center(100, '-'))
+    
+    def test_pending_program_is_shared(self):
+        print("TestShaderParallelInit:test_pending_program_is_shared START".center(100, '-'))
+        
+        shaderA = Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)
+        shaderB = Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)
+        self.initUpdate.apply2Shader(shaderA)
+        self.initUpdate.apply2Shader(shaderB)
+        self.assertIs(shaderA.program, shaderB.program)
+        
+        # without a second pass, Shaders finish on first use
+        shaderB.enableShader()
+        shaderA.enableShader()
+        self.assertEqual(self.stubGL.calls['glLinkProgram'], 1)
+        self.assertEqual(self.linkStatusQueries(), [7])
+        self.assertEqual((shaderA.glid, shaderB.glid), (7, 7))
+        del shaderA, shaderB
+        
+        print("TestShaderParallelInit:test_pending_program_is_shared END".center(100, '-'))
+    
+    def test_link_failure(self):
+        print("TestShaderParallelInit:test_link_failure START".center(100, '-'))
+        
+        self.stubGL.linkStatus = 0
+        shader = Shader(vertex_source=Shader.COLOR_VERT_MVP, fragment_source=Shader.COLOR_FRAG)
+        self.initUpdate.apply2Shader(shader)
+        self.initUpdate.finishInit()
+        
+        self.assertIsNone(shader.glid)
+        self.assertEqual(self.stubGL.calls['glDeleteProgram'], 1)
+        self.assertEqual(ProgramCache.programs(), {})
+        del shader
+        
+        print("TestShaderParallelInit:test_link_failure END".center(100, '-'))
+        
+
+class TestShaderTextureUnits(unittest.TestCase):
+    """Every sampler of a program gets its own texture unit, textures are only rebound when a unit changes
+    """
+    def setUp(self):
+        print("TestShaderTextureUnits:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('model', 1, GL.GL_FLOAT_MAT4), ('ImageTexture', 1, GL.GL_SAMPLER_2D),
+                                           ('normalMap', 1, GL.GL_SAMPLER_2D), ('skybox', 1, GL.GL_SAMPLER_CUBE)])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL),
+                         mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL), mock.patch('pyGLV.GL.Textures.gl', self.stubGL),
+                         mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        TextureUnits.reset()
+        TextureCache.reset()
+        ParallelShaderCompile._available = False
+        
+        self.imageFile = os.path.join(tempfile.mkdtemp(), 'texture.png')
+        Image.new('RGB', (4, 4), (255, 0, 0)).save(self.imageFile)
+        
+        print("TestShaderTextureUnits:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        TextureUnits.reset()
+        TextureCache.reset()
+        ParallelShaderCompile._available = None
+        os.remove(self.imageFile)
+        os.rmdir(os.path.dirname(self.imageFile))
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_single_pass_multi_texture(self):
+        print("TestShaderTextureUnits:test_single_pass_multi_texture START".center(100, '-'))
+        
+        shader = ShaderGLDecorator(Shader(vertex_source=Shader.SIMPLE_TEXTURE_PHONG_VERT, fragment_source=Shader.SIMPLE_TEXTURE_PHONG_FRAG))
+        shader.init()
+        shader.setUniformVariable(key='ImageTexture', value=self.imageFile, texture=True)
+        shader.setUniformVariable(key='normalMap', value=self.imageFile, texture=True)
+        shader.setUniformVariable(key='skybox', value=get_single_texture_faces(self.imageFile), texture3D=True)
+        self.assertEqual(shader.component.program.samplerUnits, {'ImageTexture': 0, 'normalMap': 1, 'skybox': 2})
+        
+        self.stubGL.log.clear()
+        shader.enableShader()
+        samplers = {args[0]: int(args[2][0]) for name, args in self.stubGL.log if name == 'glUniform1iv'}
+        self.assertEqual(samplers, {1: 0, 2: 1, 3: 2})
+        # unit 0 is still active from creating the textures
+        units = [args[0] - GL.GL_TEXTURE0 for name, args in self.stubGL.log if name == 'glActiveTexture']
+        self.assertEqual(units, [1, 2])
+        # both samplers share the Texture of the image file, created with one bind
+        self.assertEqual(self.stubGL.calls['glBindTexture'], 2 + 3)
+        self.assertEqual(TextureUnits.bound(2)[0], GL.GL_TEXTURE_CUBE_MAP)
+        
+        # nothing changed: no unit is rebound on the next draws
+        self.stubGL.log.clear()
+        shader.enableShader()
+        shader.enableShader()
+        self.assertEqual([name for name, args in self.stubGL.log if 'Texture' in name or 'Uniform' in name], [])
+        
+        print("TestShaderTextureUnits:test_single_pass_multi_texture END".center(100, '-'))
+    
+    def test_repeated_texture_assignment(self):
+        print("TestShaderTextureUnits:test_repeated_texture_assignment START".center(100, '-'))
+        
+        shader = ShaderGLDecorator(Shader(vertex_source=Shader.SIMPLE_TEXTURE_PHONG_VERT, fragment_source=Shader.SIMPLE_TEXTURE_PHONG_FRAG))
+        shader.init()
+        # as the examples do in their render loop
+        for frame in range(100):
+            shader.setUniformVariable(key='ImageTexture', value=self.imageFile, texture=True)
+        texture = shader.component.textureDict['ImageTexture']
+        self.assertEqual((self.stubGL.calls['glGenTextures'], self.stubGL.calls['glTexImage2D']), (1, 1))
+        self.assertEqual(TextureCache.references(texture), 1)
+        
+        # the replaced Texture is released and stays resident for the next assignment
+        otherFile = os.path.join(os.path.dirname(self.imageFile), 'other.png')
+        Image.new('RGB', (2, 2), (0, 255, 0)).save(otherFile)
+        shader.setUniformVariable(key='ImageTexture', value=otherFile, texture=True)
+        self.assertEqual(TextureCache.references(texture), 0)
+        self.assertEqual(TextureCache.count(), 2)
+        shader.setUniformVariable(key='ImageTexture', value=self.imageFile, texture=True)
+        self.assertIs(shader.component.textureDict['ImageTexture'], texture)
+        self.assertEqual(self.stubGL.calls['glTexImage2D'], 2)
+        os.remove(otherFile)
+        
+        # a Texture object is bound as it is, and not released for the Shader
+        other = TextureCache.acquire(self.imageFile)
+        shader.setUniformVariable(key='normalMap', value=other, texture=True)
+        self.assertEqual(TextureCache.references(texture), 2)
+        # a destroyed Shader releases what it acquired, the cache can evict it again
+        del shader
+        gc.collect()
+        self.assertEqual(TextureCache.references(texture), 1)
+        TextureCache.release(other)
+        self.assertEqual(TextureCache.references(texture), 0)
+        
+        # cube maps are not cached, the replaced one is deleted
+        shader = ShaderGLDecorator(Shader(vertex_source=Shader.SIMPLE_TEXTURE_PHONG_VERT, fragment_source=Shader.SIMPLE_TEXTURE_PHONG_FRAG))
+        for frame in range(3):
+            shader.setUniformVariable(key='skybox', value=get_single_texture_faces(self.imageFile), texture3D=True)
+        self.assertEqual(self.stubGL.calls['glDeleteTextures'], 2)
+        
+        print("TestShaderTextureUnits:test_repeated_texture_assignment END".center(100, '-'))
+    
+    def test_texture_array_materials(self):
+        print("TestShaderTextureUnits:test_texture_array_materials START".center(100, '-'))
+        
+        self.stubGL.uniforms = [('model', 1, GL.GL_FLOAT_MAT4), ('ImageTextures', 1, GL.GL_SAMPLER_2D_ARRAY)]
+        textureArray = TextureArray([self.imageFile, self.imageFile])
+        # two materials, their meshes select the layer in the third texture coordinate
+        shaders = []
+        for material in range(2):
+            shader = ShaderGLDecorator(Shader(vertex_source=Shader.SIMPLE_TEXTURE_ARRAY_VERT, fragment_source=Shader.SIMPLE_TEXTURE_ARRAY_FRAG))
+            shader.init()
+            shader.setUniformVariable(key='ImageTextures', value=textureArray, texture=True)
+            shaders.append(shader)
+        self.assertIs(shaders[1].component.textureDict['ImageTextures'], textureArray)
+        
+        self.stubGL.log.clear()
+        for frame in range(3):
+            for shader in shaders:
+                shader.enableShader()
+        # the array is still bound to unit 0 from its upload: no material switch rebinds it
+        self.assertEqual([name for name, args in self.stubGL.log if 'Texture' in name], [])
+        self.assertEqual(TextureUnits.bound(0), (GL.GL_TEXTURE_2D_ARRAY, textureArray.glid))
+        
+        print("TestShaderTextureUnits:test_texture_array_materials END".center(100, '-'))
+
+
 if __name__ == "__main__":
     unittest.main(argv=[''], verbosity=3, exit=False)
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyGLV.GL.ShaderPreprocessor import ShaderPreprocessor
+
+
+class TestShaderPreprocessor(unittest.TestCase):
+    
+    def setUp(self):
+        print("TestShaderPreprocessor:setUp START".center(100, '-'))
+        
+        self.directory = tempfile.mkdtemp()
+        self.write('common.glsl', '#include "constants.glsl"\nfloat twice(float x) { return 2.0 * x; }\n')
+        self.write('constants.glsl', 'const float PI = 3.14159;\n')
+        self.write('main.frag', '#version 410\n#include "common.glsl"\n#include "constants.glsl"\nvoid main() {}\n')
+        ShaderPreprocessor.clear()
+        
+        print("TestShaderPreprocessor:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        ShaderPreprocessor.clear()
+        shutil.rmtree(self.directory)
+    
+    def write(self, name, text, mtime=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+    
+    def test_include(self):
+        print("TestShaderPreprocessor:test_include START".center(100, '-'))
+        
+        expanded = ShaderPreprocessor.expand(os.path.join(self.directory, 'main.frag'))
+        # nested includes are resolved next to the including file, each file only once
+        self.assertEqual(expanded.splitlines(), ['#version 410', 'const float PI = 3.14159;',
+                                                 'float twice(float x) { return 2.0 * x; }', 'void main() {}'])
+        with self.assertRaises(FileNotFoundError):
+            ShaderPreprocessor.expand('#version 410\n#include "missing.glsl"\n')
+        
+        print("TestShaderPreprocessor:test_include END".center(100, '-'))
+    
+    def test_library_include(self):
+        print("TestShaderPreprocessor:test_library_include START".center(100, '-'))
+        
+        expanded = ShaderPreprocessor.expand('#version 410\n#include "lighting.glsl"\n')
+        self.assertIn('vec3 phongLight(', expanded)
+        
+        print("TestShaderPreprocessor:test_library_include END".center(100, '-'))
+    
+    def test_defines(self):
+        print("TestShaderPreprocessor:test_defines START".center(100, '-'))
+        
+        source = '\n    #version 410\nvoid main() {}'
+        expanded = ShaderPreprocessor.expand(source, {'TEXTURED': True, 'LIGHTS': 4, 'UNUSED': False})
+        # defines follow #version, sorted so that equal dicts give identical sources
+        self.assertEqual(expanded.splitlines(), ['', '    #version 410', '#define LIGHTS 4', '#define TEXTURED', 'void main() {}'])
+        self.assertEqual(expanded, ShaderPreprocessor.expand(source, {'LIGHTS': 4, 'TEXTURED': True, 'UNUSED': False}))
+        self.assertEqual(ShaderPreprocessor.expand(source), '\n'.join(source.splitlines()))
+        
+        print("TestShaderPreprocessor:test_defines END".center(100, '-'))
+    
+    def test_memoized_until_modified(self):
+        print("TestShaderPreprocessor:test_memoized_until_modified START".center(100, '-'))
+        
+        path = os.path.join(self.directory, 'main.frag')
+        self.write('constants.glsl', 'const float PI = 3.14159;\n', mtime=1000)
+        first = ShaderPreprocessor.expand(path)
+        misses = ShaderPreprocessor.stats['misses']
+        self.assertIs(ShaderPreprocessor.expand(path), first)
+        self.assertEqual(ShaderPreprocessor.stats['misses'], misses)
+        
+        # touching an included file invalidates the expansion
+        self.write('constants.glsl', 'const float PI = 3.0;\n', mtime=2000)
+        self.assertIn('const float PI = 3.0;', ShaderPreprocessor.expand(path))
+        self.assertEqual(ShaderPreprocessor.stats['misses'], misses + 1)
+        
+        print("TestShaderPreprocessor:test_memoized_until_modified END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
@@ -0,0 +1,120 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import OpenGL.GL as GL
+
+from pyGLV.GL.Shader import Shader, ShaderGLDecorator
+from pyGLV.GL.ShaderWatcher import ShaderWatcher
+from pyGLV.GL.ShaderPreprocessor import ShaderPreprocessor
+from pyGLV.GL.ProgramCache import ProgramCache, ParallelShaderCompile
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestShaderWatcher(unittest.TestCase):
+    
+    def setUp(self):
+        print("TestShaderWatcher:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('model', 1, GL.GL_FLOAT_MAT4)])
+        self.patchers = [mock.patch('pyGLV.GL.Shader.gl', self.stubGL), mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL),
+                         mock.patch('pyGLV.GL.ProgramCache.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        ProgramCache.clear()
+        ShaderPreprocessor.clear()
+        ParallelShaderCompile._available = False
+        
+        self.directory = tempfile.mkdtemp()
+        self.vert = self.write('color.vert', '#version 410\nuniform mat4 model;\nvoid main() {}\n', mtime=1000)
+        self.frag = self.write('color.frag', '#version 410\n#include "common.glsl"\nvoid main() {}\n', mtime=1000)
+        self.write('common.glsl', 'const float PI = 3.14159;\n', mtime=1000)
+        self.shader = ShaderGLDecorator(Shader(vertex_source=self.vert, fragment_source=self.frag))
+        self.shader.init()
+        self.watcher = ShaderWatcher(interval=3)
+        self.watcher.apply2ShaderGLDecorator(self.shader)
+        
+        print("TestShaderWatcher:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        del self.shader
+        gc.collect()
+        ParallelShaderCompile._available = None
+        ShaderPreprocessor.clear()
+        shutil.rmtree(self.directory)
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def write(self, name, text, mtime=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+    
+    def test_unchanged_files_cost_nothing(self):
+        print("TestShaderWatcher:test_unchanged_files_cost_nothing START".center(100, '-'))
+        
+        self.assertEqual(len(self.watcher.watched), 1)
+        self.assertEqual(len(self.shader.component.sourceFiles()), 3)
+        calls = sum(self.stubGL.calls.values())
+        with mock.patch('pyGLV.GL.ShaderWatcher.os.stat', wraps=os.stat) as stat:
+            for frame in range(9):
+                self.watcher.update()
+            # files are only looked at every `interval` frames, and no GL call is made
+            self.assertEqual(stat.call_count, 3 * 3)
+        self.assertEqual(sum(self.stubGL.calls.values()), calls)
+        
+        print("TestShaderWatcher:test_unchanged_files_cost_nothing END".center(100, '-'))
+    
+    def test_changed_include_reloads(self):
+        print("TestShaderWatcher:test_changed_include_reloads START".center(100, '-'))
+        
+        oldGlid = self.shader.get_glid()
+        self.shader.setUniformVariable(key='model', value=[[2.0] * 4] * 4, mat4=True)
+        self.write('common.glsl', 'const float PI = 3.0;\n', mtime=2000)
+        
+        self.assertEqual(self.watcher.check(), [os.path.join(self.directory, 'common.glsl')])
+        # submitted next to the program in use, swapped in on the next frame
+        self.assertEqual(self.shader.get_glid(), oldGlid)
+        self.watcher.update()
+        self.assertNotEqual(self.shader.get_glid(), oldGlid)
+        self.assertEqual(self.stubGL.log[-1][0], 'glDeleteProgram')
+        self.assertEqual(self.shader.component.uniforms.get('model')[0, 0], 2.0)
+        sources = [args[1] for name, args in self.stubGL.log if name == 'glShaderSource']
+        self.assertIn('const float PI = 3.0;', sources[-1])
+        
+        print("TestShaderWatcher:test_changed_include_reloads END".center(100, '-'))
+    
+    def test_failed_reload_keeps_program(self):
+        print("TestShaderWatcher:test_failed_reload_keeps_program START".center(100, '-'))
+        
+        oldGlid = self.shader.get_glid()
+        self.stubGL.linkStatus = 0
+        self.write('color.vert', '#version 410\nvoid main() { syntax error }\n', mtime=2000)
+        self.watcher.check()
+        self.watcher.update()
+        
+        self.assertEqual(self.shader.get_glid(), oldGlid)
+        self.assertIs(ProgramCache.programs()[self.shader.component.program.key], self.shader.component.program)
+        self.assertEqual(len(ProgramCache.programs()), 1)
+        
+        print("TestShaderWatcher:test_failed_reload_keeps_program END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
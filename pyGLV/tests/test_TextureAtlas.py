@@ -0,0 +1,158 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import OpenGL.GL as GL
+from PIL import Image
+
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureAtlas import SkylinePacker, TextureAtlas
+from pyGLV.GL.Textures import TextureArray, TextureUnits
+from pyGLV.tests.CountingGL import CountingGL
+
+
+def overlaps(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class TestTextureAtlas(unittest.TestCase):
+    """Deterministic skyline packing of mixed image sizes and texture coordinates into the atlas, without GL
+    """
+    def setUp(self):
+        print("TestTextureAtlas:setUp START".center(100, '-'))
+
+        rng = np.random.default_rng(3)
+        self.images = {f'image{i}': np.full((int(h), int(w), 4), (i * 9 % 256, i, 255 - i, 255), np.uint8)
+                       for i, (w, h) in enumerate(rng.integers(4, 60, (40, 2)))}
+
+        print("TestTextureAtlas:setUp END".center(100, '-'))
+
+    def atlas(self, images):
+        atlas = TextureAtlas(padding=2)
+        for name, pixels in images.items():
+            atlas.add(name, pixels)
+        atlas.pack()
+        return atlas
+
+    def test_skyline(self):
+        print("TestTextureAtlas:test_skyline START".center(100, '-'))
+
+        packer = SkylinePacker(8, 8)
+        self.assertEqual(packer.insert(4, 4), (0, 0))
+        self.assertEqual(packer.insert(4, 2), (4, 0))
+        # the lowest top edge: above the 4x2 rectangle
+        self.assertEqual(packer.insert(4, 2), (4, 2))
+        self.assertEqual(packer.insert(8, 4), (0, 4))
+        self.assertIsNone(packer.insert(1, 1))
+
+        print("TestTextureAtlas:test_skyline END".center(100, '-'))
+
+    def test_pack(self):
+        print("TestTextureAtlas:test_pack START".center(100, '-'))
+
+        atlas = self.atlas(self.images)
+        rects = [atlas.rect(name) for name in self.images]
+        self.assertEqual([rect[2:] for rect in rects], [(p.shape[1], p.shape[0]) for p in self.images.values()])
+        # within the atlas with their padding, and apart
+        padded = [(x - 2, y - 2, w + 4, h + 4) for x, y, w, h in rects]
+        for i, a in enumerate(padded):
+            self.assertTrue(a[0] >= 0 and a[1] >= 0 and a[0] + a[2] <= atlas.width and a[1] + a[3] <= atlas.height)
+            self.assertFalse(any(overlaps(a, b) for b in padded[i + 1:]))
+        self.assertEqual(atlas.width & (atlas.width - 1), 0)
+        area = sum(w * h for x, y, w, h in padded)
+        self.assertGreater(area / (atlas.width * atlas.height), 0.5)
+
+        # the same images give the same atlas
+        self.assertEqual([self.atlas(self.images).rect(name) for name in self.images], rects)
+        large = TextureAtlas(maxSize=64)
+        large.add('large', np.zeros((100, 10, 4), np.uint8))
+        with self.assertRaises(ValueError):
+            large.pack()
+
+        print("TestTextureAtlas:test_pack END".center(100, '-'))
+
+    def test_image_and_uvs(self):
+        print("TestTextureAtlas:test_image_and_uvs START".center(100, '-'))
+
+        atlas = TextureAtlas(padding=1)
+        filepath = os.path.join(tempfile.mkdtemp(), 'red.png')
+        Image.new('RGB', (6, 3), (255, 0, 0)).save(filepath)
+        atlas.add('red', filepath)
+        atlas.add('green', np.dstack([np.zeros((5, 5), np.uint8), np.full((5, 5), 255, np.uint8), np.zeros((5, 5), np.uint8)]))
+        width, height, pixels = atlas.image()
+        self.assertEqual(pixels.shape, (height, width, 4))
+
+        # file images are transposed as for Texture, RGB gets an opaque alpha channel
+        x, y, w, h = atlas.rect('red')
+        self.assertEqual((w, h), (3, 6))
+        np.testing.assert_array_equal(pixels[y - 1:y + h + 1, x - 1:x + w + 1], np.full((h + 2, w + 2, 4), (255, 0, 0, 255)))
+
+        # the corners of the texture coordinates map to the corners of the image
+        uvs = atlas.rewriteUVs('green', [[0.0, 0.0], [1.0, 1.0], [0.5, 0.5]])
+        x, y, w, h = atlas.rect('green')
+        np.testing.assert_allclose(uvs[:2], [[x / width, y / height], [(x + w) / width, (y + h) / height]])
+        column, row = int(uvs[2, 0] * width), int(uvs[2, 1] * height)
+        np.testing.assert_array_equal(pixels[row, column], [0, 255, 0, 255])
+
+        print("TestTextureAtlas:test_image_and_uvs END".center(100, '-'))
+
+
+class TestTextureArray(unittest.TestCase):
+    """Same-sized images uploaded into the layers of one GL_TEXTURE_2D_ARRAY
+    """
+    def setUp(self):
+        print("TestTextureArray:setUp START".center(100, '-'))
+
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.Textures.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        TextureUnits.reset()
+        GPUMemory.reset()
+
+        print("TestTextureArray:setUp END".center(100, '-'))
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        TextureUnits.reset()
+        GPUMemory.reset()
+
+    def test_layers(self):
+        print("TestTextureArray:test_layers START".center(100, '-'))
+
+        directory = tempfile.mkdtemp()
+        files = [os.path.join(directory, f'layer{i}.png') for i in range(2)]
+        for i, filepath in enumerate(files):
+            Image.new('RGB', (8, 8), (100 * i, 0, 0)).save(filepath)
+        textureArray = TextureArray(files + [(8, 8, np.zeros((8, 8, 4), np.uint8))])
+        self.assertEqual((textureArray.width, textureArray.height, textureArray.layers), (8, 8, 3))
+        self.assertEqual(self.stubGL.calls['glTexImage3D'], 1)
+        layers = [args[4] for name, args in self.stubGL.log if name == 'glTexSubImage3D']
+        self.assertEqual(layers, [0, 1, 2])
+        self.assertEqual(GPUMemory.total(GPUMemory.TEXTURE), GPUMemory.textureBytes(8, 8, mipmaps=True, layers=3))
+
+        textureArray.bind(2)
+        self.assertEqual(TextureUnits.bound(2), (GL.GL_TEXTURE_2D_ARRAY, textureArray.glid))
+        np.testing.assert_array_equal(TextureArray.texCoords([[0.0, 1.0], [1.0, 0.0]], 2), [[0.0, 1.0, 2.0], [1.0, 0.0, 2.0]])
+
+        with self.assertRaises(ValueError):
+            TextureArray([(8, 8, np.zeros((8, 8, 4), np.uint8)), (4, 4, np.zeros((4, 4, 4), np.uint8))])
+
+        print("TestTextureArray:test_layers END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
@@ -0,0 +1,166 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from pyGLV.GL.DeletionQueue import DeletionQueue
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureCache import TextureCache
+from pyGLV.GL.TextureLoader import TextureLoader
+from pyGLV.GL.Textures import TextureUnits
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestTextureCache(unittest.TestCase):
+    """Textures shared by (path, mtime, orient), reference counted, evicted least recently used first
+    """
+    def setUp(self):
+        print("TestTextureCache:setUp START".center(100, '-'))
+
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.Textures.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        TextureUnits.reset()
+        TextureCache.reset()
+        GPUMemory.reset()
+        directory = tempfile.mkdtemp()
+        self.files = []
+        for i in range(3):
+            self.files.append(os.path.join(directory, f'image{i}.png'))
+            Image.new('RGB', (4, 4), (40 * i, 0, 0)).save(self.files[-1])
+        self.textureBytes = GPUMemory.textureBytes(4, 4, mipmaps=True)
+
+        print("TestTextureCache:setUp END".center(100, '-'))
+
+    def tearDown(self):
+        TextureLoader.shutdown()
+        TextureCache.reset()
+        for patcher in self.patchers:
+            patcher.stop()
+        GPUMemory.reset()
+
+    def test_shared_texture(self):
+        print("TestTextureCache:test_shared_texture START".center(100, '-'))
+
+        texture = TextureCache.acquire(self.files[0])
+        self.assertIs(TextureCache.acquire(self.files[0]), texture)
+        self.assertEqual(self.stubGL.calls['glTexImage2D'], 1)
+        self.assertEqual(TextureCache.references(texture), 2)
+        # orient is part of the key
+        self.assertIsNot(TextureCache.acquire(self.files[0], orient=False), texture)
+        self.assertEqual(TextureCache.stats['hits'], 1)
+
+        # unreferenced textures stay resident within the budget
+        TextureCache.release(texture)
+        TextureCache.release(texture)
+        self.assertEqual(TextureCache.references(texture), 0)
+        self.assertIs(TextureCache.acquire(self.files[0]), texture)
+        self.assertEqual(self.stubGL.calls['glDeleteTextures'], 0)
+
+        print("TestTextureCache:test_shared_texture END".center(100, '-'))
+
+    def test_lru_eviction(self):
+        print("TestTextureCache:test_lru_eviction START".center(100, '-'))
+
+        TextureCache.setBudget(2 * self.textureBytes)
+        textures = [TextureCache.acquire(filepath) for filepath in self.files]
+        # all in use: over budget, nothing is evicted
+        self.assertEqual(TextureCache.count(), 3)
+        TextureCache.release(textures[1])
+        TextureCache.release(textures[0])
+        # textures[1] was used least recently
+        self.assertEqual(TextureCache.count(), 2)
+        self.assertEqual(TextureCache.references(textures[0]), 0)
+        self.assertEqual(self.stubGL.calls['glDeleteTextures'], 1)
+        self.assertEqual(TextureCache.resident(), 2 * self.textureBytes)
+
+        # the decoded image is still in the CPU side cache: uploaded again without a decode
+        with mock.patch.object(TextureLoader, 'decode', side_effect=AssertionError('decoded again')):
+            TextureCache.acquire(self.files[1])
+        self.assertEqual(TextureCache.stats['imageHits'], 1)
+        self.assertEqual(TextureCache.count(), 2)
+
+        # as a GPUMemory eviction callback
+        TextureCache.setBudget(TextureCache.BUDGET)
+        TextureCache.release(textures[2])
+        GPUMemory.addEvictionCallback(TextureCache.evict)
+        GPUMemory.setBudget(GPUMemory.total())
+        TextureCache.acquire(self.files[0])
+        self.assertEqual(TextureCache.count(), 2)
+        self.assertLessEqual(GPUMemory.total(), GPUMemory.budget())
+
+        TextureCache.setCpuBudget(0)
+        self.assertEqual(TextureCache.imageBytes(), 0)
+
+        print("TestTextureCache:test_lru_eviction END".center(100, '-'))
+
+    def test_deferred_deletion(self):
+        print("TestTextureCache:test_deferred_deletion START".center(100, '-'))
+
+        queue = DeletionQueue()
+        queue.activate()
+        try:
+            TextureCache.setBudget(0)
+            texture = TextureCache.acquire(self.files[0])
+            # the last reference, e.g. dropped by a Shader finalizer: evicted, deleted at the next drain
+            TextureCache.release(texture)
+            self.assertEqual(TextureCache.count(), 0)
+            self.assertEqual((self.stubGL.calls['glDeleteTextures'], queue.pending), (0, 1))
+            self.assertEqual(GPUMemory.total(GPUMemory.TEXTURE), 0)
+            queue.drain()
+            self.assertEqual(self.stubGL.log[-1], ('glDeleteTextures', (1, [texture.glid])))
+        finally:
+            DeletionQueue._current = None
+            DeletionQueue._discard = False
+
+        print("TestTextureCache:test_deferred_deletion END".center(100, '-'))
+
+    def test_modified_file(self):
+        print("TestTextureCache:test_modified_file START".center(100, '-'))
+
+        texture = TextureCache.acquire(self.files[0])
+        self.assertEqual(TextureCache.check(), [])
+        Image.new('RGB', (8, 8), (255, 255, 0)).save(self.files[0])
+        mtime = os.stat(self.files[0]).st_mtime_ns
+        os.utime(self.files[0], ns=(mtime + 10**9, mtime + 10**9))
+        self.assertEqual(TextureCache.check(), [self.files[0]])
+
+        # holders keep the previous Texture until they release it
+        modified = TextureCache.acquire(self.files[0])
+        self.assertIsNot(modified, texture)
+        self.assertEqual(modified.nbytes, GPUMemory.textureBytes(8, 8, mipmaps=True))
+        TextureCache.release(texture)
+        self.assertEqual(TextureCache.count(), 1)
+        self.assertEqual(self.stubGL.calls['glDeleteTextures'], 1)
+
+        print("TestTextureCache:test_modified_file END".center(100, '-'))
+
+    def test_asynchronous(self):
+        print("TestTextureCache:test_asynchronous START".center(100, '-'))
+
+        texture = TextureCache.acquire(self.files[0], asynchronous=True)
+        self.assertIs(TextureCache.acquire(self.files[0], asynchronous=True), texture)
+        self.assertFalse(texture.ready)
+        TextureLoader.wait()
+        self.assertTrue(texture.ready)
+        self.assertEqual(self.stubGL.calls['glTexImage2D'], 2)
+        self.assertEqual(TextureCache.imageBytes(), 4 * 4 * 4)
+
+        print("TestTextureCache:test_asynchronous END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
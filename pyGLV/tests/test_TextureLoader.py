@@ -0,0 +1,154 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+import numpy as np
+import OpenGL.GL as GL
+from PIL import Image
+
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureLoader import TextureLoader
+from pyGLV.GL.Textures import Texture, Texture3D, TextureUnits, get_texture_faces
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestTextureLoader(unittest.TestCase):
+    """Images decoded in a thread pool and uploaded on the render thread, placeholders until then
+    """
+    def setUp(self):
+        print("TestTextureLoader:setUp START".center(100, '-'))
+
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.Textures.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        TextureUnits.reset()
+        GPUMemory.reset()
+        directory = tempfile.mkdtemp()
+        self.files = []
+        for i, size in enumerate([(8, 4), (4, 4), (2, 2), (4, 4), (4, 4), (4, 4)]):
+            self.files.append(os.path.join(directory, f'image{i}.png'))
+            Image.new('RGB', size, (40 * i, 0, 0)).save(self.files[-1])
+
+        print("TestTextureLoader:setUp END".center(100, '-'))
+
+    def tearDown(self):
+        TextureLoader.shutdown()
+        for patcher in self.patchers:
+            patcher.stop()
+        GPUMemory.reset()
+
+    def images(self):
+        return [(args[3], args[4]) for name, args in self.stubGL.log if name == 'glTexImage2D']
+
+    def test_decode(self):
+        print("TestTextureLoader:test_decode START".center(100, '-'))
+
+        # transposed, non-square images keep all their pixels
+        width, height, data = TextureLoader.decode(self.files[0])
+        self.assertEqual((width, height, data.shape, data.dtype), (4, 8, (8, 4, 4), np.uint8))
+        self.assertTrue(data.flags.c_contiguous)
+        images = TextureLoader.decodeMany(self.files[:3], orient=False)
+        self.assertEqual([image[:2] for image in images], [(8, 4), (4, 4), (2, 2)])
+        np.testing.assert_array_equal(images[2][2][0, 0], [80, 0, 0, 255])
+
+        print("TestTextureLoader:test_decode END".center(100, '-'))
+
+    def test_decode_orientation(self):
+        print("TestTextureLoader:test_decode_orientation START".center(100, '-'))
+
+        # the transpose gives the pixels of a top to bottom flip followed by a clockwise quarter turn
+        pixels = np.random.default_rng(7).integers(0, 256, (16, 16, 3), np.uint8)
+        for mode, image in [('RGB', pixels), ('RGBA', np.dstack([pixels, pixels[..., :1]])), ('L', pixels[..., 0])]:
+            filepath = os.path.join(tempfile.mkdtemp(), f'{mode}.png')
+            Image.fromarray(image, mode).save(filepath)
+            reference = Image.open(filepath).transpose(Image.FLIP_TOP_BOTTOM).rotate(-90).convert('RGBA')
+            width, height, data = TextureLoader.decode(filepath)
+            self.assertEqual((width, height), reference.size)
+            self.assertEqual(data.tobytes(), reference.tobytes())
+
+        print("TestTextureLoader:test_decode END".center(100, '-'))
+
+    def test_async_texture(self):
+        print("TestTextureLoader:test_async_texture START".center(100, '-'))
+
+        texture = Texture(self.files[0], asynchronous=True)
+        # the placeholder is uploaded right away, without mipmaps
+        self.assertEqual(self.images(), [(1, 1)])
+        self.assertEqual(self.stubGL.calls['glGenerateMipmap'], 0)
+        self.assertFalse(texture.ready)
+
+        TextureLoader.wait()
+        self.assertTrue(texture.ready)
+        self.assertEqual(self.images(), [(1, 1), (4, 8)])
+        self.assertEqual(self.stubGL.calls['glGenerateMipmap'], 1)
+        self.assertEqual(GPUMemory.total(GPUMemory.TEXTURE), GPUMemory.textureBytes(4, 8, mipmaps=True))
+        self.assertEqual(TextureLoader.pending(), 0)
+
+        # a synchronous Texture uploads its image in the constructor
+        Texture(self.files[1])
+        self.assertEqual(self.images()[-1], (4, 4))
+
+        print("TestTextureLoader:test_async_texture END".center(100, '-'))
+
+    def test_upload_unit(self):
+        print("TestTextureLoader:test_upload_unit START".center(100, '-'))
+
+        first = Texture(self.files[0], asynchronous=True)
+        second = Texture(self.files[1])
+        first.bind(0)
+        second.bind(1)
+        del self.stubGL.log[:]
+        TextureLoader.wait()
+        # unit 0 is made active again for the upload, although the cache has the texture bound there
+        calls = [(name, args[0]) for name, args in self.stubGL.log if name in ('glActiveTexture', 'glTexImage2D')]
+        self.assertEqual(calls, [('glActiveTexture', GL.GL_TEXTURE0), ('glTexImage2D', GL.GL_TEXTURE_2D)])
+        self.assertEqual((TextureUnits.bound(0)[1], TextureUnits.bound(1)[1]), (first.glid, second.glid))
+
+        print("TestTextureLoader:test_upload_unit END".center(100, '-'))
+
+    def test_async_cube_map(self):
+        print("TestTextureLoader:test_async_cube_map START".center(100, '-'))
+
+        faces = get_texture_faces(*self.files, asynchronous=True)
+        self.assertIsInstance(faces, Future)
+        cubeMap = Texture3D(faces)
+        self.assertEqual(self.images(), [(1, 1)] * 6)
+        self.assertFalse(cubeMap.ready)
+
+        TextureLoader.wait()
+        self.assertTrue(cubeMap.ready)
+        # GL order +x, -x, +y, -y, +z, -z from right, left, top, bottom, front, back
+        self.assertEqual(self.images()[6:], [(4, 4), (4, 4), (2, 2), (4, 4), (8, 4), (4, 4)])
+        targets = [args[0] for name, args in self.stubGL.log if name == 'glTexImage2D'][6:]
+        self.assertEqual(targets, [GL.GL_TEXTURE_CUBE_MAP_POSITIVE_X + i for i in range(6)])
+
+        print("TestTextureLoader:test_async_cube_map END".center(100, '-'))
+
+    def test_failed_decode(self):
+        print("TestTextureLoader:test_failed_decode START".center(100, '-'))
+
+        failed = TextureLoader.stats['failed']
+        texture = Texture(os.path.join(tempfile.mkdtemp(), 'missing.png'), asynchronous=True)
+        TextureLoader.wait()
+        self.assertFalse(texture.ready)
+        self.assertEqual(self.images(), [(1, 1)])
+        self.assertEqual(TextureLoader.stats['failed'], failed + 1)
+
+        print("TestTextureLoader:test_failed_decode END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
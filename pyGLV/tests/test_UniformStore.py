@@ -0,0 +1,141 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+    
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import tracemalloc
+import unittest
+from unittest import mock
+
+import OpenGL.GL as GL
+import numpy as np
+
+from pyGLV.GL.UniformStore import UniformStore
+from pyGLV.tests.CountingGL import CountingGL
+
+
+class TestUniformStore(unittest.TestCase):
+    
+    def setUp(self):
+        print("TestUniformStore:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL(uniforms=[('modelViewProj', 1, GL.GL_FLOAT_MAT4),
+                                           ('normalMatrix', 1, GL.GL_FLOAT_MAT3),
+                                           ('lightPos', 1, GL.GL_FLOAT_VEC3),
+                                           ('shininess', 1, GL.GL_FLOAT),
+                                           ('bones[0]', 3, GL.GL_FLOAT_MAT4),
+                                           ('ImageTexture', 1, GL.GL_SAMPLER_2D)])
+        self.patcher = mock.patch('pyGLV.GL.UniformStore.gl', self.stubGL)
+        self.patcher.start()
+        self.store = UniformStore()
+        
+        print("TestUniformStore:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        self.patcher.stop()
+    
+    def test_layout(self):
+        print("TestUniformStore:test_layout START".center(100, '-'))
+        
+        self.store.build(7)
+        
+        self.assertEqual(self.store.floatData.dtype, np.float32)
+        self.assertEqual(self.store.floatData.size, 16 + 9 + 3 + 1 + 3*16)
+        self.assertEqual(self.store.intData.size, 1)
+        self.assertEqual(self.store.uniforms['modelViewProj'].view.shape, (4,4))
+        self.assertEqual(self.store.uniforms['bones'].view.shape, (3,4,4))
+        self.assertEqual(self.store.uniforms['shininess'].view.shape, (1,))
+        self.assertEqual(self.store.uniforms['ImageTexture'].view.dtype, np.int32)
+        
+        print("TestUniformStore:test_layout END".center(100, '-'))
+    
+    def test_set_in_place(self):
+        print("TestUniformStore:test_set_in_place START".center(100, '-'))
+        
+        self.store.build(7)
+        buffer = self.store.floatData
+        view = self.store.uniforms['modelViewProj'].view
+        matrix = np.arange(16, dtype=np.float64).reshape(4,4)
+        
+        self.assertTrue(self.store.set('modelViewProj', matrix))
+        self.assertFalse(self.store.set('modelViewProj', matrix)) # unchanged value
+        self.assertFalse(self.store.set('notActive', 1.0))
+        
+        self.assertIs(self.store.floatData, buffer)
+        self.assertIs(self.store.uniforms['modelViewProj'].view, view)
+        np.testing.assert_array_equal(buffer[:16], matrix.reshape(-1))
+        # compared in the store's float32, not by the bytes of the float64 value
+        self.assertFalse(self.store.set('modelViewProj', matrix.astype(np.float32)))
+        self.assertTrue(self.store.set('shininess', 0.2))
+        self.assertFalse(self.store.set('shininess', 0.2))
+        self.assertFalse(self.store.set('shininess', np.float32(0.2)))
+        
+        # setting a value of the store's dtype allocates nothing
+        value = np.ones((4, 4), np.float32)
+        self.store.set('modelViewProj', value)
+        tracemalloc.start()
+        for frame in range(1000):
+            self.store.set('modelViewProj', value)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, 1024)
+        
+        print("TestUniformStore:test_set_in_place END".center(100, '-'))
+    
+    def test_upload_dirty_only(self):
+        print("TestUniformStore:test_upload_dirty_only START".center(100, '-'))
+        
+        self.store.build(7)
+        self.store.set('modelViewProj', np.identity(4))
+        self.store.set('lightPos', [1.0, 2.0, 3.0])
+        self.store.upload()
+        self.store.upload()
+        self.store.set('lightPos', [1.0, 2.0, 4.0])
+        self.store.upload()
+        
+        self.assertEqual(self.stubGL.calls['glUniformMatrix4fv'], 1)
+        self.assertEqual(self.stubGL.calls['glUniform3fv'], 2)
+        # uploads pass the float32 store views, transposing row-major matrices
+        name, args = [call for call in self.stubGL.log if call[0] == 'glUniformMatrix4fv'][0]
+        self.assertEqual(args[:3], (0, 1, True))
+        self.assertEqual(args[3].dtype, np.float32)
+        
+        print("TestUniformStore:test_upload_dirty_only END".center(100, '-'))
+    
+    def test_values_set_before_linking(self):
+        print("TestUniformStore:test_values_set_before_linking START".center(100, '-'))
+        
+        self.store.set('shininess', 0.5, GL.GL_FLOAT)
+        self.assertEqual(self.store.names(GL.GL_FLOAT), ['shininess'])
+        
+        self.store.build(7)
+        self.store.upload()
+        
+        self.assertEqual(self.store.pending, {})
+        self.assertEqual(self.store.get('shininess')[0], 0.5)
+        self.assertEqual(self.stubGL.calls['glUniform1fv'], 1)
+        
+        print("TestUniformStore:test_values_set_before_linking END".center(100, '-'))
+    
+    def test_relink_keeps_values(self):
+        print("TestUniformStore:test_relink_keeps_values START".center(100, '-'))
+        
+        self.store.build(7)
+        self.store.set('lightPos', [1.0, 2.0, 3.0])
+        self.store.upload()
+        self.store.build(8)
+        self.store.upload()
+        
+        np.testing.assert_array_equal(self.store.get('lightPos'), [1.0, 2.0, 3.0])
+        self.assertEqual(self.stubGL.calls['glUniform3fv'], 2)
+        
+        print("TestUniformStore:test_relink_keeps_values END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
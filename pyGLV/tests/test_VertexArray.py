@@ -8,7 +8,12 @@ pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
 
 """
 
+import gc
 import unittest
+from unittest import mock
+
+import numpy as np
+import OpenGL.GL as GL
 
 import pyECSS.utilities as util
 from pyECSS.Entity import Entity
@@ -17,7 +22,11 @@ from pyECSS.System import System, TransformSystem, CameraSystem, RenderSystem
 from pyGLV.GL.Scene import Scene
 from pyECSS.ECSSManager import ECSSManager
 
-from pyGLV.GL.VertexArray import VertexArray
+from pyGLV.GL.VertexArray import VertexArray, InstancedVertexArray
+from pyGLV.GL.GeometryArena import GeometryArena
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.VertexFormat import VertexFormat
+from pyGLV.tests.CountingGL import CountingGL
 
 
 @unittest.skip("Requires active GL context, skipping the test")
@@ -47,5 +56,413 @@ class TestVertexArray(unittest.TestCase):
         print("TestVertexArray:test_update END".center(100, '-'))
         
 
+class TestVertexArrayInterleaved(unittest.TestCase):
+    """All vertex attributes packed into a single strided VBO
+    """
+    def setUp(self):
+        print("TestVertexArrayInterleaved:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.VertexArray.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.vertices = np.arange(16, dtype=np.float32).reshape(4, 4)
+        self.colors = np.arange(16, 32, dtype=np.float32).reshape(4, 4)
+        self.uvs = [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]]
+        
+        print("TestVertexArrayInterleaved:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_interleave(self):
+        print("TestVertexArrayInterleaved:test_interleave START".center(100, '-'))
+        
+        data, layout, stride = VertexArray.interleave([self.vertices, self.colors, None, self.uvs])
+        self.assertEqual(data.dtype, np.float32)
+        self.assertTrue(data.flags['C_CONTIGUOUS'])
+        self.assertEqual(data.shape, (4, 10))
+        self.assertEqual(stride, 40)
+        self.assertEqual(layout, [(0, 4, 0), (1, 4, 16), (3, 2, 32)])
+        np.testing.assert_array_equal(data[2], np.concatenate([self.vertices[2], self.colors[2], self.uvs[2]]))
+        with self.assertRaises(ValueError):
+            VertexArray.interleave([self.vertices, self.colors[:3]])
+        
+        print("TestVertexArrayInterleaved:test_interleave END".center(100, '-'))
+    
+    def test_init(self):
+        print("TestVertexArrayInterleaved:test_init START".center(100, '-'))
+        
+        vertexArray = VertexArray(attributes=[self.vertices, self.colors, self.uvs], index=[0, 1, 2, 0, 2, 3], interleaved=True)
+        vertexArray.init()
+        
+        # one VBO for all attributes plus the index buffer
+        self.assertEqual(self.stubGL.calls['glGenBuffers'], 2)
+        self.assertEqual(self.stubGL.calls['glBufferData'], 2)
+        pointers = [(args[0], args[1], args[4], args[5].value or 0) for name, args in self.stubGL.log if name == 'glVertexAttribPointer']
+        self.assertEqual(pointers, [(0, 4, 40, 0), (1, 4, 40, 16), (2, 2, 40, 32)])
+        self.assertEqual(vertexArray.stride, 40)
+        del vertexArray
+        
+        print("TestVertexArrayInterleaved:test_init END".center(100, '-'))
+    
+    def test_formats(self):
+        print("TestVertexArrayInterleaved:test_formats START".center(100, '-'))
+        
+        colors, normals = self.colors / 32.0, np.tile([0.0, 1.0, 0.0, 0.0], (4, 1))
+        attributes = [self.vertices, colors, normals, self.uvs]
+        formats = {1: VertexFormat.UNORM8, 2: VertexFormat.INT_2_10_10_10, 3: 'half'}
+        for interleaved in (True, False):
+            self.stubGL.log.clear()
+            vertexArray = VertexArray(attributes=attributes, interleaved=interleaved, formats=formats)
+            vertexArray.init()
+            pointers = [(args[0], args[1], args[2], args[3], args[4]) for name, args in self.stubGL.log if name == 'glVertexAttribPointer']
+            strides = [28] * 4 if interleaved else [16, 4, 4, 4]
+            self.assertEqual(pointers, [(0, 4, GL.GL_FLOAT, False, strides[0]), (1, 4, GL.GL_UNSIGNED_BYTE, True, strides[1]),
+                                        (2, 4, GL.GL_INT_2_10_10_10_REV, True, strides[2]), (3, 2, GL.GL_HALF_FLOAT, False, strides[3])])
+            # 28 instead of 56 bytes per vertex
+            uploaded = sum(args[1].nbytes for name, args in self.stubGL.log if name == 'glBufferData')
+            self.assertEqual(uploaded, 4 * 28)
+            del vertexArray
+        
+        # updates are packed in the attribute's format
+        vertexArray = VertexArray(attributes=attributes, interleaved=True, formats=formats)
+        vertexArray.init()
+        vertexArray.update_attribute(1, [[1.0, 0.0, 0.0, 1.0]], offset=3)
+        target, byteOffset, size, rows = [args for name, args in self.stubGL.log if name == 'glBufferSubData'][-1]
+        self.assertEqual((byteOffset, size), (3 * 28, 28))
+        np.testing.assert_array_equal(rows[0, 16:20], [255, 0, 0, 255])
+        del vertexArray
+        
+        print("TestVertexArrayInterleaved:test_formats END".center(100, '-'))
+        
+
+class TestVertexArrayUpdate(unittest.TestCase):
+    """Attributes updated in place: glBufferSubData, orphaning and persistent mapped ring buffers
+    """
+    def setUp(self):
+        print("TestVertexArrayUpdate:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.VertexArray.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.vertices = np.arange(16, dtype=np.float32).reshape(4, 4)
+        self.colors = np.ones((4, 4), np.float32)
+        
+        print("TestVertexArrayUpdate:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def calls(self, name):
+        return [args for n, args in self.stubGL.log if n == name]
+    
+    def test_sub_data_and_orphaning(self):
+        print("TestVertexArrayUpdate:test_sub_data_and_orphaning START".center(100, '-'))
+        
+        vertexArray = VertexArray(attributes=[self.vertices, self.colors], usage=GL.GL_DYNAMIC_DRAW)
+        vertexArray.init()
+        self.stubGL.log.clear()
+        
+        vertexArray.update_attribute(0, self.vertices[1:3] * 2.0, offset=1)
+        target, byteOffset, size, data = self.calls('glBufferSubData')[-1]
+        self.assertEqual((byteOffset, size), (16, 32))
+        self.assertEqual(self.calls('glBufferData'), [])
+        
+        # a larger attribute orphans the buffer, and is drawn completely
+        vertexArray.update_attribute(0, np.zeros((6, 4)))
+        self.assertEqual(self.calls('glBufferData')[-1], (GL.GL_ARRAY_BUFFER, 96, None, GL.GL_DYNAMIC_DRAW))
+        self.assertEqual(self.calls('glBufferSubData')[-1][1:3], (0, 96))
+        self.assertEqual(vertexArray._arguments, (0, 6))
+        with self.assertRaises(ValueError):
+            vertexArray.update_attribute(1, np.zeros((4, 4)), offset=2)
+        del vertexArray
+        
+        print("TestVertexArrayUpdate:test_sub_data_and_orphaning END".center(100, '-'))
+    
+    def test_interleaved(self):
+        print("TestVertexArrayUpdate:test_interleaved START".center(100, '-'))
+        
+        vertexArray = VertexArray(attributes=[self.vertices, self.colors], interleaved=True)
+        vertexArray.init()
+        vertexArray.update_attribute(1, [[0.5, 0.5, 0.5, 1.0]], offset=2)
+        
+        target, byteOffset, size, rows = self.calls('glBufferSubData')[-1]
+        self.assertEqual((byteOffset, size), (2 * 32, 32))
+        np.testing.assert_array_equal(rows[0], [8, 9, 10, 11, 0.5, 0.5, 0.5, 1.0])
+        del vertexArray
+        
+        print("TestVertexArrayUpdate:test_interleaved END".center(100, '-'))
+    
+    def test_streaming_ring(self):
+        print("TestVertexArrayUpdate:test_streaming_ring START".center(100, '-'))
+        
+        vertexArray = VertexArray(attributes=[self.vertices], streaming=True)
+        vertexArray.init()
+        self.assertEqual(self.stubGL.calls['glBufferStorage'], 1)
+        mapped = self.stubGL.mapped.view(np.float32).reshape(3, 4, 4)
+        np.testing.assert_array_equal(mapped[0], self.vertices)
+        
+        for frame in range(1, 4):
+            vertexArray.update_attribute(0, [[frame] * 4], offset=3)
+            # each frame writes the next section and points the attribute to it
+            section = frame % 3
+            np.testing.assert_array_equal(mapped[section][3], [frame] * 4)
+            np.testing.assert_array_equal(mapped[section][:3], self.vertices[:3])
+            self.assertEqual(self.calls('glVertexAttribPointer')[-1][5].value or 0, section * 64)
+        
+        # coming back to the first section waits for the fence placed when leaving it
+        self.assertEqual(self.calls('glClientWaitSync')[0][0], 1)
+        # new sections are filled from the CPU copy, not read back from the write only mapping
+        mapped[0] = -1.0
+        vertexArray.update_attribute(0, [[9.0] * 4], offset=3)
+        np.testing.assert_array_equal(mapped[1][:3], self.vertices[:3])
+        self.assertEqual(self.stubGL.calls['glBufferData'], 0)
+        del vertexArray, mapped
+        
+        print("TestVertexArrayUpdate:test_streaming_ring END".center(100, '-'))
+    
+    def test_gpu_memory(self):
+        print("TestVertexArrayUpdate:test_gpu_memory START".center(100, '-'))
+        
+        GPUMemory.reset()
+        vertexArray = VertexArray(attributes=[self.vertices, self.colors], index=[0, 1, 2, 0, 2, 3], usage=GL.GL_DYNAMIC_DRAW)
+        vertexArray.init()
+        self.assertEqual(GPUMemory.totals(), {GPUMemory.VERTEX: 128, GPUMemory.INDEX: 12})
+        
+        # a grown attribute updates its size, deleting the VertexArray removes it
+        vertexArray.update_attribute(0, np.zeros((8, 4)))
+        self.assertEqual(GPUMemory.total(GPUMemory.VERTEX), 128 + 64)
+        del vertexArray
+        gc.collect()
+        self.assertEqual(GPUMemory.total(), 0)
+        self.assertEqual(GPUMemory.peak(), 128 + 64 + 12)
+        GPUMemory.reset()
+        
+        print("TestVertexArrayUpdate:test_gpu_memory END".center(100, '-'))
+        
+
+class TestVertexArrayIndex(unittest.TestCase):
+    """Index arrays narrowed to the smallest unsigned integer type
+    """
+    def setUp(self):
+        print("TestVertexArrayIndex:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.VertexArray.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        
+        print("TestVertexArrayIndex:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def test_narrow_index(self):
+        print("TestVertexArrayIndex:test_narrow_index START".center(100, '-'))
+        
+        index, indexType = VertexArray.narrow_index(list(range(36)))
+        self.assertEqual((index.dtype, indexType), (np.uint16, GL.GL_UNSIGNED_SHORT))
+        index, indexType = VertexArray.narrow_index(np.arange(36, dtype=np.int64), allowByte=True)
+        self.assertEqual((index.dtype, indexType), (np.uint8, GL.GL_UNSIGNED_BYTE))
+        index, indexType = VertexArray.narrow_index([[0, 65535], [1, 2]])
+        self.assertEqual((index.dtype, index.shape), (np.uint16, (4,)))
+        index, indexType = VertexArray.narrow_index([0, 65536])
+        self.assertEqual((index.dtype, indexType), (np.uint32, GL.GL_UNSIGNED_INT))
+        
+        # integral floats are converted, anything else is rejected
+        index, indexType = VertexArray.narrow_index(np.array([0.0, 1.0, 2.0], np.float32))
+        np.testing.assert_array_equal(index, [0, 1, 2])
+        for invalid in ([0.5, 1.0], [-1, 2], ['a', 'b'], [np.nan]):
+            with self.assertRaises(ValueError):
+                VertexArray.narrow_index(invalid)
+        
+        print("TestVertexArrayIndex:test_narrow_index END".center(100, '-'))
+    
+    def test_draw_index_type(self):
+        print("TestVertexArrayIndex:test_draw_index_type START".center(100, '-'))
+        
+        vertexArray = VertexArray(attributes=[np.zeros((4, 4))], index=[0, 1, 2, 0, 2, 3])
+        vertexArray.init()
+        vertexArray.draw()
+        self.assertEqual(self.stubGL.log[-2], ('glDrawElements', (GL.GL_TRIANGLES, 6, GL.GL_UNSIGNED_SHORT, None)))
+        uploaded = [args[1] for name, args in self.stubGL.log if name == 'glBufferData' and args[0] == GL.GL_ELEMENT_ARRAY_BUFFER]
+        self.assertEqual(uploaded[0].nbytes, 12)
+        del vertexArray
+        
+        print("TestVertexArrayIndex:test_draw_index_type END".center(100, '-'))
+
+
+class TestInstancedVertexArray(unittest.TestCase):
+    """One mesh drawn many times from per-instance attributes in a single draw call
+    """
+    def setUp(self):
+        print("TestInstancedVertexArray:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.VertexArray.gl', self.stubGL), mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.vertices = np.arange(16, dtype=np.float32).reshape(4, 4)
+        self.models = np.stack([np.eye(4, dtype=np.float32) for i in range(3)])
+        self.models[:, 0, 3] = [1.0, 2.0, 3.0] # translations along x
+        self.colors = np.ones((3, 4), np.float32)
+        
+        print("TestInstancedVertexArray:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+    
+    def calls(self, name):
+        return [args for n, args in self.stubGL.log if n == name]
+    
+    def test_pack_instances(self):
+        print("TestInstancedVertexArray:test_pack_instances START".center(100, '-'))
+        
+        data, layout, stride = InstancedVertexArray.pack_instances({2: self.models, 6: self.colors})
+        self.assertEqual(data.shape, (3, 20))
+        self.assertEqual(stride, 80)
+        self.assertEqual(layout, [(2, 4, 0), (3, 4, 16), (4, 4, 32), (5, 4, 48), (6, 4, 64)])
+        # matrices are stored column by column, the translation is the fourth column
+        np.testing.assert_array_equal(data[1, 12:16], [2.0, 0.0, 0.0, 1.0])
+        with self.assertRaises(ValueError):
+            InstancedVertexArray.pack_instances({2: self.models, 4: self.colors})
+        
+        print("TestInstancedVertexArray:test_pack_instances END".center(100, '-'))
+    
+    def test_draw(self):
+        print("TestInstancedVertexArray:test_draw START".center(100, '-'))
+        
+        vertexArray = InstancedVertexArray(attributes=[self.vertices, self.vertices], index=[0, 1, 2, 0, 2, 3], 
+                                           instanceAttributes={2: self.models, 6: self.colors})
+        vertexArray.init()
+        self.assertEqual([args for args in self.calls('glVertexAttribDivisor')], [(loc, 1) for loc in range(2, 7)])
+        vertexArray.draw()
+        self.assertEqual(self.calls('glDrawElementsInstanced'), [(GL.GL_TRIANGLES, 6, GL.GL_UNSIGNED_SHORT, None, 3)])
+        self.assertEqual(self.stubGL.calls['glDrawElements'], 0)
+        
+        vertexArray = InstancedVertexArray(attributes=[self.vertices], instanceAttributes={1: self.colors})
+        vertexArray.init()
+        vertexArray.draw()
+        self.assertEqual(self.calls('glDrawArraysInstanced'), [(GL.GL_TRIANGLES, 0, 4, 3)])
+        del vertexArray
+        
+        print("TestInstancedVertexArray:test_draw END".center(100, '-'))
+    
+    def test_update_instances(self):
+        print("TestInstancedVertexArray:test_update_instances START".center(100, '-'))
+        
+        vertexArray = InstancedVertexArray(attributes=[self.vertices], instanceAttributes={2: self.models, 6: self.colors})
+        vertexArray.init()
+        self.stubGL.log.clear()
+        
+        # same size: the VBO is orphaned and refilled with one upload
+        self.models[:, 1, 3] = 5.0
+        vertexArray.update_instances({2: self.models})
+        self.assertEqual(self.calls('glBufferData'), [(GL.GL_ARRAY_BUFFER, 240, None, GL.GL_DYNAMIC_DRAW)])
+        target, offset, size, data = self.calls('glBufferSubData')[0]
+        self.assertEqual((offset, size), (0, 240))
+        np.testing.assert_array_equal(data[:, 13], [5.0, 5.0, 5.0])
+        self.assertEqual(self.calls('glVertexAttribPointer'), [])
+        
+        # more instances: the VBO grows, the attribute pointers are unchanged
+        self.stubGL.log.clear()
+        vertexArray.update_instances({2: np.tile(self.models, (2, 1, 1)), 6: np.tile(self.colors, (2, 1))})
+        self.assertEqual(self.stubGL.calls['glBufferSubData'], 1)
+        self.assertEqual(self.calls('glBufferData')[0][1].nbytes, 480)
+        self.assertEqual(vertexArray.instanceCount, 6)
+        del vertexArray
+        
+        print("TestInstancedVertexArray:test_update_instances END".center(100, '-'))
+
+
+class TestVertexArrayArena(unittest.TestCase):
+    """VertexArrays suballocated from a GeometryArena instead of owning their buffers
+    """
+    def setUp(self):
+        print("TestVertexArrayArena:setUp START".center(100, '-'))
+        
+        self.stubGL = CountingGL()
+        self.patchers = [mock.patch('pyGLV.GL.VertexArray.gl', self.stubGL), mock.patch('pyGLV.GL.GeometryArena.gl', self.stubGL),
+                         mock.patch('pyGLV.GL.DeletionQueue.gl', self.stubGL)]
+        for patcher in self.patchers:
+            patcher.start()
+        self.arena = GeometryArena()
+        
+        print("TestVertexArrayArena:setUp END".center(100, '-'))
+    
+    def tearDown(self):
+        gc.collect()
+        for patcher in self.patchers:
+            patcher.stop()
+        GeometryArena.unbound()
+    
+    def test_draw(self):
+        print("TestVertexArrayArena:test_draw START".center(100, '-'))
+        
+        vertexArrays = [VertexArray(attributes=[np.zeros((4, 4)), np.ones((4, 4))], index=[0, 1, 2, 0, 2, 3], arena=self.arena) for i in range(3)]
+        for vertexArray in vertexArrays:
+            vertexArray.init()
+        self.assertEqual(self.stubGL.calls['glGenVertexArrays'], 1)
+        self.assertEqual(self.arena.stats()['meshes'], 3)
+        self.stubGL.log.clear()
+        
+        for vertexArray in vertexArrays:
+            vertexArray.draw()
+        self.assertEqual([name for name, args in self.stubGL.log].count('glBindVertexArray'), 1)
+        self.assertEqual([args[4] for name, args in self.stubGL.log if name == 'glDrawElementsBaseVertex'], [0, 4, 8])
+        with self.assertRaises(ValueError):
+            vertexArrays[0].update_attribute(0, np.zeros((4, 4)))
+        
+        # a VertexArray drawn with its own VAO in between forces the next rebind
+        own = VertexArray(attributes=[np.zeros((4, 4))])
+        own.init()
+        own.draw()
+        vertexArrays[0].draw()
+        self.assertEqual(self.stubGL.log[-2][0], 'glBindVertexArray')
+        
+        # freed meshes give their ranges back
+        del vertexArrays[1]
+        gc.collect()
+        self.assertEqual(self.arena.stats()['meshes'], 2)
+        del vertexArrays, own
+        
+        print("TestVertexArrayArena:test_draw END".center(100, '-'))
+    
+    def test_init_many(self):
+        print("TestVertexArrayArena:test_init_many START".center(100, '-'))
+        
+        static = [VertexArray(attributes=[np.zeros((4, 4)), np.ones((4, 4))], index=[0, 1, 2, 0, 2, 3]) for i in range(100)]
+        dynamic = VertexArray(attributes=[np.zeros((4, 4))], usage=GL.GL_DYNAMIC_DRAW)
+        instanced = InstancedVertexArray(attributes=[np.zeros((4, 4))], instanceAttributes={2: np.zeros((3, 4))})
+        self.assertEqual(VertexArray.init_many(static + [dynamic, instanced], self.arena), 100)
+        
+        # static meshes share one VAO and two uploads, the others keep their own buffers
+        self.assertEqual(self.stubGL.calls['glGenVertexArrays'], 3)
+        self.assertEqual(self.stubGL.calls['glBufferSubData'], 2)
+        self.assertTrue(all(vertexArray.arena is self.arena for vertexArray in static))
+        self.assertEqual((dynamic.allocation, instanced.allocation), (None, None))
+        self.assertEqual(static[-1].allocation.vertexOffset, 99 * 4)
+        self.assertEqual(self.arena.stats()['meshes'], 100)
+        
+        # a mesh without vertices in the batch keeps its own VAO, as init() gives it
+        empty = VertexArray(attributes=[np.zeros((0, 4))])
+        self.assertEqual(VertexArray.init_many([empty, VertexArray(attributes=[np.zeros((4, 4)), np.ones((4, 4))])], self.arena), 1)
+        self.assertEqual((empty.arena, empty.allocation, empty._arguments), (None, None, (0, 0)))
+        self.assertEqual(self.stubGL.calls['glGenVertexArrays'], 4)
+        del static, dynamic, instanced, empty
+        
+        print("TestVertexArrayArena:test_init_many END".center(100, '-'))
+
+
 if __name__ == "__main__":
     unittest.main(argv=[''], verbosity=3, exit=False)
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Unit tests
+Employing the unittest standard python test framework
+https://docs.python.org/3/library/unittest.html
+
+pyGLV (Computer Graphics for Deep Learning and Scientific Visualization)
+@Copyright 2021-2022 Dr. George Papagiannakis
+
+"""
+
+import unittest
+
+import numpy as np
+import OpenGL.GL as GL
+
+from pyGLV.GL.VertexFormat import VertexFormat
+
+
+class TestVertexFormat(unittest.TestCase):
+    """Vectorized packing of float attributes into compact GL vertex formats
+    """
+    def setUp(self):
+        print("TestVertexFormat:setUp START".center(100, '-'))
+
+        self.colors = np.array([[0.0, 0.5, 1.0, 1.0], [1.2, -0.1, 0.25, 0.0]], np.float32)
+        self.normals = np.array([[0.0, 0.0, 1.0, 0.0], [-1.0, 0.5, 0.0, 0.0]], np.float32)
+
+        print("TestVertexFormat:setUp END".center(100, '-'))
+
+    def test_normalized(self):
+        print("TestVertexFormat:test_normalized START".center(100, '-'))
+
+        packed = VertexFormat.UNORM8.pack(self.colors)
+        self.assertEqual(packed.dtype, np.uint8)
+        # out of range values are clamped, in range values rounded to the nearest step
+        np.testing.assert_array_equal(packed, [[0, 128, 255, 255], [255, 0, 64, 0]])
+        np.testing.assert_array_equal(VertexFormat.SNORM16.pack([[-1.0, 1.0]]), [[-32767, 32767]])
+        self.assertEqual((VertexFormat.UNORM8.type, VertexFormat.UNORM8.normalized), (GL.GL_UNSIGNED_BYTE, True))
+
+        # 3 bytes per vertex are padded to 4, as attributes must be 4-byte aligned
+        self.assertEqual(VertexFormat.UNORM8.pack(self.colors[:, :3]).shape, (2, 4))
+        self.assertEqual(VertexFormat.UNORM8.rowSize(3), 4)
+
+        print("TestVertexFormat:test_normalized END".center(100, '-'))
+
+    def test_half(self):
+        print("TestVertexFormat:test_half START".center(100, '-'))
+
+        uvs = np.array([[0.0, 0.25], [0.75, 1.0]], np.float32)
+        packed = VertexFormat.HALF.pack(uvs)
+        self.assertEqual((packed.dtype, packed.nbytes), (np.float16, 8))
+        np.testing.assert_array_equal(packed.astype(np.float32), uvs)
+        self.assertEqual(VertexFormat.HALF.rowSize(3), 8)
+        self.assertIs(VertexFormat.get('half'), VertexFormat.HALF)
+        self.assertIs(VertexFormat.get(None), VertexFormat.FLOAT)
+        with self.assertRaises(ValueError):
+            VertexFormat.get('double')
+
+        print("TestVertexFormat:test_half END".center(100, '-'))
+
+    def test_int_2_10_10_10(self):
+        print("TestVertexFormat:test_int_2_10_10_10 START".center(100, '-'))
+
+        packed = VertexFormat.INT_2_10_10_10.pack(self.normals[:, :3])
+        self.assertEqual((packed.shape, packed.dtype), ((2, 1), np.uint32))
+        words = packed[:, 0]
+        # decode the signed bit fields as GL does
+        fields = np.stack([(words >> shift) & 0x3FF for shift in (0, 10, 20)], axis=1).astype(np.int32)
+        fields = np.where(fields >= 512, fields - 1024, fields)
+        np.testing.assert_allclose(np.maximum(fields / 511.0, -1.0), self.normals[:, :3], atol=1.0 / 511)
+        np.testing.assert_array_equal(words >> 30, [0, 0])
+        self.assertEqual(VertexFormat.INT_2_10_10_10.components(3), 4)
+        with self.assertRaises(ValueError):
+            VertexFormat.INT_2_10_10_10.pack(np.zeros((1, 5)))
+
+        print("TestVertexFormat:test_int_2_10_10_10 END".center(100, '-'))
+
+
+if __name__ == "__main__":
+    unittest.main(argv=[''], verbosity=3, exit=False)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Offline conversion of PNG/JPG textures into block compressed KTX2 or DDS files with their mip chains,
+which Texture and Texture3D upload with glCompressedTexImage2D (see pyGLV.GL.CompressedImage).
+
+    python -m pyGLV.utils.compress_textures pyGLV/examples/textures
+    python -m pyGLV.utils.compress_textures --faces pyGLV/examples/Skyboxes/Cloudy pyGLV/examples/Skyboxes/Sea
+    python -m pyGLV.utils.compress_textures --format BC3 --container dds --output out brick.png
+
+Images are compressed in the orientation Texture gives them, cube map faces (--faces) as they are.
+The files are written next to the images unless --output names a directory.
+Encoding needs the BCn encoder of Pillow 11.2 or later, i.e. Python 3.9+: pip install pyGLV[compress]
+"""
+
+import argparse
+import glob
+import os
+
+from pyGLV.GL.CompressedImage import CompressedImage
+from pyGLV.GL.GPUMemory import GPUMemory
+from pyGLV.GL.TextureLoader import TextureLoader
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tga')
+
+
+def images(paths):
+    """
+    The image files of `paths`, directories are searched for images (not recursively)
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(f for f in glob.glob(os.path.join(path, '*')) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def convert(filepath, format='auto', container='ktx2', faces=False, output=None):
+    """
+    Compress one image file
+
+    :param faces: the image is a cube map face, not transposed as Texture images are
+    :return: (path of the written file, CompressedImage)
+    """
+    width, height, pixels = TextureLoader.decode(filepath, orient=not faces)
+    image = CompressedImage.fromImage(pixels, format)
+    directory = output if output is not None else os.path.dirname(filepath)
+    target = os.path.join(directory, os.path.splitext(os.path.basename(filepath))[0] + '.' + container)
+    image.save(target)
+    return target, image
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='image files or directories of images')
+    parser.add_argument('--format', default='auto', choices=['auto', 'BC1', 'BC3'],
+                        help='BC1 (8x smaller, opaque), BC3 (4x smaller, with alpha) or auto by the alpha channel')
+    parser.add_argument('--container', default='ktx2', choices=['ktx2', 'dds'])
+    parser.add_argument('--faces', action='store_true', help='cube map faces, for get_texture_faces()')
+    parser.add_argument('--output', help='directory of the written files, by default next to the images')
+    args = parser.parse_args(argv)
+    if not CompressedImage.canEncode():
+        parser.error('the BCn encoder of Pillow 11.2 or later (Python 3.9+) is required, install pyGLV[compress]')
+
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+    for filepath in images(args.paths):
+        target, image = convert(filepath, args.format, args.container, args.faces, args.output)
+        uncompressed = GPUMemory.textureBytes(image.width, image.height, mipmaps=True)
+        print(f'{filepath} -> {target}: {image.format} {image.width}x{image.height}, {len(image.levels)} levels, '
+              f'{GPUMemory.format(image.nbytes)} instead of {GPUMemory.format(uncompressed)} ({uncompressed / image.nbytes:.1f}x)')
+
+
+if __name__ == "__main__":
+    main()
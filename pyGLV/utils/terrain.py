@@ -51,7 +51,7 @@ def generateTerrain(size=2,N=2,uniform_color = [0.4,0.4,0.4,0.5]):
     #colors
     
     colorT = [uniform_color]*((2*N+1))**2 
-    return np.array(points,dtype=np.float32) , np.array(indices,dtype=np.float32), np.array(colorT, dtype=np.float32)
+    return np.array(points,dtype=np.float32) , np.array(indices,dtype=np.uint32), np.array(colorT, dtype=np.float32)
 
 if __name__ == "__main__":
     ps, ind, col = generateTerrain()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the texture load path: decode time and peak memory of TextureLoader.decode
+against the former PIL path (flip, rotate, convert, tobytes), on generated 4K and 8K images.
+
+    python -m pyGLV.utils.texture_benchmark [--sizes 4096 8192] [--format jpg] [--repeat 3]
+
+Every load runs in a fresh process, so that its peak resident memory (VmHWM or ru_maxrss) above the
+baseline after the imports counts the decoded image and all the intermediate copies.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from pyGLV.GL.TextureLoader import TextureLoader
+
+
+def legacy_decode(filepath):
+    """
+    The load path before TextureLoader.decode took a NumPy view: three full PIL copies and a bytes object
+    """
+    img = Image.open(filepath)
+    img = img.transpose(Image.FLIP_TOP_BOTTOM)
+    img = img.rotate(-90) #need to rotate by 90 degrees
+    image_data = img.convert("RGBA").tobytes()
+    return img.width, img.height, image_data
+
+
+DECODERS = {'PIL flip+rotate': legacy_decode, 'NumPy transpose': TextureLoader.decode}
+
+
+def peak_rss():
+    """
+    Peak resident memory of this process in bytes
+    """
+    # on Linux ru_maxrss survives the exec of a spawned process, VmHWM starts over with it
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure(name, filepath, queue):
+    baseline = peak_rss()
+    start = time.perf_counter()
+    width, height, data = DECODERS[name](filepath)
+    seconds = time.perf_counter() - start
+    queue.put((seconds, peak_rss() - baseline))
+
+
+def measure(name, filepath):
+    """
+    Decode `filepath` with the decoder `name` in a fresh process
+
+    :return: (seconds, peak memory in bytes)
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(name, filepath, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def make_image(directory, size, format):
+    """
+    Write a size x size RGB test image, smooth gradients with noise so that JPEG decodes a realistic amount of data
+    """
+    filepath = os.path.join(directory, f'benchmark_{size}.{format}')
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    noise = np.random.default_rng(size).integers(0, 32, (size, size), np.uint8)
+    pixels = np.empty((size, size, 3), np.uint8)
+    pixels[..., 0] = ramp[None, :]
+    pixels[..., 1] = ramp[:, None]
+    pixels[..., 2] = noise
+    Image.fromarray(pixels, 'RGB').save(filepath)
+    return filepath
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4096, 8192])
+    parser.add_argument('--format', default='jpg', choices=['jpg', 'png'])
+    parser.add_argument('--repeat', type=int, default=3, help='loads per decoder and size, the fastest is reported')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'image':>12} {'decoder':>18} {'time (ms)':>10} {'peak (MiB)':>11}")
+        for size in args.sizes:
+            filepath = make_image(directory, size, args.format)
+            for name in DECODERS:
+                runs = [measure(name, filepath) for _ in range(args.repeat)]
+                seconds = min(run[0] for run in runs)
+                peak = min(run[1] for run in runs)
+                print(f"{f'{size}x{size}':>12} {name:>18} {seconds * 1000:>10.1f} {peak / 2**20:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,7 @@ setup(
     keywords = ['ECS','Scenegraph','Python design patterns','Computer Graphics'],
     package_dir={'pyGLV':'pyGLV'},
     packages=find_packages(exclude=["tests","tests.*", "tests/*" ]),
+    package_data={'pyGLV.GL': ['shaders/*.glsl', 'shaders/*.vert', 'shaders/*.frag']},
     install_requires=[
         'pip',
         'setuptools>=61',
@@ -41,7 +42,10 @@ setup(
         'pysdl2-dll',
         'ipykernel'
     ],
-    
+    extras_require={
+        # block compression of textures (pyGLV.utils.compress_textures), Pillow's BCn encoder needs Python 3.9+
+        'compress': ['pillow>=11.2'],
+    },
 
     classifiers=[
         "License :: OSI Approved :: Apache Software License",